@@ -0,0 +1,89 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from benchmarks.synthetic import make_embeddings, make_queries  # noqa: E402
+from src.ann_index import AnnConfig, apply_search_params, build_index  # noqa: E402
+
+# Συγκρίνει τις οικογένειες ευρετηρίου (flat, HNSW, IVF) σε συνθετικά δεδομένα με σχήμα bge-m3:
+# 1024 διαστάσεις, κανονικοποιημένα διανύσματα οργανωμένα σε θεματικές ομάδες. Αναφέρει
+# recall@k ως προς την ακριβή αναζήτηση flat και p50/p99 καθυστέρηση ανά ερώτημα.
+# Χρήση: python benchmarks/bench_ann.py --vectors 20000 100000 --ef 32 64 128 --nprobe 8 16 32
+
+
+def run_queries(index, queries: np.ndarray, k: int):
+    latencies, results = [], []
+    for q in queries:
+        start = time.perf_counter()
+        _, ids = index.search(q[None, :], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append(ids[0])
+    return np.array(results), np.array(latencies)
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(f.tolist()) & set(t.tolist())) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vectors", type=int, nargs="+", default=[20000])
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--topics", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--query-noise", type=float, default=0.03)
+    parser.add_argument("--k", type=int, default=8)
+    parser.add_argument("--ef", type=int, nargs="+", default=[32, 64, 128])
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[8, 16, 32])
+    parser.add_argument("--hnsw-m", type=int, default=32)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(11)
+    print(f"{'vectors':>8} {'index':>14} {'build_s':>8} {'recall@k':>9} {'p50_ms':>8} {'p99_ms':>8}")
+    for count in args.vectors:
+        corpus = make_embeddings(count, args.dim, args.topics, rng)
+        queries = make_queries(corpus, args.queries, args.query_noise, rng)
+        ids = np.arange(count, dtype=np.int64)
+
+        def report(label: str, index, build_s: float, truth=None):
+            found, latencies = run_queries(index, queries, args.k)
+            recall = 1.0 if truth is None else recall_at_k(found, truth)
+            print(
+                f"{count:>8} {label:>14} {build_s:>8.2f} {recall:>9.3f} "
+                f"{np.percentile(latencies, 50):>8.3f} {np.percentile(latencies, 99):>8.3f}"
+            )
+            return found
+
+        config = AnnConfig(hnsw_m=args.hnsw_m)
+        start = time.perf_counter()
+        flat = build_index("flat", args.dim, ids, corpus, config)
+        truth = report("flat", flat, time.perf_counter() - start)
+        del flat
+
+        start = time.perf_counter()
+        hnsw = build_index("hnsw", args.dim, ids, corpus, config)
+        build_s = time.perf_counter() - start
+        for ef in args.ef:
+            config.hnsw_ef_search = ef
+            apply_search_params(hnsw, config)
+            report(f"hnsw ef={ef}", hnsw, build_s, truth)
+        del hnsw
+
+        start = time.perf_counter()
+        ivf = build_index("ivf", args.dim, ids, corpus, config)
+        build_s = time.perf_counter() - start
+        for nprobe in args.nprobe:
+            config.ivf_nprobe = nprobe
+            apply_search_params(ivf, config)
+            report(f"ivf{ivf.nlist} np={nprobe}", ivf, build_s, truth)
+        del ivf
+
+
+if __name__ == "__main__":
+    main()
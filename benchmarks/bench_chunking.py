@@ -0,0 +1,201 @@
+import argparse
+import os
+import random
+import re
+import sys
+import time
+from typing import List
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from benchmarks.synthetic import ENGLISH_WORDS, GREEK_WORDS, make_page, make_sentences  # noqa: E402
+from src.pdf_utils import chunk_text  # noqa: E402
+
+# Ελέγχει ότι το chunk_text δίνει ακριβώς την ίδια έξοδο με την προηγούμενη υλοποίηση
+# (legacy_chunk_text και legacy_split_into_sentences, αυτούσια αντίγραφα) σε ένα σώμα σελίδων
+# με ακραίες περιπτώσεις, τυχαίες συμβολοσειρές και πολλούς συνδυασμούς παραμέτρων, και
+# συγκρίνει τους χρόνους σε μεγάλες ελληνικές και αγγλικές σελίδες.
+# Με --text-dir προστίθενται στο σώμα ελέγχου πραγματικά κείμενα (.txt).
+# Χρήση: python benchmarks/bench_chunking.py --words 2000 20000 100000 --lang en el
+
+
+def legacy_split_into_sentences(text: str) -> List[str]:
+    text = re.sub(r'\s+', ' ', text).strip()
+    sentences = re.split(r'(?<=[.!;]) +(?=[Α-ΩA-Z])|(?<=\.) (?=[Α-ΩA-Z])', text)
+    return [s.strip() for s in sentences if s.strip()]
+
+
+def legacy_chunk_text(
+    text: str,
+    chunk_size: int = 1200,
+    chunk_overlap: int = 200,
+    prefix: str = "",
+    prefix_max_tokens: int = 8,
+    preserve_sentences: bool = True,
+) -> List[str]:
+    if not text:
+        return []
+
+    prefix_tokens = (prefix or "").split()[: max(0, prefix_max_tokens)]
+    effective_size = max(1, chunk_size - len(prefix_tokens))
+
+    if preserve_sentences:
+        sentences = legacy_split_into_sentences(text)
+        if not sentences:
+            return legacy_chunk_text(text, chunk_size, chunk_overlap, prefix, prefix_max_tokens, preserve_sentences=False)
+
+        chunks: List[str] = []
+        current_chunk: List[str] = []
+        current_length = 0
+
+        for sentence in sentences:
+            sentence_tokens = sentence.split()
+            sentence_length = len(sentence_tokens)
+
+            if current_length + sentence_length <= effective_size:
+                current_chunk.append(sentence)
+                current_length += sentence_length
+            else:
+                if current_chunk:
+                    chunk_text_str = " ".join(current_chunk).strip()
+                    if chunk_text_str:
+                        final_chunk = (" ".join(prefix_tokens + [chunk_text_str])).strip()
+                        chunks.append(final_chunk)
+
+                if sentence_length > effective_size:
+                    words = sentence_tokens
+                    for i in range(0, len(words), effective_size):
+                        chunk_words = words[i:i + effective_size]
+                        chunk_text_str = " ".join(chunk_words).strip()
+                        if chunk_text_str:
+                            final_chunk = (" ".join(prefix_tokens + [chunk_text_str])).strip()
+                            chunks.append(final_chunk)
+                    current_chunk = []
+                    current_length = 0
+                else:
+                    if chunk_overlap > 0 and len(current_chunk) > 0:
+                        overlap_sentences = []
+                        overlap_length = 0
+                        for sent in reversed(current_chunk):
+                            sent_len = len(sent.split())
+                            if overlap_length + sent_len <= chunk_overlap:
+                                overlap_sentences.insert(0, sent)
+                                overlap_length += sent_len
+                            else:
+                                break
+                        current_chunk = overlap_sentences
+                        current_length = overlap_length
+                    else:
+                        current_chunk = []
+                        current_length = 0
+
+                    current_chunk.append(sentence)
+                    current_length += sentence_length
+
+        if current_chunk:
+            chunk_text_str = " ".join(current_chunk).strip()
+            if chunk_text_str:
+                final_chunk = (" ".join(prefix_tokens + [chunk_text_str])).strip()
+                chunks.append(final_chunk)
+
+        return chunks
+
+    tokens = text.split()
+    chunks: List[str] = []
+    start = 0
+    while start < len(tokens):
+        end = min(len(tokens), start + effective_size)
+        main = " ".join(tokens[start:end]).strip()
+        if main:
+            chunk = (" ".join(prefix_tokens + [main])).strip()
+            chunks.append(chunk)
+        if end == len(tokens):
+            break
+        start = max(0, end - chunk_overlap)
+
+    return chunks
+
+
+def _golden_corpus(rng: random.Random, text_dir: str) -> List[str]:
+    corpus = ["", " ", "\n\t  ", "Μία λέξη", "one", "Α. Β. Γ.", "x. y. Z. w; Q! e", "Τέλος;Αρχή. Νέα"]
+    for words in (ENGLISH_WORDS, GREEK_WORDS, ENGLISH_WORDS + GREEK_WORDS):
+        for count in (1, 2, 5, 20, 80):
+            page = make_page(words, count, rng)
+            corpus.append(page)
+            # Ακανόνιστα κενά, αλλαγές γραμμής και μη διαχωριστικά κενά όπως στις εξαγωγές PDF.
+            corpus.append(page.replace(" ", "  ", 7).replace(". ", ".\n", 5).replace(" ", " ", 3))
+        # Πολύ μεγάλη πρόταση χωρίς τελεία και πολλές πολύ σύντομες.
+        corpus.append(" ".join(rng.choice(words) for _ in range(900)))
+        corpus.append(" ".join(f"{rng.choice(words).capitalize()}." for _ in range(300)))
+    # Τυχαίες συμβολοσειρές από σημεία στίξης, κενά και κεφαλαία/πεζά γράμματα.
+    alphabet = [".", "!", ";", "?", " ", " ", "\n", "\t", "\u00a0", "A", "b", "Ω", "λ", "ά", "1", "x"]
+    corpus.extend("".join(rng.choice(alphabet) for _ in range(rng.randint(0, 200))) for _ in range(200))
+    if text_dir:
+        for name in sorted(os.listdir(text_dir)):
+            if name.endswith(".txt"):
+                with open(os.path.join(text_dir, name), "r", encoding="utf-8") as f:
+                    corpus.append(f.read())
+    return corpus
+
+
+def _check_golden(corpus: List[str]) -> int:
+    cases = 0
+    params = [
+        (size, overlap, prefix, max_tokens, preserve)
+        for size in (1, 2, 5, 17, 60, 300, 1200)
+        for overlap in (0, 1, 3, 15, 200)
+        for prefix in ("", "report", "annual report 2024 final version draft copy nine ten")
+        for max_tokens in (0, 8)
+        for preserve in (True, False)
+        # Με επικάλυψη >= μέγεθος το παράθυρο λέξεων δεν προχωρά (ίδια συμπεριφορά και πριν).
+        if preserve or overlap < size - len(prefix.split()[:max_tokens])
+    ]
+    for text in corpus:
+        for size, overlap, prefix, max_tokens, preserve in params:
+            expected = legacy_chunk_text(text, size, overlap, prefix, max_tokens, preserve)
+            actual = chunk_text(text, size, overlap, prefix, max_tokens, preserve)
+            assert actual == expected, f"Διαφορά για size={size} overlap={overlap} prefix={prefix!r} στο: {text[:80]!r}"
+            cases += 1
+    return cases
+
+
+def _time(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--words", type=int, nargs="+", default=[2000, 20000, 100000])
+    parser.add_argument("--lang", nargs="+", default=["en", "el"], choices=["en", "el"])
+    parser.add_argument("--chunk-size", type=int, default=1200)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--prefix", default="annual report 2024")
+    parser.add_argument("--text-dir", default="")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(13)
+    print(f"golden: {_check_golden(_golden_corpus(rng, args.text_dir))} cases identical")
+
+    print(f"{'lang':>4} {'words':>7} {'chunks':>7} {'legacy_ms':>10} {'new_ms':>8} {'speedup':>8}")
+    for lang in args.lang:
+        words = GREEK_WORDS if lang == "el" else ENGLISH_WORDS
+        for count in args.words:
+            # Μικρές και μεγάλες προτάσεις, ώστε να εμφανίζονται όλοι οι κλάδοι του αλγορίθμου.
+            sentences = make_sentences(words, max(1, count // 15), rng)
+            text = " ".join(sentences)
+            kwargs = dict(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap, prefix=args.prefix)
+            chunks = chunk_text(text, **kwargs)
+            assert chunks == legacy_chunk_text(text, **kwargs)
+            legacy = _time(lambda: legacy_chunk_text(text, **kwargs), args.repeat)
+            new = _time(lambda: chunk_text(text, **kwargs), args.repeat)
+            print(f"{lang:>4} {len(text.split()):>7} {len(chunks):>7} {legacy * 1000:>10.2f} {new * 1000:>8.2f} {legacy / new:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.index_store import Chunk, FaissStore  # noqa: E402
+
+# Συγκρίνει φόρτωση FAISS με αντιγραφή στη μνήμη και με memory-mapping: χρόνος φόρτωσης,
+# καθυστέρηση πρώτου ερωτήματος και RSS. Κάθε μέτρηση τρέχει σε νέα διεργασία, όπως ένας
+# worker που βλέπει τη συνεδρία για πρώτη φορά. Το RssAnon είναι η ιδιωτική μνήμη του worker·
+# το RssFile είναι σελίδες του page cache που μοιράζονται όλοι οι workers.
+# Χρήση: python benchmarks/bench_faiss_mmap.py --vectors 20000 100000 --dim 1024
+
+
+def _proc_status() -> dict:
+    values = {}
+    try:
+        with open("/proc/self/status", "r", encoding="utf-8") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in ("VmRSS", "RssAnon", "RssFile"):
+                    values[key] = int(rest.split()[0]) / 1024
+    except OSError:
+        pass
+    return values
+
+
+def _child(index_path: str, meta_path: str, mmap: bool, dim: int) -> None:
+    query = np.random.default_rng(1).standard_normal((1, dim)).astype(np.float32)
+    start = time.perf_counter()
+    store = FaissStore(dim, index_path, meta_path)
+    store.load(mmap=mmap)
+    loaded = time.perf_counter()
+    store.search(query, k=8)
+    searched = time.perf_counter()
+    report = {"load_s": loaded - start, "first_query_ms": (searched - loaded) * 1000}
+    report.update(_proc_status())
+    print(json.dumps(report))
+
+
+def _run_child(index_path: str, meta_path: str, mmap: bool, dim: int) -> dict:
+    out = subprocess.run(
+        [sys.executable, __file__, "--child", index_path, meta_path, "1" if mmap else "0", str(dim)],
+        check=True, capture_output=True, text=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        _child(sys.argv[2], sys.argv[3], sys.argv[4] == "1", int(sys.argv[5]))
+        return
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vectors", type=int, nargs="+", default=[20000, 100000])
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'vectors':>8} {'mode':>6} {'load_s':>8} {'query_ms':>9} {'rss_MB':>8} {'anon_MB':>8} {'file_MB':>8}")
+    for count in args.vectors:
+        with tempfile.TemporaryDirectory() as tmp:
+            index_path = os.path.join(tmp, "index.faiss")
+            meta_path = os.path.join(tmp, "metadata.bin")
+            store = FaissStore(args.dim, index_path, meta_path)
+            rng = np.random.default_rng(0)
+            for start in range(0, count, 10000):
+                n = min(10000, count - start)
+                vectors = rng.standard_normal((n, args.dim)).astype(np.float32)
+                store.add(vectors, [Chunk(source="doc.pdf", page=i, text=f"chunk {start + i}") for i in range(n)])
+            store.save()
+            del store
+
+            for mmap in (False, True):
+                # Η πρώτη εκτέλεση ζεσταίνει το page cache· κρατείται η καλύτερη από τις υπόλοιπες.
+                runs = [_run_child(index_path, meta_path, mmap, args.dim) for _ in range(args.repeat + 1)][1:]
+                best = min(runs, key=lambda r: r["load_s"] + r["first_query_ms"] / 1000)
+                print(
+                    f"{count:>8} {'mmap' if mmap else 'copy':>6} {best['load_s']:>8.3f} "
+                    f"{best['first_query_ms']:>9.1f} {best.get('VmRSS', 0):>8.1f} "
+                    f"{best.get('RssAnon', 0):>8.1f} {best.get('RssFile', 0):>8.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from benchmarks.synthetic import GREEK_WORDS, make_page  # noqa: E402
+from src.index_store import LEGACY_META_NAME, Chunk, FaissStore  # noqa: E402
+
+# Συγκρίνει τη φόρτωση μεταδεδομένων από το παλιό metadata.json με τη στηλοθετημένη μορφή
+# (metadata.bin + mmap κειμένων): χρόνος φόρτωσης + αναζήτηση top-k και μέγιστη μνήμη Python.
+# Χρήση: python benchmarks/bench_metadata_load.py --chunks 1000 10000 50000
+
+
+def _measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--dim", type=int, default=32)
+    parser.add_argument("--k", type=int, default=8)
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    print(f"{'chunks':>7} {'json_s':>8} {'json_MB':>8} {'cols_s':>8} {'cols_MB':>8}")
+    for count in args.chunks:
+        with tempfile.TemporaryDirectory() as tmp:
+            index_path = os.path.join(tmp, "index.faiss")
+            meta_path = os.path.join(tmp, "metadata.bin")
+            texts = [make_page(GREEK_WORDS, 8, rng) for _ in range(min(count, 500))]
+            chunks = [
+                Chunk(source=f"doc{i % 20}.pdf", page=i % 300, text=texts[i % len(texts)], session_id="s", tokens=250)
+                for i in range(count)
+            ]
+            vectors = np.random.default_rng(0).standard_normal((count, args.dim)).astype(np.float32)
+            store = FaissStore(args.dim, index_path, meta_path)
+            store.add(vectors, chunks)
+            store.save()
+
+            legacy_path = os.path.join(tmp, LEGACY_META_NAME)
+            with open(legacy_path, "w", encoding="utf-8") as f:
+                json.dump([
+                    {"source": c.source, "page": c.page, "text": c.text, "session_id": c.session_id,
+                     "tokens": c.tokens, "chunk_id": c.chunk_id}
+                    for c in chunks
+                ], f, ensure_ascii=False)
+            del chunks, store
+
+            def load_json():
+                with open(legacy_path, "r", encoding="utf-8") as f:
+                    loaded = [Chunk(**d) for d in json.load(f)]
+                by_id = {c.chunk_id: c for c in loaded}
+                return [by_id[i] for i in range(args.k)]
+
+            def load_columns():
+                fresh = FaissStore(args.dim, index_path, meta_path)
+                fresh.load()
+                return fresh.search(vectors[0], k=args.k)
+
+            t_json, m_json = _measure(load_json)
+            t_cols, m_cols = _measure(load_columns)
+            mb = 1024 * 1024
+            print(f"{count:>7} {t_json:>8.3f} {m_json / mb:>8.1f} {t_cols:>8.3f} {m_cols / mb:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from benchmarks.synthetic import ENGLISH_WORDS, make_page, make_pdf  # noqa: E402
+from src.pdf_utils import extract_pdf_text_with_pages  # noqa: E402
+
+# Συγκρίνει σειριακή και παράλληλη εξαγωγή κειμένου PDF για διάφορα πλήθη σελίδων.
+# Χρήση: python benchmarks/bench_pdf_extract.py --pages 10 50 100 300 --workers 4
+
+
+def _time(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 25, 50, 100, 200, 300])
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument("--repeat", type=int, default=2)
+    parser.add_argument("--pdf", help="Χρήση υπάρχοντος PDF αντί για συνθετικό")
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"workers={args.workers}")
+        print(f"{'pages':>6} {'serial_s':>9} {'parallel_s':>11} {'speedup':>8}")
+        for count in args.pages:
+            path = args.pdf
+            if not path:
+                path = os.path.join(tmp, f"bench_{count}.pdf")
+                make_pdf(path, [make_page(ENGLISH_WORDS, 45, rng) for _ in range(count)])
+
+            serial = extract_pdf_text_with_pages(path, workers=1)
+            parallel = extract_pdf_text_with_pages(path, workers=args.workers, min_pages_for_parallel=1)
+            assert serial == parallel, "Η παράλληλη εξαγωγή διαφέρει από τη σειριακή"
+
+            t_serial = _time(lambda: extract_pdf_text_with_pages(path, workers=1), args.repeat)
+            t_parallel = _time(
+                lambda: extract_pdf_text_with_pages(path, workers=args.workers, min_pages_for_parallel=1),
+                args.repeat,
+            )
+            print(f"{len(serial):>6} {t_serial:>9.3f} {t_parallel:>11.3f} {t_serial / t_parallel:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
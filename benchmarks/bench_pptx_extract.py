@@ -0,0 +1,74 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from benchmarks.synthetic import ENGLISH_WORDS, GREEK_WORDS, make_page, make_pptx  # noqa: E402
+from src.pptx_utils import _iter_slides_pptx, _iter_slides_xml  # noqa: E402
+
+# Συγκρίνει την εξαγωγή κειμένου PPTX μέσω python-pptx με την ανάγνωση του XML των διαφανειών
+# κατευθείαν από το zip, σε παρουσιάσεις με εικόνες θορύβου ανά --image-every διαφάνειες.
+# Ελέγχει ότι οι δύο μέθοδοι δίνουν ακριβώς τα ίδια (διαφάνεια, κείμενο) και αναφέρει χρόνο και
+# μέγιστη μνήμη Python (tracemalloc· οι δομές του lxml σε C δεν μετρώνται).
+# Χρήση: python benchmarks/bench_pptx_extract.py --slides 20 100 400 --image-every 10 --image-px 1024
+
+
+def _measure(fn, repeat: int):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--slides", type=int, nargs="+", default=[20, 100, 400])
+    parser.add_argument("--image-every", type=int, default=10)
+    parser.add_argument("--image-px", type=int, default=1024)
+    parser.add_argument("--repeat", type=int, default=2)
+    parser.add_argument("--pptx", help="Χρήση υπάρχουσας παρουσίασης αντί για συνθετική")
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'slides':>6} {'file_mb':>8} {'method':>11} {'time_s':>8} {'peak_mb':>8} {'speedup':>8}")
+        for count in args.slides:
+            path = args.pptx
+            if not path:
+                path = os.path.join(tmp, f"bench_{count}.pptx")
+                words = ENGLISH_WORDS + GREEK_WORDS
+                make_pptx(path, [make_page(words, 8, rng) for _ in range(count)], rng, args.image_every, args.image_px)
+            size_mb = os.path.getsize(path) / 2**20
+
+            baseline = None
+            reference = None
+            for label, fn in (
+                ("python-pptx", lambda: list(_iter_slides_pptx(path))),
+                ("xml", lambda: list(_iter_slides_xml(path))),
+            ):
+                seconds, peak, result = _measure(fn, args.repeat)
+                if reference is None:
+                    reference = result
+                assert result == reference, f"Η μέθοδος {label} δίνει διαφορετικό κείμενο"
+                baseline = baseline or seconds
+                print(
+                    f"{len(result):>6} {size_mb:>8.1f} {label:>11} {seconds:>8.3f} "
+                    f"{peak / 2**20:>8.1f} {baseline / seconds:>7.2f}x"
+                )
+            if args.pptx:
+                break
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from benchmarks.synthetic import make_embeddings, make_queries  # noqa: E402
+from src.ann_index import AnnConfig, code_size  # noqa: E402
+from src.index_store import Chunk, FaissStore  # noqa: E402
+
+# Συγκρίνει τους codecs αποθήκευσης διανυσμάτων (fp32, fp16, sq8, με/χωρίς ακριβή
+# επαναβαθμολόγηση) μέσα από το FaissStore: μνήμη κωδικών στο ευρετήριο, μέγεθος αρχείων στον
+# δίσκο και πόσο αλλάζει η κατάταξη ως προς την ακριβή αναζήτηση fp32 (recall@k, ίδιο top-1,
+# ίδια σειρά top-k, μέση απόκλιση score). Τα διανύσματα προστίθενται ανά έγγραφο, όπως στο
+# /index, οπότε το sq8 εκπαιδεύεται στο πρώτο έγγραφο όπως θα γινόταν στην πράξη.
+# Με --corpus δίνεται πραγματικό σώμα αναφοράς (.npy, float32 κανονικοποιημένα embeddings).
+# Χρήση: python benchmarks/bench_quantization.py --vectors 20000 --kind flat --rescore 4
+#        python benchmarks/bench_quantization.py --corpus bge_m3_chunks.npy
+
+
+def _files_size(directory: str) -> dict:
+    sizes = {"index": 0, "full": 0}
+    for name in os.listdir(directory):
+        size = os.path.getsize(os.path.join(directory, name))
+        if name == "index.faiss":
+            sizes["index"] += size
+        elif name.endswith(".f32"):
+            sizes["full"] += size
+    return sizes
+
+
+def _build(directory: str, corpus: np.ndarray, config: AnnConfig, doc_chunks: int) -> float:
+    store = FaissStore(corpus.shape[1], os.path.join(directory, "index.faiss"), os.path.join(directory, "metadata.bin"), config)
+    start = time.perf_counter()
+    for doc, offset in enumerate(range(0, len(corpus), doc_chunks)):
+        block = corpus[offset:offset + doc_chunks]
+        store.add(block, [Chunk(source=f"doc{doc}.pdf", page=0, text=str(offset + i)) for i in range(len(block))])
+    store.save()
+    return time.perf_counter() - start
+
+
+def _search_all(directory: str, dim: int, config: AnnConfig, queries: np.ndarray, k: int):
+    store = FaissStore(dim, os.path.join(directory, "index.faiss"), os.path.join(directory, "metadata.bin"), config)
+    store.load(mmap=True)
+    ids, scores, latencies = [], [], []
+    for q in queries:
+        start = time.perf_counter()
+        hits = store.search(q, k=k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        ids.append([int(c.text) for _, c in hits])
+        scores.append([s for s, _ in hits])
+    return ids, scores, np.array(latencies), int(store.index.ntotal) * code_size(store.index)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", default="")
+    parser.add_argument("--vectors", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--topics", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--query-noise", type=float, default=0.06)
+    parser.add_argument("--doc-chunks", type=int, default=200)
+    parser.add_argument("--kind", default="flat", choices=["flat", "hnsw", "ivf"])
+    parser.add_argument("--k", type=int, default=8)
+    parser.add_argument("--rescore", type=int, default=4)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(5)
+    if args.corpus:
+        corpus = np.load(args.corpus).astype(np.float32)
+    else:
+        corpus = make_embeddings(args.vectors, args.dim, args.topics, rng)
+    queries = make_queries(corpus, args.queries, args.query_noise, rng)
+    dim = corpus.shape[1]
+
+    # Αναφορά: ακριβής αναζήτηση σε όλο το σώμα.
+    exact_scores = queries @ corpus.T
+    truth = np.argsort(-exact_scores, axis=1)[:, :args.k]
+
+    variants = [("fp32", 0), ("fp16", 0), ("fp16", args.rescore), ("sq8", 0), ("sq8", args.rescore)]
+    mb = 1024 * 1024
+    print(f"{len(corpus)} vectors x {dim}, kind={args.kind}, k={args.k}")
+    print(
+        f"{'codec':>12} {'codes_MB':>9} {'index_MB':>9} {'full_MB':>8} {'recall':>7} "
+        f"{'top1':>6} {'same_k':>7} {'|dscore|':>9} {'p50_ms':>7} {'build_s':>8}"
+    )
+    for codec, rescore in variants:
+        config = AnnConfig(kind=args.kind, codec=codec, rescore_factor=rescore)
+        with tempfile.TemporaryDirectory() as tmp:
+            build_s = _build(tmp, corpus, config, args.doc_chunks)
+            ids, scores, latencies, code_bytes = _search_all(tmp, dim, config, queries, args.k)
+            sizes = _files_size(tmp)
+
+        recall = np.mean([len(set(f) & set(t.tolist())) / args.k for f, t in zip(ids, truth)])
+        top1 = np.mean([bool(f) and f[0] == t[0] for f, t in zip(ids, truth)])
+        same = np.mean([f == t.tolist() for f, t in zip(ids, truth)])
+        # Απόκλιση των scores που επιστρέφονται από τα ακριβή cosine των ίδιων chunks.
+        deltas = [abs(s - exact_scores[qi, i]) for qi, (f, ss) in enumerate(zip(ids, scores)) for i, s in zip(f, ss)]
+        label = f"{codec}+r{rescore}" if rescore else codec
+        print(
+            f"{label:>12} {code_bytes / mb:>9.1f} {sizes['index'] / mb:>9.1f} {sizes['full'] / mb:>8.1f} "
+            f"{recall:>7.3f} {top1:>6.3f} {same:>7.3f} {np.mean(deltas):>9.5f} "
+            f"{np.percentile(latencies, 50):>7.3f} {build_s:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
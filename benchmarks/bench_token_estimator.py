@@ -0,0 +1,76 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from benchmarks.synthetic import ENGLISH_WORDS, GREEK_WORDS, make_page  # noqa: E402
+from src.cf_ai import Tokenizer  # noqa: E402
+from src.token_estimator import TokenEstimator  # noqa: E402
+
+# Βαθμονομεί τον TokenEstimator σε συνθετικές σελίδες (ελληνικά, αγγλικά, μικτά) με τα tokens
+# του tiktoken και τον αξιολογεί σε ξεχωριστές σελίδες: σχετικό σφάλμα (p50/p95/p99) έναντι των
+# κανόνων 4 και 3 χαρακτήρων/token, πόσο συχνά το upper() καλύπτει τα πραγματικά tokens και
+# χρόνος ανά κείμενο έναντι ενός πλήρους encode.
+# Χρειάζεται το encoding του tiktoken τοπικά (ή στο TIKTOKEN_CACHE_DIR).
+# Χρήση: python benchmarks/bench_token_estimator.py --train 500 --test 500 --quantile 0.99
+
+
+def _pages(count: int, rng: random.Random):
+    pages = []
+    for i in range(count):
+        kind = i % 3
+        words = ENGLISH_WORDS if kind == 0 else GREEK_WORDS if kind == 1 else ENGLISH_WORDS + GREEK_WORDS
+        pages.append(make_page(words, rng.randint(1, 60), rng))
+    return pages
+
+
+def _errors(estimates, actual) -> np.ndarray:
+    return np.asarray(actual, dtype=np.float64) / np.maximum(np.asarray(estimates, dtype=np.float64), 1.0) - 1.0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--encoding", default="cl100k_base")
+    parser.add_argument("--train", type=int, default=500)
+    parser.add_argument("--test", type=int, default=500)
+    parser.add_argument("--quantile", type=float, default=0.99)
+    args = parser.parse_args()
+
+    import tiktoken
+    tokenizer = Tokenizer(tiktoken.get_encoding(args.encoding))
+    estimator = TokenEstimator(path=None, quantile=args.quantile)
+    rng = random.Random(9)
+
+    for page in _pages(args.train, rng):
+        estimator.observe("tiktoken", page, tokenizer.count(page))
+
+    test = _pages(args.test, rng)
+    actual = [tokenizer.count(p) for p in test]
+    print(f"bound@{args.quantile}: +{estimator.bound('tiktoken'):.1%}  weights: {estimator.stats()['tiktoken']['weights']}")
+    print(f"{'method':>14} {'p50':>8} {'p95':>8} {'p99':>8} {'under':>7} {'us/text':>8}")
+    for label, fn in (
+        ("chars/4", lambda t: len(t) // 4),
+        ("chars/3", lambda t: len(t) // 3),
+        ("estimate", lambda t: estimator.estimate(t)),
+        ("upper", lambda t: estimator.upper(t)),
+        ("tiktoken", tokenizer.count),
+    ):
+        start = time.perf_counter()
+        estimates = [fn(p) for p in test]
+        micros = (time.perf_counter() - start) / len(test) * 1e6
+        errors = np.abs(_errors(estimates, actual))
+        # Ποσοστό κειμένων όπου η μέθοδος υποεκτιμά τα πραγματικά tokens.
+        under = np.mean(np.asarray(estimates) < np.asarray(actual))
+        print(
+            f"{label:>14} {np.percentile(errors, 50):>8.1%} {np.percentile(errors, 95):>8.1%} "
+            f"{np.percentile(errors, 99):>8.1%} {under:>7.1%} {micros:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
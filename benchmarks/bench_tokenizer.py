@@ -0,0 +1,128 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from benchmarks.synthetic import ENGLISH_WORDS, GREEK_WORDS, make_page  # noqa: E402
+from src.cf_ai import Tokenizer  # noqa: E402
+from src.pdf_utils import chunk_prefix, chunk_text, chunk_text_tokens  # noqa: E402
+
+# Μετρά την καταμέτρηση tokens κατά τον τεμαχισμό σελίδων, όπως στο _chunk_page:
+#   legacy    - get_encoding + encode σε κάθε κλήση, για κάθε chunk και ξανά για τη σελίδα
+#   shared    - κοινό encoding, ένα encode ανά chunk και ανά σελίδα
+#   batch     - όλα τα chunks και οι σελίδες σε μία κλήση count_batch
+#   one-pass  - count_chunks: μία κωδικοποίηση ανά σελίδα, tokens chunks από τις θέσεις
+# Ελέγχει ότι όλες οι μέθοδοι δίνουν τους ίδιους αριθμούς και αναφέρει tokens σελίδας/s.
+# Στο τέλος συγκρίνει το εύρος μεγεθών (σε tokens) των chunks σε λέξεις και σε tokens (--chunk-tokens).
+# Χρειάζεται το encoding του tiktoken τοπικά (ή στο TIKTOKEN_CACHE_DIR).
+# Χρήση: python benchmarks/bench_tokenizer.py --pages 200 --chunk-size 1200 300 --lang en el
+
+
+def _legacy_count(name: str, text: str) -> int:
+    import tiktoken
+    return len(tiktoken.get_encoding(name).encode(text, disallowed_special=()))
+
+
+def _time(fn, repeat: int):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--encoding", default="cl100k_base")
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--sentences", type=int, default=45)
+    parser.add_argument("--chunk-size", type=int, nargs="+", default=[1200, 300])
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--prefix", default="annual report 2024")
+    parser.add_argument("--lang", nargs="+", default=["en", "el"], choices=["en", "el"])
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--chunk-tokens", type=int, default=800)
+    parser.add_argument("--chunk-overlap-tokens", type=int, default=128)
+    args = parser.parse_args()
+
+    import tiktoken
+    tokenizer = Tokenizer(tiktoken.get_encoding(args.encoding), batch_threads=args.threads)
+    head = chunk_prefix(args.prefix)
+    tokenizer.count_chunks("warm up", ["warm up"])
+
+    print(f"{'lang':>4} {'chunk':>6} {'chunks':>7} {'method':>9} {'time_s':>8} {'tok/s':>12} {'speedup':>8}")
+    for lang in args.lang:
+        rng = random.Random(3)
+        words = GREEK_WORDS if lang == "el" else ENGLISH_WORDS
+        pages = [make_page(words, args.sentences, rng) for _ in range(args.pages)]
+        for size in args.chunk_size:
+            overlap = min(args.chunk_overlap, size // 2)
+            chunked = [chunk_text(p, chunk_size=size, chunk_overlap=overlap, prefix=args.prefix) for p in pages]
+            flat = [c for chunks in chunked for c in chunks]
+
+            def legacy():
+                return [([_legacy_count(args.encoding, c) for c in chunks], _legacy_count(args.encoding, " ".join(p.split())))
+                        for p, chunks in zip(pages, chunked)]
+
+            def shared():
+                return [([tokenizer.count(c) for c in chunks], tokenizer.count(" ".join(p.split())))
+                        for p, chunks in zip(pages, chunked)]
+
+            def batch():
+                counts = tokenizer.count_batch(flat + [" ".join(p.split()) for p in pages])
+                out, pos = [], 0
+                for chunks, page_tokens in zip(chunked, counts[len(flat):]):
+                    out.append((counts[pos:pos + len(chunks)], page_tokens))
+                    pos += len(chunks)
+                return out
+
+            def one_pass():
+                return [tokenizer.count_chunks(p, chunks, head) for p, chunks in zip(pages, chunked)]
+
+            baseline = None
+            reference = None
+            for label, fn in (("legacy", legacy), ("shared", shared), ("batch", batch), ("one-pass", one_pass)):
+                seconds, result = _time(fn, args.repeat)
+                result = [(list(c), t) for c, t in result]
+                if reference is None:
+                    reference = result
+                assert result == reference, f"Η μέθοδος {label} δίνει διαφορετικά tokens"
+                baseline = baseline or seconds
+                page_tokens = sum(t for _, t in result)
+                print(
+                    f"{lang:>4} {size:>6} {len(flat):>7} {label:>9} {seconds:>8.3f} "
+                    f"{page_tokens / seconds:>12,.0f} {baseline / seconds:>7.2f}x"
+                )
+
+    # Μέγεθος των chunks σε tokens: σε λέξεις εξαρτάται από τη γλώσσα, σε tokens είναι σταθερό.
+    print(f"\n{'lang':>4} {'unit':>7} {'chunks':>7} {'min':>6} {'p50':>6} {'max':>6} {'time_s':>8}")
+    for lang in args.lang:
+        rng = random.Random(5)
+        words = GREEK_WORDS if lang == "el" else ENGLISH_WORDS
+        pages = [" ".join(make_page(words, args.sentences, rng) for _ in range(4)) for _ in range(args.pages // 4 or 1)]
+        for unit in ("words", "tokens"):
+            start = time.perf_counter()
+            sizes = []
+            for page in pages:
+                if unit == "tokens":
+                    _, counts, _ = chunk_text_tokens(
+                        page, tokenizer, args.chunk_tokens, args.chunk_overlap_tokens, prefix=args.prefix
+                    )
+                else:
+                    counts, _ = tokenizer.count_chunks(page, chunk_text(page, 1200, 200, prefix=args.prefix), head)
+                sizes.extend(counts)
+            seconds = time.perf_counter() - start
+            sizes.sort()
+            print(
+                f"{lang:>4} {unit:>7} {len(sizes):>7} {sizes[0]:>6} {sizes[len(sizes) // 2]:>6} "
+                f"{sizes[-1]:>6} {seconds:>8.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
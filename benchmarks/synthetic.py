@@ -0,0 +1,123 @@
+import random
+from typing import List
+
+import numpy as np
+
+# Βοηθητικά για τα benchmarks: παράγουν συνθετικά έγγραφα ώστε τα scripts να τρέχουν
+# χωρίς εξωτερικά αρχεία ή πρόσβαση στο Cloudflare.
+
+ENGLISH_WORDS = (
+    "the report data value growth market quarter revenue analysis policy article law tax "
+    "income rate increase decrease table figure results method model system student course"
+).split()
+
+GREEK_WORDS = (
+    "η το της των και για στην από με ανάπτυξη ρυθμός τρίμηνο έτος ποσοστό αύξηση μείωση "
+    "άρθρο νόμος φορολογία εισόδημα πίνακας στοιχεία αποτελέσματα μέθοδος φοιτητής μάθημα"
+).split()
+
+
+def make_sentences(words: List[str], count: int, rng: random.Random) -> List[str]:
+    sentences = []
+    for _ in range(count):
+        body = " ".join(rng.choice(words) for _ in range(rng.randint(6, 24)))
+        sentences.append(body[0].upper() + body[1:] + rng.choice([".", ".", ".", "!", ";"]))
+    return sentences
+
+
+def make_page(words: List[str], sentences: int, rng: random.Random) -> str:
+    return " ".join(make_sentences(words, sentences, rng))
+
+
+def make_pdf(path: str, pages: List[str]) -> None:
+    # Γράφει ένα ελάχιστο, έγκυρο PDF με Helvetica (μόνο ASCII κείμενο).
+    n = len(pages)
+    kids = " ".join(f"{4 + 2 * i} 0 R" for i in range(n))
+    objs = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{kids}] /Count {n} >>",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i, text in enumerate(pages):
+        ops = ["BT", "/F1 9 Tf", "11 TL", "40 800 Td"]
+        for j in range(0, len(text), 90):
+            line = text[j:j + 90].replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+            ops.append(f"({line}) Tj T*")
+        ops.append("ET")
+        stream = "\n".join(ops)
+        objs.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>"
+        )
+        objs.append(f"<< /Length {len(stream.encode('latin-1'))} >>\nstream\n{stream}\nendstream")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for k, obj in enumerate(objs, start=1):
+        offsets.append(len(out))
+        out += f"{k} 0 obj\n{obj}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objs) + 1}\n0000000000 65535 f \n".encode()
+    for off in offsets:
+        out += f"{off:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objs) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def make_pptx(path: str, slides: List[str], rng: random.Random, image_every: int = 0, image_px: int = 1024) -> None:
+    # Γράφει μια παρουσίαση με το python-pptx: τίτλος και κουκκίδες με πολλά runs (και κενές
+    # παραγράφους, αλλαγές γραμμής), πίνακα και ομάδα σχημάτων (που η εξαγωγή αγνοεί) και, ανά
+    # image_every διαφάνειες, μια εικόνα θορύβου image_px x image_px (PNG που δεν συμπιέζεται).
+    import io
+
+    from PIL import Image
+    from pptx import Presentation
+    from pptx.util import Inches
+
+    prs = Presentation()
+    noise = np.random.default_rng(rng.randrange(2**32))
+    for i, text in enumerate(slides):
+        slide = prs.slides.add_slide(prs.slide_layouts[1])
+        sentences = [s for s in text.split(". ") if s]
+        slide.shapes.title.text = f"{i + 1}. {sentences[0][:60]}"
+        body = slide.placeholders[1].text_frame
+        body.text = sentences[0]
+        for sentence in sentences[1:]:
+            paragraph = body.add_paragraph()
+            for word in sentence.split(" "):
+                paragraph.add_run().text = word
+                paragraph.add_run().text = " "
+            if rng.random() < 0.2:
+                body.add_paragraph()
+        body.paragraphs[-1].add_line_break()
+        body.paragraphs[-1].add_run().text = "end"
+        table = slide.shapes.add_table(2, 2, Inches(1), Inches(5), Inches(4), Inches(1)).table
+        table.cell(0, 0).text = "table cell"
+        group = slide.shapes.add_group_shape()
+        group.shapes.add_textbox(Inches(6), Inches(5), Inches(2), Inches(1)).text_frame.text = "grouped"
+        if image_every and i % image_every == 0:
+            pixels = noise.integers(0, 256, (image_px, image_px, 3), dtype=np.uint8)
+            image = io.BytesIO()
+            Image.fromarray(pixels).save(image, format="PNG", compress_level=1)
+            image.seek(0)
+            slide.shapes.add_picture(image, Inches(6), Inches(1), Inches(3))
+    prs.save(path)
+
+
+def make_embeddings(count: int, dim: int, topics: int, rng: np.random.Generator) -> np.ndarray:
+    # Κάθε διάνυσμα = κέντρο θέματος + θόρυβος, κανονικοποιημένο (όπως τα embeddings κειμένων).
+    centers = rng.standard_normal((topics, dim)).astype(np.float32)
+    labels = rng.integers(0, topics, count)
+    vectors = centers[labels] + 1.2 * rng.standard_normal((count, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def make_queries(corpus: np.ndarray, count: int, noise: float, rng: np.random.Generator) -> np.ndarray:
+    # Ερωτήματα στη γειτονιά υπαρχόντων chunks· με noise≈0.03 ο θόρυβος έχει νόρμα όσο το ίδιο
+    # το διάνυσμα, οπότε οι πλησιέστεροι γείτονες δεν είναι προφανείς.
+    picks = rng.choice(len(corpus), count, replace=False)
+    queries = corpus[picks] + noise * rng.standard_normal((count, corpus.shape[1])).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return queries
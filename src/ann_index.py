@@ -0,0 +1,197 @@
+import math
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+import faiss
+import numpy as np
+
+# Επιλογή οικογένειας ευρετηρίου FAISS βάσει πλήθους διανυσμάτων:
+#   flat  - ακριβής αναζήτηση, IndexIDMap2(IndexFlatIP). Κατάλληλο για τις περισσότερες συνεδρίες.
+#   hnsw  - γράφος HNSW, IndexIDMap2(IndexHNSWFlat). Δεν υποστηρίζει remove_ids, οπότε οι
+#           διαγραφές ξαναχτίζουν τον γράφο από τα διανύσματα που μένουν.
+#   ivf   - IndexIVFFlat με δικά του IDs (χωρίς IDMap) και DirectMap hashtable για reconstruct/remove.
+#           Εκπαιδεύεται ξανά όταν το πλήθος απομακρυνθεί πολύ από αυτό για το οποίο εκπαιδεύτηκε.
+KINDS = ("flat", "hnsw", "ivf")
+
+# Κωδικοποίηση των διανυσμάτων μέσα στο ευρετήριο (ίδια για κάθε οικογένεια):
+#   fp32 - πλήρης ακρίβεια, 4 bytes ανά διάσταση.
+#   fp16 - μισή ακρίβεια, 2 bytes ανά διάσταση, χωρίς εκπαίδευση.
+#   sq8  - 8-bit scalar quantization, 1 byte ανά διάσταση, με εύρος τιμών ανά διάσταση από
+#          εκπαίδευση στα πρώτα διανύσματα.
+CODECS = {
+    "fp32": None,
+    "fp16": faiss.ScalarQuantizer.QT_fp16,
+    "sq8": faiss.ScalarQuantizer.QT_8bit,
+}
+
+# Το εύρος του sq8 διευρύνεται κατά 10% σε κάθε πλευρά, ώστε έγγραφα που προστίθενται μετά
+# την εκπαίδευση να μην κόβονται στα άκρα.
+_SQ8_RANGE_MARGIN = 0.1
+
+
+@dataclass
+class AnnConfig:
+    kind: str = "auto"  # auto | flat | hnsw | ivf
+    hnsw_min_vectors: int = 20000
+    ivf_min_vectors: int = 200000
+    hnsw_m: int = 32
+    hnsw_ef_construction: int = 80
+    hnsw_ef_search: int = 64
+    ivf_nprobe: int = 16
+    codec: str = "fp32"  # fp32 | fp16 | sq8
+    rescore_factor: int = 0  # >0: ανάκτηση k·factor υποψηφίων και ακριβής επαναβαθμολόγηση
+
+    @classmethod
+    def from_env(cls) -> "AnnConfig":
+        return cls(
+            kind=os.getenv("FAISS_INDEX_KIND", "auto"),
+            hnsw_min_vectors=int(os.getenv("FAISS_HNSW_MIN_VECTORS", "20000")),
+            ivf_min_vectors=int(os.getenv("FAISS_IVF_MIN_VECTORS", "200000")),
+            hnsw_m=int(os.getenv("FAISS_HNSW_M", "32")),
+            hnsw_ef_construction=int(os.getenv("FAISS_HNSW_EF_CONSTRUCTION", "80")),
+            hnsw_ef_search=int(os.getenv("FAISS_HNSW_EF_SEARCH", "64")),
+            ivf_nprobe=int(os.getenv("FAISS_IVF_NPROBE", "16")),
+            codec=os.getenv("FAISS_VECTOR_CODEC", "fp32"),
+            rescore_factor=int(os.getenv("FAISS_RESCORE_FACTOR", "0")),
+        )
+
+    @property
+    def keeps_full_vectors(self) -> bool:
+        # Τα διανύσματα πλήρους ακρίβειας κρατιούνται χωριστά μόνο όταν χρειάζονται για
+        # επαναβαθμολόγηση ενός κβαντισμένου ευρετηρίου.
+        return self.codec != "fp32" and self.rescore_factor > 0
+
+    def kind_for(self, count: int, current: Optional[str] = None) -> str:
+        # Οικογένεια για το δοσμένο πλήθος. Η υποβάθμιση γίνεται μόνο κάτω από το μισό του
+        # ορίου, ώστε ένα ευρετήριο κοντά στο όριο να μην ξαναχτίζεται σε κάθε προσθήκη/διαγραφή.
+        if self.kind in KINDS:
+            return self.kind
+        hnsw_min, ivf_min = self.hnsw_min_vectors, self.ivf_min_vectors
+        if current == "ivf":
+            ivf_min //= 2
+        if current in ("hnsw", "ivf"):
+            hnsw_min //= 2
+        if count >= ivf_min:
+            return "ivf"
+        if count >= hnsw_min:
+            return "hnsw"
+        return "flat"
+
+
+def ivf_nlist(count: int) -> int:
+    # Συνήθης επιλογή: ~4·sqrt(n) λίστες, ώστε κάθε λίστα να έχει αρκετά δείγματα εκπαίδευσης.
+    return int(min(65536, max(16, 4 * math.sqrt(max(count, 1)))))
+
+
+def _storage(index: faiss.Index) -> faiss.Index:
+    # Το ευρετήριο που κρατά τους κωδικούς των διανυσμάτων (κάτω από IDMap2 και HNSW).
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap2) else index
+    if isinstance(inner, faiss.IndexHNSW):
+        return faiss.downcast_index(inner.storage)
+    return inner
+
+
+def index_kind(index: faiss.Index) -> str:
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf"
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap2) else index
+    if isinstance(inner, faiss.IndexHNSW):
+        return "hnsw"
+    return "flat"
+
+
+def index_codec(index: faiss.Index) -> str:
+    storage = _storage(index)
+    if isinstance(storage, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+        qtype = storage.sq.qtype
+        for name, value in CODECS.items():
+            if value == qtype:
+                return name
+    return "fp32"
+
+
+def code_size(index: faiss.Index) -> int:
+    # Bytes ανά διάνυσμα στη μνήμη του ευρετηρίου (χωρίς τον γράφο HNSW ή τα IDs).
+    return int(_storage(index).code_size)
+
+
+def needs_rebuild(index: faiss.Index, count: int, config: AnnConfig) -> Optional[str]:
+    # Επιστρέφει την οικογένεια στην οποία πρέπει να ξαναχτιστεί το ευρετήριο, ή None.
+    current = index_kind(index)
+    target = config.kind_for(count, current)
+    if target != current or index_codec(index) != config.codec:
+        return target
+    if current == "ivf":
+        ideal = ivf_nlist(count)
+        if index.nlist < ideal // 2 or index.nlist > ideal * 2:
+            return "ivf"
+    return None
+
+
+def build_index(kind: str, dim: int, ids: np.ndarray, vectors: np.ndarray, config: AnnConfig) -> faiss.Index:
+    # Δημιουργεί νέο ευρετήριο της οικογένειας και προσθέτει τα διανύσματα με τα IDs τους.
+    # Με sq8 και χωρίς διανύσματα το ευρετήριο μένει ανεκπαίδευτο (is_trained=False) και
+    # εκπαιδεύεται με την πρώτη προσθήκη.
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    ids = np.ascontiguousarray(ids, dtype=np.int64)
+    qtype = CODECS[config.codec]
+    if kind == "ivf":
+        nlist = ivf_nlist(len(ids))
+        quantizer = faiss.IndexFlatIP(dim)
+        if qtype is None:
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+        else:
+            index = faiss.IndexIVFScalarQuantizer(quantizer, dim, nlist, qtype, faiss.METRIC_INNER_PRODUCT)
+        index.set_direct_map_type(faiss.DirectMap.Hashtable)
+    elif kind == "hnsw":
+        if qtype is None:
+            inner = faiss.IndexHNSWFlat(dim, config.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        else:
+            inner = faiss.IndexHNSWSQ(dim, qtype, config.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        inner.hnsw.efConstruction = config.hnsw_ef_construction
+        index = faiss.IndexIDMap2(inner)
+    elif qtype is None:
+        index = faiss.IndexIDMap2(faiss.IndexFlatIP(dim))
+    else:
+        index = faiss.IndexIDMap2(faiss.IndexScalarQuantizer(dim, qtype, faiss.METRIC_INNER_PRODUCT))
+    storage = _storage(index)
+    if isinstance(storage, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+        storage.sq.rangestat_arg = _SQ8_RANGE_MARGIN
+    if len(ids):
+        train(index, vectors)
+        index.add_with_ids(vectors, ids)
+    apply_search_params(index, config)
+    return index
+
+
+def train(index: faiss.Index, vectors: np.ndarray) -> None:
+    # Εκπαιδεύει το ευρετήριο αν χρειάζεται (κέντρα IVF, εύρος sq8). Για το k-means αρκούν
+    # ~64 δείγματα ανά λίστα.
+    if index.is_trained or not len(vectors):
+        return
+    sample = vectors
+    if isinstance(index, faiss.IndexIVF) and len(vectors) > index.nlist * 64:
+        picks = np.random.default_rng(0).choice(len(vectors), index.nlist * 64, replace=False)
+        sample = vectors[np.sort(picks)]
+    index.train(np.ascontiguousarray(sample, dtype=np.float32))
+
+
+def apply_search_params(index: faiss.Index, config: AnnConfig) -> None:
+    # Παράμετροι αναζήτησης (δεν αποθηκεύονται στο αρχείο): efSearch για HNSW, nprobe για IVF.
+    kind = index_kind(index)
+    if kind == "hnsw":
+        faiss.downcast_index(index.index).hnsw.efSearch = config.hnsw_ef_search
+    elif kind == "ivf":
+        index.nprobe = min(config.ivf_nprobe, index.nlist)
+
+
+def mmap_read_flags(index_path: str) -> int:
+    # Σημαίες για φόρτωση με memory-mapping, ανάλογα με τον τύπο του αρχείου (fourcc).
+    # Τα IVF χαρτογραφούν τις inverted lists με IO_FLAG_MMAP, που δεν συνδυάζεται με το
+    # IO_FLAG_MMAP_IFC· τα υπόλοιπα (flat codes, αποθήκη του HNSW) με IO_FLAG_MMAP_IFC.
+    with open(index_path, "rb") as f:
+        fourcc = f.read(4)
+    if fourcc.startswith(b"Iw"):
+        return faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+    return getattr(faiss, "IO_FLAG_MMAP_IFC", 0) | faiss.IO_FLAG_READ_ONLY
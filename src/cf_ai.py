@@ -1,12 +1,23 @@
+import asyncio
 import json
 import os
+import random
 import sys
-from typing import Any, Dict, List, Optional, Tuple
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Tuple
 
+import httpx
 import numpy as np
 import requests
+import requests.adapters
 from dotenv import load_dotenv
 
+from .embedding_cache import get_embedding_cache
+from .token_estimator import get_token_estimator
+
 
 # Ορισμός μοντέλων Cloudflare AI.
 EMBEDDING_MODEL = "@cf/baai/bge-m3"
@@ -21,49 +32,376 @@ def _require_env(name: str) -> str:
     return value
 
 
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    # Το Retry-After μπορεί να είναι δευτερόλεπτα ή ημερομηνία HTTP.
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        from email.utils import parsedate_to_datetime
+        when = parsedate_to_datetime(value)
+        return max(0.0, when.timestamp() - time.time())
+    except Exception:
+        return None
+
+
+def _backoff_delay(attempt: int, retry_after: Optional[float], base: float, cap: float) -> float:
+    # Full jitter: τυχαία αναμονή έως base * 2^attempt, αλλά ποτέ λιγότερη από το Retry-After.
+    delay = random.uniform(0, min(cap, base * (2 ** attempt)))
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, cap))
+    return delay
+
+
+class CloudflareClient:
+    # Μακρόβιος HTTP client προς το Cloudflare AI, κοινός για όλα τα endpoints του server.
+    # Κρατά ανοιχτές (keep-alive) συνδέσεις σε pool, ώστε να αποφεύγεται νέο TLS handshake
+    # σε κάθε αίτημα, και επαναλαμβάνει αιτήματα με jittered exponential backoff σε 429/5xx.
+    def __init__(
+        self,
+        account_id: str,
+        api_token: str,
+        pool_size: int = 10,
+        connect_timeout: float = 10.0,
+        read_timeout: float = 60.0,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 20.0,
+    ):
+        self.base_url = f"https://api.cloudflare.com/client/v4/accounts/{account_id}/ai/run/"
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self.session = requests.Session()
+        self.session.headers.update({
+            "Authorization": f"Bearer {api_token}",
+            "Content-Type": "application/json",
+        })
+        self._adapter = requests.adapters.HTTPAdapter(
+            pool_connections=1, pool_maxsize=pool_size, max_retries=0
+        )
+        self.session.mount("https://", self._adapter)
+
+        self._lock = threading.Lock()
+        self.retries = 0
+        self.requests_sent = 0
+
+    @classmethod
+    def from_env(cls) -> "CloudflareClient":
+        # Δημιουργεί τον client από τις μεταβλητές περιβάλλοντος (μία φορά ανά διεργασία).
+        load_dotenv(override=False)
+        return cls(
+            account_id=_require_env("CLOUDFLARE_ACCOUNT_ID"),
+            api_token=_require_env("CLOUDFLARE_API_TOKEN"),
+            pool_size=_env_int("CF_HTTP_POOL_SIZE", 10),
+            connect_timeout=_env_float("CF_HTTP_CONNECT_TIMEOUT", 10.0),
+            read_timeout=_env_float("CF_HTTP_READ_TIMEOUT", 60.0),
+            max_retries=_env_int("CF_HTTP_MAX_RETRIES", 3),
+        )
+
+    def post(self, model: str, payload: Dict[str, Any]) -> requests.Response:
+        # Στέλνει το αίτημα και επαναλαμβάνει σε 429/5xx ή σε αποτυχία σύνδεσης.
+        url = self.base_url + model
+        attempt = 0
+        while True:
+            with self._lock:
+                self.requests_sent += 1
+            try:
+                resp = self.session.post(url, json=payload, timeout=self.timeout)
+            except requests.exceptions.ConnectionError:
+                if attempt >= self.max_retries:
+                    raise
+                retry_after = None
+            else:
+                if resp.status_code not in RETRY_STATUS_CODES or attempt >= self.max_retries:
+                    resp.raise_for_status()
+                    return resp
+                retry_after = _parse_retry_after(resp.headers.get("Retry-After"))
+                resp.close()
+
+            with self._lock:
+                self.retries += 1
+            time.sleep(_backoff_delay(attempt, retry_after, self.backoff_base, self.backoff_max))
+            attempt += 1
+
+    def stats(self) -> Dict[str, int]:
+        # Οι μετρητές προέρχονται από τα connection pools του urllib3:
+        # κάθε αίτημα που δεν άνοιξε νέα σύνδεση επαναχρησιμοποίησε μια υπάρχουσα.
+        new_connections = 0
+        pooled_requests = 0
+        pools = self._adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            new_connections += getattr(pool, "num_connections", 0)
+            pooled_requests += getattr(pool, "num_requests", 0)
+        return {
+            "requests": self.requests_sent,
+            "retries": self.retries,
+            "new_connections": new_connections,
+            "reused_connections": max(0, pooled_requests - new_connections),
+        }
+
+    def close(self) -> None:
+        self.session.close()
+
+
+_client: Optional[CloudflareClient] = None
+_client_lock = threading.Lock()
+
+
+def get_cf_client() -> CloudflareClient:
+    # Επιστρέφει τον κοινό client της διεργασίας, δημιουργώντας τον στην πρώτη χρήση.
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = CloudflareClient.from_env()
+    return _client
+
+
+def _describe_http_error(error: Exception, response: Any) -> str:
+    # Προσπάθεια εξαγωγής λεπτομερούς μηνύματος σφάλματος από την απάντηση JSON.
+    error_msg = str(error)
+    try:
+        if response is not None:
+            try:
+                error_detail = response.json()
+                if 'errors' in error_detail and error_detail['errors']:
+                    error_msg = error_detail['errors'][0].get('message', str(error))
+                elif 'error' in error_detail:
+                    error_msg = str(error_detail['error'])
+                else:
+                    error_msg = f"{str(error)} - Response: {error_detail}"
+            except:
+                # Αν αποτύχει η ανάλυση JSON, χρησιμοποιώ το κείμενο της απόκρισης.
+                error_msg = f"{str(error)} - Response: {response.text[:500]}"
+    except Exception:
+        pass
+    return error_msg
+
+
+class TransientAPIError(RuntimeError):
+    # Σφάλμα που μπορεί να μην επαναληφθεί: timeout, αποτυχία σύνδεσης ή 429/5xx που
+    # παρέμεινε μετά τις επαναλήψεις του client. Τα υπόλοιπα (π.χ. 400/401/403) είναι οριστικά.
+    pass
+
+
 def _cf_request(model: str, payload: Dict[str, Any]) -> Dict[str, Any]:
-    # Εκτελεί HTTP POST αίτημα στο Cloudflare AI API.
-    load_dotenv(override=False)
-    account_id = _require_env("CLOUDFLARE_ACCOUNT_ID")
-    api_token = _require_env("CLOUDFLARE_API_TOKEN")
-
-    url = f"https://api.cloudflare.com/client/v4/accounts/{account_id}/ai/run/{model}"
-    headers = {
-        "Authorization": f"Bearer {api_token}",
-        "Content-Type": "application/json",
-    }
+    # Εκτελεί HTTP POST αίτημα στο Cloudflare AI API μέσω του κοινού client.
+    client = get_cf_client()
 
     try:
-        resp = requests.post(url, headers=headers, json=payload, timeout=60)
-        resp.raise_for_status()
+        resp = client.post(model, payload)
         return resp.json()
     except requests.exceptions.Timeout:
-        raise RuntimeError(f"Η αίτηση στο {model} άργησε πολύ (timeout).")
+        raise TransientAPIError(f"Η αίτηση στο {model} άργησε πολύ (timeout).")
     except requests.exceptions.HTTPError as e:
-        # Προσπάθεια εξαγωγής λεπτομερούς μηνύματος σφάλματος από την απάντηση JSON.
-        error_msg = str(e)
-        try:
-            if hasattr(e, 'response') and e.response is not None:
-                try:
-                    error_detail = e.response.json()
-                    if 'errors' in error_detail and error_detail['errors']:
-                        error_msg = error_detail['errors'][0].get('message', str(e))
-                    elif 'error' in error_detail:
-                        error_msg = str(error_detail['error'])
-                    else:
-                        error_msg = f"{str(e)} - Response: {error_detail}"
-                except:
-                    # Αν αποτύχει η ανάλυση JSON, χρησιμοποιώ το κείμενο της απόκρισης.
-                    error_msg = f"{str(e)} - Response: {e.response.text[:500]}"
-        except Exception:
-            pass
-        raise RuntimeError(f"API error προς το {model}: {error_msg}")
+        response = getattr(e, "response", None)
+        error_msg = _describe_http_error(e, response)
+        error_type = TransientAPIError if getattr(response, "status_code", None) in RETRY_STATUS_CODES else RuntimeError
+        raise error_type(f"API error προς το {model}: {error_msg}")
+    except requests.exceptions.ConnectionError as e:
+        raise TransientAPIError(f"API error προς το {model}: {str(e)}")
     except requests.exceptions.RequestException as e:
         raise RuntimeError(f"API error προς το {model}: {str(e)}")
     except json.JSONDecodeError as e:
         raise RuntimeError(f"Η απόκριση από το {model} δεν ήταν έγκυρο JSON: {str(e)}")
 
 
+class AsyncCloudflareClient:
+    # Asyncio εκδοχή του CloudflareClient για τα endpoints του server: τα αιτήματα
+    # περιμένουν το Cloudflare χωρίς να μπλοκάρουν το event loop του uvicorn worker.
+    def __init__(
+        self,
+        account_id: str,
+        api_token: str,
+        pool_size: int = 10,
+        connect_timeout: float = 10.0,
+        read_timeout: float = 60.0,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 20.0,
+    ):
+        self.base_url = f"https://api.cloudflare.com/client/v4/accounts/{account_id}/ai/run/"
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.client = httpx.AsyncClient(
+            headers={
+                "Authorization": f"Bearer {api_token}",
+                "Content-Type": "application/json",
+            },
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+        )
+        self.retries = 0
+        self.requests_sent = 0
+        self.new_connections = 0
+
+    @classmethod
+    def from_env(cls) -> "AsyncCloudflareClient":
+        load_dotenv(override=False)
+        return cls(
+            account_id=_require_env("CLOUDFLARE_ACCOUNT_ID"),
+            api_token=_require_env("CLOUDFLARE_API_TOKEN"),
+            pool_size=_env_int("CF_HTTP_POOL_SIZE", 10),
+            connect_timeout=_env_float("CF_HTTP_CONNECT_TIMEOUT", 10.0),
+            read_timeout=_env_float("CF_HTTP_READ_TIMEOUT", 60.0),
+            max_retries=_env_int("CF_HTTP_MAX_RETRIES", 3),
+        )
+
+    async def _trace(self, event_name: str, info: Dict[str, Any]) -> None:
+        # Το httpcore αναφέρει εδώ κάθε νέα σύνδεση TCP· τα υπόλοιπα αιτήματα είναι επαναχρησιμοποιήσεις.
+        if event_name == "connection.connect_tcp.complete":
+            self.new_connections += 1
+
+    async def post(self, model: str, payload: Dict[str, Any]) -> httpx.Response:
+        # Στέλνει το αίτημα και επαναλαμβάνει σε 429/5xx ή σε αποτυχία σύνδεσης.
+        url = self.base_url + model
+        attempt = 0
+        while True:
+            self.requests_sent += 1
+            try:
+                resp = await self.client.post(url, json=payload, extensions={"trace": self._trace})
+            except (httpx.ConnectError, httpx.RemoteProtocolError):
+                if attempt >= self.max_retries:
+                    raise
+                retry_after = None
+            else:
+                if resp.status_code not in RETRY_STATUS_CODES or attempt >= self.max_retries:
+                    resp.raise_for_status()
+                    return resp
+                retry_after = _parse_retry_after(resp.headers.get("Retry-After"))
+
+            self.retries += 1
+            await asyncio.sleep(_backoff_delay(attempt, retry_after, self.backoff_base, self.backoff_max))
+            attempt += 1
+
+    async def post_stream(self, model: str, payload: Dict[str, Any]) -> httpx.Response:
+        # Όπως το post, αλλά επιστρέφει την απόκριση ανοιχτή για ανάγνωση σε ροή (το σώμα δεν
+        # έχει διαβαστεί). Οι επαναλήψεις γίνονται μόνο πριν αρχίσει η ροή· ο καλών κλείνει την
+        # απόκριση με aclose().
+        url = self.base_url + model
+        attempt = 0
+        while True:
+            self.requests_sent += 1
+            request = self.client.build_request("POST", url, json=payload, extensions={"trace": self._trace})
+            try:
+                resp = await self.client.send(request, stream=True)
+            except (httpx.ConnectError, httpx.RemoteProtocolError):
+                if attempt >= self.max_retries:
+                    raise
+                retry_after = None
+            else:
+                if resp.status_code not in RETRY_STATUS_CODES or attempt >= self.max_retries:
+                    if resp.is_error:
+                        # Το σώμα του σφάλματος διαβάζεται ώστε να φαίνεται στο μήνυμα.
+                        await resp.aread()
+                        await resp.aclose()
+                        resp.raise_for_status()
+                    return resp
+                retry_after = _parse_retry_after(resp.headers.get("Retry-After"))
+                await resp.aclose()
+
+            self.retries += 1
+            await asyncio.sleep(_backoff_delay(attempt, retry_after, self.backoff_base, self.backoff_max))
+            attempt += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "requests": self.requests_sent,
+            "retries": self.retries,
+            "new_connections": self.new_connections,
+            "reused_connections": max(0, self.requests_sent - self.new_connections),
+        }
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+
+_async_client: Optional[AsyncCloudflareClient] = None
+_async_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_async_cf_client() -> AsyncCloudflareClient:
+    # Ο async client είναι δεμένος στο event loop όπου δημιουργήθηκε· αν το loop αλλάξει
+    # (π.χ. διαδοχικά asyncio.run σε scripts), δημιουργείται νέος.
+    global _async_client, _async_client_loop
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_client_loop is not loop:
+        _async_client = AsyncCloudflareClient.from_env()
+        _async_client_loop = loop
+    return _async_client
+
+
+async def close_async_cf_client() -> None:
+    global _async_client, _async_client_loop
+    if _async_client is not None:
+        await _async_client.aclose()
+    _async_client = None
+    _async_client_loop = None
+
+
+def cf_client_stats() -> Dict[str, Optional[Dict[str, int]]]:
+    # Μετρητές των clients που έχουν ήδη δημιουργηθεί σε αυτή τη διεργασία.
+    return {
+        "sync": _client.stats() if _client is not None else None,
+        "async": _async_client.stats() if _async_client is not None else None,
+    }
+
+
+def close_cf_client() -> None:
+    global _client
+    if _client is not None:
+        _client.close()
+    _client = None
+
+
+async def _acf_request(model: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    # Async εκδοχή του _cf_request με τα ίδια μηνύματα σφάλματος.
+    client = get_async_cf_client()
+
+    try:
+        resp = await client.post(model, payload)
+        return resp.json()
+    except httpx.TimeoutException:
+        raise TransientAPIError(f"Η αίτηση στο {model} άργησε πολύ (timeout).")
+    except httpx.HTTPStatusError as e:
+        error_msg = _describe_http_error(e, e.response)
+        error_type = TransientAPIError if e.response.status_code in RETRY_STATUS_CODES else RuntimeError
+        raise error_type(f"API error προς το {model}: {error_msg}")
+    except httpx.TransportError as e:
+        raise TransientAPIError(f"API error προς το {model}: {str(e)}")
+    except httpx.HTTPError as e:
+        raise RuntimeError(f"API error προς το {model}: {str(e)}")
+    except json.JSONDecodeError as e:
+        raise RuntimeError(f"Η απόκριση από το {model} δεν ήταν έγκυρο JSON: {str(e)}")
+
+
 def _extract_vectors_from_response(container) -> List[List[float]]:
     # Εξάγει τα embeddings από τη δομή απόκρισης του Cloudflare API.
     vectors: List[List[float]] = []
@@ -82,22 +420,158 @@ def _extract_vectors_from_response(container) -> List[List[float]]:
     return vectors
 
 
-def _estimate_tokens(text: str) -> int:
-    # Υπολογίζει προσεγγιστικά τα tokens διαιρώντας τους χαρακτήρες διά 4.
-    return len(text) // 4
+def estimate_tokens(text: str, target: str = "tiktoken", upper: bool = False) -> int:
+    # Φτηνή εκτίμηση tokens από τους χαρακτήρες, βαθμονομημένη από τις ακριβείς μετρήσεις
+    # (TokenEstimator). Με upper=True προστίθεται το γνωστό περιθώριο σφάλματος, για όρια που
+    # δεν πρέπει να ξεπεραστούν. Αν ο εκτιμητής είναι απενεργοποιημένος: 4 (ή 3) χαρακτήρες/token.
+    estimator = get_token_estimator()
+    if estimator is None:
+        return len(text) // (3 if upper else 4)
+    return estimator.upper(text, target) if upper else estimator.estimate(text, target)
+
+
+class Tokenizer:
+    # Ο κωδικοποιητής tokens της διεργασίας. Το encoding του tiktoken φορτώνεται μία φορά (και,
+    # αν λείπει η βιβλιοθήκη ή το αρχείο του encoding, αποτυγχάνει μία φορά), αντί για αναζήτηση
+    # σε κάθε μέτρηση. Χωρίς encoding όλες οι μετρήσεις πέφτουν στο estimate_tokens.
+    def __init__(self, encoding: Any = None, batch_threads: int = 4):
+        self.encoding = encoding
+        self.batch_threads = max(1, batch_threads)
+        # Χαρακτήρες που προσθέτει κάθε token και αν ξεκινά στη μέση χαρακτήρα UTF-8·
+        # χτίζονται στην πρώτη χρήση του count_chunks.
+        self._token_chars: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "Tokenizer":
+        name = os.getenv("TOKENIZER_ENCODING", "cl100k_base")
+        try:
+            import tiktoken
+            encoding = tiktoken.get_encoding(name)
+        except Exception as e:
+            print(f"Warning: tiktoken encoding {name} unavailable ({e}); using estimates", file=sys.stderr)
+            encoding = None
+        return cls(encoding, batch_threads=_env_int("TOKENIZER_BATCH_THREADS", 4))
+
+    @property
+    def exact(self) -> bool:
+        return self.encoding is not None
+
+    @property
+    def name(self) -> str:
+        return self.encoding.name if self.encoding is not None else "estimate"
+
+    def count(self, text: str) -> int:
+        if self.encoding is None:
+            return estimate_tokens(text)
+        return len(self.encoding.encode_ordinary(text))
+
+    def count_batch(self, texts: List[str]) -> List[int]:
+        # Μετρά πολλά κείμενα με μία κλήση encode_ordinary_batch (παράλληλα, χωρίς GIL)·
+        # τα μικρά batches μετρώνται σειριακά, αφού το batch στήνει δικό του thread pool.
+        if self.encoding is None:
+            return [estimate_tokens(t) for t in texts]
+        if self.batch_threads == 1 or len(texts) < 2 * self.batch_threads:
+            return [len(self.encoding.encode_ordinary(t)) for t in texts]
+        return [len(tokens) for tokens in self.encoding.encode_ordinary_batch(texts, num_threads=self.batch_threads)]
+
+    def count_chunks(self, text: str, chunks: List[str], head: str = "") -> Tuple[List[int], int]:
+        # Μετρά τα tokens των chunks μιας σελίδας και της ίδιας της σελίδας με μία κωδικοποίηση.
+        # Κάθε chunk είναι head + " " + συνεχές τμήμα του κειμένου με ενιαία κενά (ή σκέτο το
+        # τμήμα, χωρίς head). Ο pre-tokenizer ξεκινά νέο κομμάτι σε κάθε κενό, άρα τα tokens του
+        # " " + τμήμα είναι ακριβώς τα tokens της σελίδας που ξεκινούν μέσα σε αυτό. Επιστρέφει
+        # (tokens ανά chunk, tokens της σελίδας με ενιαία κενά).
+        normalized = " ".join(text.split())
+        if self.encoding is None:
+            return [estimate_tokens(c) for c in chunks], estimate_tokens(normalized)
+        starts = self.token_starts(" " + normalized)
+        head_tokens = self.count(head) if head else 0
+
+        counts: List[int] = []
+        unmatched: List[int] = []
+        cursor = 0
+        for i, chunk in enumerate(chunks):
+            body = chunk
+            if head:
+                body = chunk[len(head) + 1:] if chunk.startswith(head + " ") else ""
+            start = _find_words(normalized, body, cursor) if body else -1
+            if start < 0:
+                unmatched.append(i)
+                counts.append(0)
+                continue
+            cursor = start
+            end = start + len(body)
+            inner = int(np.searchsorted(starts, end + 1) - np.searchsorted(starts, start))
+            counts.append(head_tokens + inner if head else inner - self.leading_space_tokens(body))
+        # Ό,τι δεν αντιστοιχεί σε τμήμα της σελίδας μετριέται κανονικά.
+        for i, n in zip(unmatched, self.count_batch([chunks[i] for i in unmatched])):
+            counts[i] = n
+        return counts, len(starts) - self.leading_space_tokens(normalized)
+
+    def leading_space_tokens(self, text: str) -> int:
+        # Πόσα tokens προσθέτει το κενό μπροστά στο κείμενο· αρκεί η πρώτη λέξη.
+        if not text:
+            return self.count(" ")
+        word = text.split(" ", 1)[0]
+        return self.count(" " + word) - self.count(word)
+
+    def token_starts(self, text: str) -> np.ndarray:
+        # Θέση χαρακτήρα όπου ξεκινά κάθε token του κειμένου (όπως στο decode_with_offsets),
+        # διανυσματικά. Χωρίς encoding τα εκτιμώμενα tokens μοιράζονται ομοιόμορφα στο κείμενο.
+        if self.encoding is None:
+            count = estimate_tokens(text)
+            return (np.arange(count, dtype=np.int64) * len(text)) // max(count, 1)
+        tokens = self.encoding.encode_to_numpy(text, disallowed_special=())
+        if self._token_chars is None:
+            with self._lock:
+                if self._token_chars is None:
+                    self._token_chars = self._build_token_chars()
+        chars, mid = self._token_chars
+        ids = tokens.astype(np.int64)
+        widths = chars[ids]
+        return np.cumsum(widths) - widths - mid[ids]
+
+    def _build_token_chars(self) -> Tuple[np.ndarray, np.ndarray]:
+        chars = np.zeros(self.encoding.n_vocab, dtype=np.int64)
+        mid = np.zeros(self.encoding.n_vocab, dtype=np.int64)
+        for token in range(self.encoding.n_vocab):
+            try:
+                data = self.encoding.decode_single_token_bytes(token)
+            except KeyError:
+                continue
+            chars[token] = sum(1 for b in data if not 0x80 <= b < 0xC0)
+            mid[token] = 1 if data and 0x80 <= data[0] < 0xC0 else 0
+        return chars, mid
+
+
+def _find_words(text: str, part: str, start: int) -> int:
+    # Πρώτη θέση >= start όπου το part εμφανίζεται ως ολόκληρες λέξεις, ή -1.
+    pos = text.find(part, start)
+    while pos >= 0:
+        end = pos + len(part)
+        if (pos == 0 or text[pos - 1] == " ") and (end == len(text) or text[end] == " "):
+            return pos
+        pos = text.find(part, pos + 1)
+    return -1
+
+
+_tokenizer: Optional[Tokenizer] = None
+_tokenizer_lock = threading.Lock()
+
+
+def get_tokenizer() -> Tokenizer:
+    # Επιστρέφει τον κοινό κωδικοποιητή της διεργασίας, δημιουργώντας τον στην πρώτη χρήση.
+    global _tokenizer
+    if _tokenizer is None:
+        with _tokenizer_lock:
+            if _tokenizer is None:
+                _tokenizer = Tokenizer.from_env()
+    return _tokenizer
 
 
 def count_tokens_llama(text: str) -> int:
-    # Υπολογίζει τον ακριβή αριθμό tokens χρησιμοποιώντας το tiktoken, αν είναι διαθέσιμο.
-    try:
-        import tiktoken
-        encoding = tiktoken.get_encoding("cl100k_base")
-        return len(encoding.encode(text))
-    except ImportError:
-        # Χρήση προσεγγιστικής μεθόδου αν λείπει η βιβλιοθήκη tiktoken.
-        return _estimate_tokens(text)
-    except Exception:
-        return _estimate_tokens(text)
+    # Υπολογίζει τον αριθμό tokens με τον κοινό κωδικοποιητή (tiktoken αν είναι διαθέσιμο).
+    return get_tokenizer().count(text)
 
 
 def validate_token_budget(
@@ -145,15 +619,18 @@ def validate_token_budget(
 def calculate_optimal_k(
     total_chunks: int,
     total_tokens: int = 0,
-    max_context_tokens: int = 28000
+    max_context_tokens: int = 28000,
+    chunk_tokens: int = 0,
 ) -> int:
     # Υπολογίζει δυναμικά τον βέλτιστο αριθμό chunks (k) προς ανάκτηση.
     # Στόχος είναι η μέγιστη αξιοποίηση του context window χωρίς απώλεια πληροφορίας.
+    # Με τεμαχισμό σε tokens το chunk_tokens είναι το γνωστό μέγιστο μέγεθος ενός chunk και
+    # αντικαθιστά τον μέσο όρο tokens ανά chunk της συνεδρίας.
     
     # Για μικρά έγγραφα (≤10K tokens), προσπαθούμε να καλύψουμε το 100%.
     if total_tokens > 0 and total_tokens <= 10000:
         if total_chunks > 0:
-            avg_tokens_per_chunk = total_tokens / total_chunks
+            avg_tokens_per_chunk = chunk_tokens or total_tokens / total_chunks
             available_tokens = max_context_tokens - 4000
             max_k_by_tokens = max(8, int(available_tokens / avg_tokens_per_chunk))
             
@@ -183,7 +660,7 @@ def calculate_optimal_k(
     
     # Τελικός έλεγχος ώστε να μην ξεπεραστεί το context window.
     if total_tokens > 0 and total_chunks > 0:
-        avg_tokens_per_chunk = total_tokens / total_chunks
+        avg_tokens_per_chunk = chunk_tokens or total_tokens / total_chunks
         available_tokens = max_context_tokens - 4000
         max_k_by_tokens = max(8, int(available_tokens / avg_tokens_per_chunk))
         suggested_k = min(suggested_k, max_k_by_tokens)
@@ -193,22 +670,247 @@ def calculate_optimal_k(
     
     return optimal_k
 
-def embed_texts(texts: List[str], batch_size: int = None, max_tokens_per_batch: int = 50000) -> np.ndarray:
-    # Μετατρέπει μια λίστα κειμένων σε embeddings, χωρίζοντάς τα σε batches για το API.
-    if not texts:
-        return np.zeros((0, 0), dtype=np.float32)
+def _embed_batch(batch: List[str]) -> List[List[float]]:
+    # Αποστέλλει ένα batch κειμένων στο API και επιστρέφει τα διανύσματα με την ίδια σειρά.
+    raw = _cf_request(EMBEDDING_MODEL, {"text": batch})
+    container = raw.get("result", raw)
+    batch_vectors = _extract_vectors_from_response(container)
+    if len(batch_vectors) != len(batch):
+        raise RuntimeError(f"Το API επέστρεψε {len(batch_vectors)} embeddings για {len(batch)} κείμενα.")
+    return batch_vectors
+
+
+def _wake(waiter: asyncio.Future) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class InflightLimiter:
+    # Όριο ταυτόχρονων αιτημάτων κοινό για νήματα (with) και coroutines (async with), ώστε
+    # σύγχρονα και async embeddings της ίδιας διεργασίας να μοιράζονται το ίδιο όριο.
+    # Όταν ελευθερώνεται θέση και περιμένει coroutine, η θέση της παραδίδεται απευθείας
+    # στο event loop της.
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self._lock = threading.Lock()
+        self._released = threading.Condition(self._lock)
+        self._async_waiters: Deque[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = deque()
+
+    def acquire(self) -> None:
+        with self._released:
+            while self.active >= self.limit:
+                self._released.wait()
+            self.active += 1
+
+    async def aacquire(self) -> None:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self.active < self.limit and not self._async_waiters:
+                self.active += 1
+                return
+            waiter = loop.create_future()
+            self._async_waiters.append((loop, waiter))
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            # Αν η θέση είχε ήδη παραδοθεί πριν την ακύρωση, ελευθερώνεται ξανά.
+            with self._lock:
+                try:
+                    self._async_waiters.remove((loop, waiter))
+                    granted = False
+                except ValueError:
+                    granted = True
+            if granted:
+                self.release()
+            raise
+
+    def release(self) -> None:
+        with self._lock:
+            while self._async_waiters:
+                loop, waiter = self._async_waiters.popleft()
+                try:
+                    loop.call_soon_threadsafe(_wake, waiter)
+                    return
+                except RuntimeError:  # Το event loop έχει κλείσει.
+                    continue
+            self.active -= 1
+            self._released.notify()
+
+    def __enter__(self) -> "InflightLimiter":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
 
+    async def __aenter__(self) -> "InflightLimiter":
+        await self.aacquire()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.release()
+
+
+_embed_limiter: Optional[InflightLimiter] = None
+_embed_executor: Optional[ThreadPoolExecutor] = None
+_embed_init_lock = threading.Lock()
+
+
+def _get_embed_limiter() -> InflightLimiter:
+    # Ένα όριο ταυτόχρονων αιτημάτων embedding για όλη τη διεργασία (CF_EMBED_MAX_INFLIGHT),
+    # κοινό για embed_texts και aembed_texts, ώστε πολλά ταυτόχρονα uploads να μην πλημμυρίζουν το API.
+    global _embed_limiter
+    if _embed_limiter is None:
+        with _embed_init_lock:
+            if _embed_limiter is None:
+                load_dotenv(override=False)
+                _embed_limiter = InflightLimiter(max(1, _env_int("CF_EMBED_MAX_INFLIGHT", 4)))
+    return _embed_limiter
+
+
+def _get_embed_executor() -> Tuple[ThreadPoolExecutor, InflightLimiter]:
+    # Κοινό pool νημάτων για τα σύγχρονα embeddings, με όσα νήματα επιτρέπει το όριο.
+    global _embed_executor
+    limiter = _get_embed_limiter()
+    if _embed_executor is None:
+        with _embed_init_lock:
+            if _embed_executor is None:
+                _embed_executor = ThreadPoolExecutor(max_workers=limiter.limit, thread_name_prefix="cf-embed")
+    return _embed_executor, limiter
+
+
+def _batch_retry_delay(attempt: int, client) -> float:
+    # Οι επαναλήψεις ανά batch ακολουθούν όσες έκανε ήδη ο client, οπότε η αναμονή συνεχίζει να αυξάνεται.
+    return _backoff_delay(client.max_retries + attempt, None, client.backoff_base, client.backoff_max)
+
+
+class EmbeddingBatcher:
+    # Συγκεντρώνει κείμενα σε batches καθώς φτάνουν και κλείνει κάθε batch μόλις γεμίσει,
+    # είτε σε πλήθος κειμένων (batch_size) είτε σε εκτιμώμενα tokens (max_tokens_per_batch).
+    def __init__(self, batch_size: int, max_tokens_per_batch: int):
+        self.batch_size = batch_size
+        self.max_tokens_per_batch = max_tokens_per_batch
+        self._items: List[Any] = []
+        self._tokens = 0
+
+    def add(self, item: Any, tokens: int) -> Optional[List[Any]]:
+        # Επιστρέφει το προηγούμενο batch αν έπρεπε να κλείσει πριν προστεθεί το νέο στοιχείο.
+        completed = None
+        if self._items and (self._tokens + tokens > self.max_tokens_per_batch or len(self._items) >= self.batch_size):
+            completed = self.flush()
+        self._items.append(item)
+        self._tokens += tokens
+        return completed
+
+    def flush(self) -> Optional[List[Any]]:
+        if not self._items:
+            return None
+        completed, self._items, self._tokens = self._items, [], 0
+        return completed
+
+
+def _plan_embedding_batches(texts: List[str], batch_size: int, max_tokens_per_batch: int) -> List[List[int]]:
+    # Χωρίζει τα κείμενα σε batches (λίστες θέσεων) με βάση τον αριθμό tokens και το batch_size.
+    batches: List[List[int]] = []
+    batcher = EmbeddingBatcher(batch_size, max_tokens_per_batch)
+
+    for i, text in enumerate(texts):
+        text_tokens = estimate_tokens(text)
+
+        # Παράλειψη κειμένου αν υπερβαίνει μόνο του το όριο tokens.
+        if text_tokens > max_tokens_per_batch:
+            print(f"Warning: Text too large ({text_tokens} tokens), skipping...", file=sys.stderr)
+            continue
+
+        completed = batcher.add(i, text_tokens)
+        if completed:
+            batches.append(completed)
+
+    last = batcher.flush()
+    if last:
+        batches.append(last)
+    return batches
+
+
+def _embed_batch_with_retry(batch: List[str], limiter: InflightLimiter) -> np.ndarray:
+    # Στέλνει ένα batch με δικές του επαναλήψεις· η αποτυχία του δεν ακυρώνει τα υπόλοιπα.
+    # Επαναλαμβάνονται μόνο παροδικά σφάλματα (TransientAPIError), με backoff· τα υπόλοιπα
+    # (4xx, λάθος μορφή απόκρισης) προωθούνται αμέσως.
+    retries = max(0, _env_int("CF_EMBED_BATCH_RETRIES", 2))
+    for attempt in range(retries + 1):
+        try:
+            with limiter:
+                batch_vectors = _embed_batch(batch)
+        except TransientAPIError as e:
+            if attempt >= retries:
+                raise
+            print(f"Warning: embedding batch failed ({e}), retrying ({attempt + 1}/{retries})...", file=sys.stderr)
+            time.sleep(_batch_retry_delay(attempt, get_cf_client()))
+            continue
+        arr = np.array(batch_vectors, dtype=np.float32)
+        if arr.ndim != 2 or arr.size == 0:
+            raise RuntimeError("Λάθος μορφή embeddings από το API.")
+        # Εφαρμογή L2 κανονικοποίησης για χρήση με Cosine Similarity.
+        return arr / (np.linalg.norm(arr, axis=1, keepdims=True) + 1e-12)
+    raise RuntimeError("Αποτυχία υπολογισμού embeddings.")
+
+
+def _embed_uncached(
+    texts: List[str],
+    batch_size: int,
+    max_tokens_per_batch: int,
+    on_batch: Optional[Callable[[List[str], np.ndarray], None]] = None,
+) -> List[Optional[np.ndarray]]:
+    # Υπολογίζει embeddings μέσω του API για κείμενα που δεν βρέθηκαν στην cache.
+    # Τα batches στέλνονται ταυτόχρονα και τα αποτελέσματα τοποθετούνται στη θέση τους,
+    # οπότε η σειρά διατηρείται. Επιστρέφει ένα διάνυσμα ανά κείμενο, ή None για όσα παραλείφθηκαν.
+    results: List[Optional[np.ndarray]] = [None] * len(texts)
+    batches = _plan_embedding_batches(texts, batch_size, max_tokens_per_batch)
+    if not batches:
+        return results
+
+    executor, limiter = _get_embed_executor()
+    futures = {
+        executor.submit(_embed_batch_with_retry, [texts[i] for i in batch_idx], limiter): batch_idx
+        for batch_idx in batches
+    }
+
+    # Τα batches που ολοκληρώθηκαν κρατιούνται (π.χ. στην cache μέσω on_batch),
+    # ακόμη κι αν κάποιο άλλο batch αποτύχει οριστικά.
+    first_error: Optional[BaseException] = None
+    for future in as_completed(futures):
+        batch_idx = futures[future]
+        try:
+            arr = future.result()
+        except Exception as e:
+            first_error = first_error or e
+            continue
+        for i, vec in zip(batch_idx, arr):
+            results[i] = vec
+        if on_batch is not None:
+            on_batch([texts[i] for i in batch_idx], arr)
+
+    if first_error is not None:
+        raise first_error
+    return results
+
+
+def _prepare_embedding_inputs(
+    texts: List[str], batch_size: Optional[int], max_tokens_per_batch: int
+) -> Tuple[List[str], int]:
+    # Κοινός έλεγχος εισόδου για embed_texts/aembed_texts και υπολογισμός μεγέθους batch.
     if not isinstance(texts, list):
         raise ValueError("Πρέπει να περάσεις λίστα από strings.")
 
     valid_texts = [t for t in texts if isinstance(t, str) and t.strip()]
     if not valid_texts:
-        return np.zeros((0, 0), dtype=np.float32)
+        return [], 0
 
     # Υπολογισμός μεγέθους batch αν δεν έχει οριστεί.
     if batch_size is None:
         sample_size = min(10, len(valid_texts))
-        avg_tokens = sum(_estimate_tokens(t) for t in valid_texts[:sample_size]) / sample_size if valid_texts else 0
+        avg_tokens = sum(estimate_tokens(t) for t in valid_texts[:sample_size]) / sample_size if valid_texts else 0
         
         # Χρήση συντελεστή ασφαλείας 0.7 για αποφυγή υπέρβασης ορίου.
         calculated_batch_size = max(1, int((max_tokens_per_batch * 0.7) / avg_tokens) if avg_tokens > 0 else 20)
@@ -217,65 +919,159 @@ def embed_texts(texts: List[str], batch_size: int = None, max_tokens_per_batch:
         batch_size = min(calculated_batch_size, 40)
         batch_size = max(batch_size, 20)
 
+    return valid_texts, batch_size
+
+
+def _cache_lookup(cache, texts: List[str]) -> List[Optional[np.ndarray]]:
+    if cache is None:
+        return [None] * len(texts)
     try:
-        # Διαχωρισμός σε batches με βάση τον αριθμό tokens.
-        all_vectors = []
-        current_batch = []
-        current_tokens = 0
-        
-        for text in valid_texts:
-            text_tokens = _estimate_tokens(text)
-            
-            # Έλεγχος αν το τρέχον batch πρέπει να σταλεί.
-            should_send = False
-            if current_batch and (current_tokens + text_tokens > max_tokens_per_batch or len(current_batch) >= batch_size):
-                should_send = True
-            
-            if should_send:
-                # Αποστολή του τρέχοντος batch στο API.
-                raw = _cf_request(EMBEDDING_MODEL, {"text": current_batch})
-                container = raw.get("result", raw)
-                batch_vectors = _extract_vectors_from_response(container)
-                all_vectors.extend(batch_vectors)
-                
-                current_batch = []
-                current_tokens = 0
-            
-            current_batch.append(text)
-            current_tokens += text_tokens
-            
-            # Παράλειψη κειμένου αν υπερβαίνει μόνο του το όριο tokens.
-            if text_tokens > max_tokens_per_batch:
-                current_batch.pop()
-                current_tokens -= text_tokens
-                print(f"Warning: Text too large ({text_tokens} tokens), skipping...", file=sys.stderr)
-        
-        # Αποστολή του τελευταίου batch που απέμεινε.
-        if current_batch:
-            raw = _cf_request(EMBEDDING_MODEL, {"text": current_batch})
-            container = raw.get("result", raw)
-            batch_vectors = _extract_vectors_from_response(container)
-            all_vectors.extend(batch_vectors)
-        
-        vectors = all_vectors
+        return cache.get_many(EMBEDDING_MODEL, texts)
+    except Exception as e:
+        print(f"Warning: embedding cache read failed: {e}", file=sys.stderr)
+        return [None] * len(texts)
+
+
+def _cache_store(cache, texts: List[str], vectors: np.ndarray) -> None:
+    try:
+        cache.put_many(EMBEDDING_MODEL, texts, vectors)
+    except Exception as e:
+        print(f"Warning: embedding cache write failed: {e}", file=sys.stderr)
+
+
+def _assemble_vectors(
+    valid_texts: List[str],
+    vectors: List[Optional[np.ndarray]],
+    missing: List[str],
+    fresh: List[Optional[np.ndarray]],
+) -> np.ndarray:
+    # Επανασύνθεση με την αρχική σειρά· τα κείμενα που παραλείφθηκαν δεν έχουν διάνυσμα.
+    by_text = {t: v for t, v in zip(missing, fresh) if v is not None}
+    found = [v if v is not None else by_text.get(t) for t, v in zip(valid_texts, vectors)]
+    found = [v for v in found if v is not None]
+    if not found:
+        raise RuntimeError("Το API δεν έδωσε embeddings.")
+    return np.stack(found).astype(np.float32, copy=False)
 
-        if not vectors:
-            raise RuntimeError("Το API δεν έδωσε embeddings.")
 
-        arr = np.array(vectors, dtype=np.float32)
+def embed_texts(
+    texts: List[str],
+    batch_size: int = None,
+    max_tokens_per_batch: int = 50000,
+    use_cache: bool = True,
+) -> np.ndarray:
+    # Μετατρέπει μια λίστα κειμένων σε embeddings, χωρίζοντάς τα σε batches για το API.
+    # Τα κείμενα που υπάρχουν ήδη στην cache δεν στέλνονται ξανά στο Cloudflare.
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+
+    valid_texts, batch_size = _prepare_embedding_inputs(texts, batch_size, max_tokens_per_batch)
+    if not valid_texts:
+        return np.zeros((0, 0), dtype=np.float32)
+
+    try:
+        cache = get_embedding_cache() if use_cache else None
+        vectors = _cache_lookup(cache, valid_texts)
+
+        # Στο API στέλνονται μόνο τα μοναδικά κείμενα που έλειπαν από την cache.
+        missing = list(dict.fromkeys(t for t, v in zip(valid_texts, vectors) if v is None))
+        fresh: List[Optional[np.ndarray]] = []
+        if missing:
+            fresh = _embed_uncached(
+                missing, batch_size, max_tokens_per_batch,
+                on_batch=(lambda bt, bv: _cache_store(cache, bt, bv)) if cache is not None else None,
+            )
+
+        return _assemble_vectors(valid_texts, vectors, missing, fresh)
+
+    except Exception as e:
+        raise RuntimeError(f"Σφάλμα στον υπολογισμό embeddings: {str(e)}")
+
+
+async def _aembed_batch_with_retry(batch: List[str]) -> np.ndarray:
+    # Async εκδοχή του _embed_batch_with_retry, με το ίδιο όριο ταυτόχρονων αιτημάτων.
+    limiter = _get_embed_limiter()
+    retries = max(0, _env_int("CF_EMBED_BATCH_RETRIES", 2))
+    for attempt in range(retries + 1):
+        try:
+            async with limiter:
+                raw = await _acf_request(EMBEDDING_MODEL, {"text": batch})
+        except TransientAPIError as e:
+            if attempt >= retries:
+                raise
+            print(f"Warning: embedding batch failed ({e}), retrying ({attempt + 1}/{retries})...", file=sys.stderr)
+            await asyncio.sleep(_batch_retry_delay(attempt, get_async_cf_client()))
+            continue
+        container = raw.get("result", raw)
+        batch_vectors = _extract_vectors_from_response(container)
+        if len(batch_vectors) != len(batch):
+            raise RuntimeError(f"Το API επέστρεψε {len(batch_vectors)} embeddings για {len(batch)} κείμενα.")
+        arr = np.array(batch_vectors, dtype=np.float32)
         if arr.ndim != 2 or arr.size == 0:
             raise RuntimeError("Λάθος μορφή embeddings από το API.")
+        return arr / (np.linalg.norm(arr, axis=1, keepdims=True) + 1e-12)
+    raise RuntimeError("Αποτυχία υπολογισμού embeddings.")
+
+
+async def _aembed_uncached(
+    texts: List[str],
+    batch_size: int,
+    max_tokens_per_batch: int,
+    on_batch: Optional[Callable[[List[str], np.ndarray], None]] = None,
+) -> List[Optional[np.ndarray]]:
+    # Async εκδοχή του _embed_uncached: όλα τα batches ξεκινούν μαζί, το limiter ορίζει
+    # πόσα βρίσκονται πραγματικά σε εξέλιξη, και η σειρά διατηρείται βάσει θέσης.
+    results: List[Optional[np.ndarray]] = [None] * len(texts)
+    batches = _plan_embedding_batches(texts, batch_size, max_tokens_per_batch)
+
+    async def _run(batch_idx: List[int]) -> None:
+        batch_texts = [texts[i] for i in batch_idx]
+        arr = await _aembed_batch_with_retry(batch_texts)
+        for i, vec in zip(batch_idx, arr):
+            results[i] = vec
+        if on_batch is not None:
+            await asyncio.to_thread(on_batch, batch_texts, arr)
+
+    outcomes = await asyncio.gather(*(_run(b) for b in batches), return_exceptions=True)
+    for outcome in outcomes:
+        if isinstance(outcome, BaseException):
+            raise outcome
+    return results
 
-        # Εφαρμογή L2 κανονικοποίησης για χρήση με Cosine Similarity.
-        norms = np.linalg.norm(arr, axis=1, keepdims=True) + 1e-12
-        return arr / norms
+
+async def aembed_texts(
+    texts: List[str],
+    batch_size: int = None,
+    max_tokens_per_batch: int = 50000,
+    use_cache: bool = True,
+) -> np.ndarray:
+    # Async εκδοχή του embed_texts για χρήση μέσα στα endpoints του server.
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+
+    valid_texts, batch_size = _prepare_embedding_inputs(texts, batch_size, max_tokens_per_batch)
+    if not valid_texts:
+        return np.zeros((0, 0), dtype=np.float32)
+
+    try:
+        cache = get_embedding_cache() if use_cache else None
+        vectors = await asyncio.to_thread(_cache_lookup, cache, valid_texts)
+
+        missing = list(dict.fromkeys(t for t, v in zip(valid_texts, vectors) if v is None))
+        fresh: List[Optional[np.ndarray]] = []
+        if missing:
+            fresh = await _aembed_uncached(
+                missing, batch_size, max_tokens_per_batch,
+                on_batch=(lambda bt, bv: _cache_store(cache, bt, bv)) if cache is not None else None,
+            )
+
+        return _assemble_vectors(valid_texts, vectors, missing, fresh)
 
     except Exception as e:
         raise RuntimeError(f"Σφάλμα στον υπολογισμό embeddings: {str(e)}")
 
 
-def chat(messages: List[Dict[str, str]]) -> Tuple[str, Dict[str, int]]:
-    # Στέλνει μια συνομιλία στο LLM και επιστρέφει την απάντηση και τη χρήση tokens.
+def _validate_messages(messages: List[Dict[str, str]]) -> None:
     if not messages:
         raise ValueError("Η λίστα μηνυμάτων είναι άδεια.")
 
@@ -287,41 +1083,120 @@ def chat(messages: List[Dict[str, str]]) -> Tuple[str, Dict[str, int]]:
         if not isinstance(msg["content"], str):
             raise ValueError(f"Το content του {i} πρέπει να είναι string.")
 
+
+def _parse_chat_response(raw: Dict[str, Any]) -> Tuple[str, Dict[str, int]]:
+    # Εξάγει το κείμενο της απάντησης και τη χρήση tokens από την απόκριση του LLM.
+    container = raw.get("result", raw)
+
+    text = (
+        container.get("response")
+        or container.get("text")
+        or container.get("result")
+    )
+
+    # Εξαγωγή στατιστικών χρήσης tokens από το API.
+    usage = container.get("usage", {})
+    token_usage = {
+        "prompt_tokens": usage.get("prompt_tokens", 0),
+        "completion_tokens": usage.get("completion_tokens", 0),
+        "total_tokens": usage.get("total_tokens", 0)
+    }
+
+    if not text:
+        # Αν η απάντηση είναι κενή, ελέγχω αν οφείλεται σε υπέρβαση ορίου tokens.
+        prompt_tokens = token_usage["prompt_tokens"]
+        completion_tokens = token_usage["completion_tokens"]
+        
+        if prompt_tokens > 30000 and completion_tokens == 0:
+            raise RuntimeError(
+                f"Το prompt είναι πολύ μεγάλο ({prompt_tokens} tokens). "
+                f"Το LLM δεν μπόρεσε να απαντήσει. Προσπαθήστε με μικρότερη ερώτηση ή λιγότερα αποσπάσματα."
+            )
+        raise RuntimeError(f"Άδεια/άκυρη απόκριση από LLM: {json.dumps(raw)[:500]}")
+
+    return str(text).strip(), token_usage
+
+
+def chat(messages: List[Dict[str, str]]) -> Tuple[str, Dict[str, int]]:
+    # Στέλνει μια συνομιλία στο LLM και επιστρέφει την απάντηση και τη χρήση tokens.
+    _validate_messages(messages)
+
     try:
         raw = _cf_request(LLM_MODEL, {"messages": messages})
-        container = raw.get("result", raw)
+        return _parse_chat_response(raw)
+    except Exception as e:
+        raise RuntimeError(f"Σφάλμα στο chat με LLM: {str(e)}")
 
-        text = (
-            container.get("response")
-            or container.get("text")
-            or container.get("result")
-        )
 
-        # Εξαγωγή στατιστικών χρήσης tokens από το API.
-        usage = container.get("usage", {})
-        token_usage = {
-            "prompt_tokens": usage.get("prompt_tokens", 0),
-            "completion_tokens": usage.get("completion_tokens", 0),
-            "total_tokens": usage.get("total_tokens", 0)
-        }
+async def achat(messages: List[Dict[str, str]]) -> Tuple[str, Dict[str, int]]:
+    # Async εκδοχή του chat για χρήση μέσα στα endpoints του server.
+    _validate_messages(messages)
 
-        if not text:
-            # Αν η απάντηση είναι κενή, ελέγχω αν οφείλεται σε υπέρβαση ορίου tokens.
-            prompt_tokens = token_usage["prompt_tokens"]
-            completion_tokens = token_usage["completion_tokens"]
-            
-            if prompt_tokens > 30000 and completion_tokens == 0:
-                raise RuntimeError(
-                    f"Το prompt είναι πολύ μεγάλο ({prompt_tokens} tokens). "
-                    f"Το LLM δεν μπόρεσε να απαντήσει. Προσπαθήστε με μικρότερη ερώτηση ή λιγότερα αποσπάσματα."
-                )
-            raise RuntimeError(f"Άδεια/άκυρη απόκριση από LLM: {json.dumps(raw)[:500]}")
-
-        return str(text).strip(), token_usage
+    try:
+        raw = await _acf_request(LLM_MODEL, {"messages": messages})
+        return _parse_chat_response(raw)
     except Exception as e:
         raise RuntimeError(f"Σφάλμα στο chat με LLM: {str(e)}")
 
 
+async def achat_stream(messages: List[Dict[str, str]]) -> AsyncIterator[Tuple[str, Any]]:
+    # Streaming εκδοχή του achat: ζητά από το Cloudflare απόκριση σε ροή ("stream": true) και
+    # δίνει ("token", κείμενο) για κάθε κομμάτι της απάντησης όπως φτάνει, και στο τέλος
+    # ("usage", token_usage). Οι γραμμές της ροής είναι Server-Sent Events της μορφής
+    # `data: {"response": "..."}` και τελειώνουν με `data: [DONE]`· το usage έρχεται, αν
+    # υπάρχει, στο τελευταίο γεγονός. Αν λείπει, υπολογίζεται τοπικά με το tiktoken.
+    _validate_messages(messages)
+
+    client = get_async_cf_client()
+    pieces: List[str] = []
+    usage: Dict[str, Any] = {}
+    try:
+        resp = await client.post_stream(LLM_MODEL, {"messages": messages, "stream": True})
+        try:
+            async for line in resp.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                if not data:
+                    continue
+                event = json.loads(data)
+                text = event.get("response")
+                if text:
+                    pieces.append(text)
+                    yield "token", text
+                if event.get("usage"):
+                    usage = event["usage"]
+        finally:
+            await resp.aclose()
+    except httpx.TimeoutException:
+        raise RuntimeError(f"Σφάλμα στο chat με LLM: Η αίτηση στο {LLM_MODEL} άργησε πολύ (timeout).")
+    except httpx.HTTPStatusError as e:
+        raise RuntimeError(f"Σφάλμα στο chat με LLM: API error προς το {LLM_MODEL}: {_describe_http_error(e, e.response)}")
+    except httpx.HTTPError as e:
+        raise RuntimeError(f"Σφάλμα στο chat με LLM: API error προς το {LLM_MODEL}: {str(e)}")
+    except json.JSONDecodeError as e:
+        raise RuntimeError(f"Σφάλμα στο chat με LLM: Η ροή από το {LLM_MODEL} δεν ήταν έγκυρο JSON: {str(e)}")
+
+    if not "".join(pieces).strip():
+        raise RuntimeError("Σφάλμα στο chat με LLM: Άδεια απόκριση από LLM.")
+
+    if not usage:
+        prompt_tokens, completion_tokens = get_tokenizer().count_batch(
+            ["\n".join(m["content"] for m in messages), "".join(pieces)]
+        )
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "counted_locally": True}
+    token_usage = {
+        "prompt_tokens": usage.get("prompt_tokens", 0),
+        "completion_tokens": usage.get("completion_tokens", 0),
+        "total_tokens": usage.get("total_tokens", 0) or usage.get("prompt_tokens", 0) + usage.get("completion_tokens", 0),
+    }
+    if usage.get("counted_locally"):
+        token_usage["counted_locally"] = True
+    yield "usage", token_usage
+
+
 def build_rag_prompt(
     question: str,
     contexts: List[Tuple[str, int, str]],
@@ -344,22 +1219,22 @@ def build_rag_prompt(
             valid_contexts.append((src, page, text.strip()))
 
     # Περικοπή των κειμένων αν υπερβαίνουν το όριο context.
-    # Χρησιμοποιώ έναν συντηρητικό υπολογισμό (3 chars/token).
-    total_chars = 0
+    # Χρησιμοποιώ την άνω εκτίμηση tokens του μοντέλου chat (εκτίμηση + περιθώριο σφάλματος).
+    total_tokens = 0
     truncated_contexts = []
-    max_chars = max_context_tokens * 3
     
     for src, page, text in valid_contexts:
-        text_chars = len(text)
-        if total_chars + text_chars > max_chars:
-            # Περικοπή κειμένου ώστε να τηρηθεί το όριο.
-            remaining_chars = max(0, max_chars - total_chars - 200)
+        text_tokens = estimate_tokens(text, target="api", upper=True)
+        if total_tokens + text_tokens > max_context_tokens:
+            # Περικοπή κειμένου ώστε να τηρηθεί το όριο, αναλογικά σε χαρακτήρες.
+            remaining_tokens = max(0, max_context_tokens - total_tokens - 64)
+            remaining_chars = len(text) * remaining_tokens // max(text_tokens, 1)
             if remaining_chars > 200:
                 truncated_text = text[:remaining_chars] + "... [κομμένο]"
                 truncated_contexts.append((src, page, truncated_text))
             break
         truncated_contexts.append((src, page, text))
-        total_chars += text_chars
+        total_tokens += text_tokens
 
     context_block = "\n\n".join([t for _, _, t in truncated_contexts])
 
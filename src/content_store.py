@@ -0,0 +1,181 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: αρκεί το κλείδωμα εντός της διεργασίας.
+    fcntl = None
+
+
+def content_key(sha256: str, params: Dict[str, Any]) -> str:
+    # Κλειδί βάσει περιεχομένου: το hash του αρχείου μαζί με τις παραμέτρους τεμαχισμού
+    # και το μοντέλο embeddings. Αν αλλάξει οποιαδήποτε παράμετρος, το αρχείο ξαναεπεξεργάζεται.
+    payload = json.dumps(params, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(f"{sha256}\0{payload}".encode("utf-8")).hexdigest()
+
+
+@dataclass
+class StoredContent:
+    # Ολοκληρωμένο αποτέλεσμα εισαγωγής ενός αρχείου: (σελίδα, κείμενο, tokens) ανά chunk,
+    # τα διανύσματά τους με την ίδια σειρά και τα στατιστικά του εγγράφου.
+    chunks: List[Tuple[int, str, int]]
+    vectors: np.ndarray
+    metadata: Dict[str, Any]
+
+
+class ContentStore:
+    # Αποθήκη αποτελεσμάτων εισαγωγής, κοινή για όλες τις συνεδρίες και τους workers.
+    # Κάθε εγγραφή είναι ένας φάκελος entries/<key>/ με chunks.json και vectors.npy.
+    # Το refs.json αντιστοιχίζει κάθε αναφορά "session_id/filename" στο κλειδί που
+    # χρησιμοποιεί· όταν ένα κλειδί μείνει χωρίς αναφορές, ο φάκελός του διαγράφεται.
+    def __init__(self, store_dir: str):
+        self.store_dir = store_dir
+        self.entries_dir = os.path.join(store_dir, "entries")
+        self.refs_path = os.path.join(store_dir, "refs.json")
+        self.lock_path = os.path.join(store_dir, ".lock")
+        os.makedirs(self.entries_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.reclaimed = 0
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.entries_dir, key)
+
+    @contextmanager
+    def _file_lock(self):
+        # Αποκλειστικό κλείδωμα μεταξύ διεργασιών (gunicorn workers) για τις αναφορές.
+        with self._lock, open(self.lock_path, "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _read_refs(self) -> Dict[str, str]:
+        try:
+            with open(self.refs_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def _write_refs(self, refs: Dict[str, str]) -> None:
+        tmp_path = f"{self.refs_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(refs, f, ensure_ascii=False)
+        os.replace(tmp_path, self.refs_path)
+
+    def get(self, key: str) -> Optional[StoredContent]:
+        # Επιστρέφει την αποθηκευμένη εγγραφή ή None αν λείπει ή είναι ελλιπής.
+        entry_dir = self._entry_dir(key)
+        try:
+            with open(os.path.join(entry_dir, "chunks.json"), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            vectors = np.load(os.path.join(entry_dir, "vectors.npy"))
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        chunks = [(int(page), text, int(tokens)) for page, text, tokens in data["chunks"]]
+        return StoredContent(chunks=chunks, vectors=vectors, metadata=data["metadata"])
+
+    def put(self, key: str, content: StoredContent) -> None:
+        # Γράφει την εγγραφή σε προσωρινό φάκελο και τη δημοσιεύει με μία μετονομασία,
+        # ώστε οι αναγνώστες να βλέπουν είτε ολόκληρη την εγγραφή είτε τίποτα.
+        entry_dir = self._entry_dir(key)
+        if os.path.isdir(entry_dir):
+            return
+        tmp_dir = os.path.join(self.entries_dir, f".tmp-{uuid.uuid4().hex}")
+        os.makedirs(tmp_dir)
+        try:
+            with open(os.path.join(tmp_dir, "chunks.json"), "w", encoding="utf-8") as f:
+                json.dump({"chunks": content.chunks, "metadata": content.metadata}, f, ensure_ascii=False)
+            np.save(os.path.join(tmp_dir, "vectors.npy"), np.ascontiguousarray(content.vectors, dtype=np.float32))
+            os.rename(tmp_dir, entry_dir)
+        except OSError:
+            # Άλλος worker δημοσίευσε ήδη την ίδια εγγραφή.
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def acquire(self, ref: str, key: str) -> None:
+        # Καταγράφει ότι η αναφορά χρησιμοποιεί το κλειδί. Αν η αναφορά έδειχνε σε άλλο
+        # κλειδί (νέα έκδοση αρχείου με το ίδιο όνομα), το παλιό αποδεσμεύεται.
+        with self._file_lock():
+            refs = self._read_refs()
+            previous = refs.get(ref)
+            refs[ref] = key
+            self._write_refs(refs)
+            if previous and previous != key:
+                self._reclaim(refs, [previous])
+
+    def release(self, ref: str) -> None:
+        with self._file_lock():
+            refs = self._read_refs()
+            key = refs.pop(ref, None)
+            if key is None:
+                return
+            self._write_refs(refs)
+            self._reclaim(refs, [key])
+
+    def release_session(self, session_id: str) -> None:
+        # Αποδεσμεύει όλες τις αναφορές μιας συνεδρίας (διαγραφή συνεδρίας).
+        prefix = f"{session_id}/"
+        with self._file_lock():
+            refs = self._read_refs()
+            released = [ref for ref in refs if ref.startswith(prefix)]
+            if not released:
+                return
+            keys = [refs.pop(ref) for ref in released]
+            self._write_refs(refs)
+            self._reclaim(refs, keys)
+
+    def _reclaim(self, refs: Dict[str, str], keys: List[str]) -> None:
+        # Διαγράφει τις εγγραφές που δεν έχουν πλέον καμία αναφορά.
+        live = set(refs.values())
+        for key in set(keys) - live:
+            entry_dir = self._entry_dir(key)
+            if os.path.isdir(entry_dir):
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                self.reclaimed += 1
+
+    def stats(self) -> Dict[str, float]:
+        refs = self._read_refs()
+        total = self.hits + self.misses
+        return {
+            "entries": len(set(refs.values())),
+            "references": len(refs),
+            "hits": self.hits,
+            "misses": self.misses,
+            "reclaimed": self.reclaimed,
+            "hit_rate": (self.hits / total) if total else 0.0,
+        }
+
+
+_store: Optional[ContentStore] = None
+_store_lock = threading.Lock()
+
+
+def get_content_store() -> Optional[ContentStore]:
+    # Επιστρέφει την κοινή αποθήκη της διεργασίας, ή None αν έχει απενεργοποιηθεί.
+    global _store
+    if os.getenv("CONTENT_STORE_ENABLED", "1") != "1":
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                store_dir = os.getenv("CONTENT_STORE_DIR") or os.path.join(
+                    os.getenv("DATA_DIR", "./data"), "content_store"
+                )
+                _store = ContentStore(store_dir)
+    return _store
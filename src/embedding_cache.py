@@ -0,0 +1,280 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: αρκεί το κλείδωμα εντός της διεργασίας.
+    fcntl = None
+
+
+def embedding_key(model: str, text: str) -> str:
+    # Κλειδί βάσει περιεχομένου: ίδιο μοντέλο και ίδιο κείμενο δίνουν πάντα το ίδιο κλειδί.
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+# Εγγραφή του πίνακα κλειδιών: sha256 του κλειδιού και χρόνος τελευταίας χρήσης. Η εγγραφή i
+# αντιστοιχεί στη γραμμή i του πίνακα διανυσμάτων, οπότε η γραμμή δεν αποθηκεύεται.
+_KEY_RECORD = np.dtype([("key", "u1", (32,)), ("used", "<f8")])
+_USED_OFFSET = _KEY_RECORD.fields["used"][1]
+
+
+def _record_keys(records: np.ndarray) -> List[bytes]:
+    raw = np.ascontiguousarray(records["key"]).tobytes()
+    return [raw[i:i + 32] for i in range(0, len(raw), 32)]
+
+
+class EmbeddingCache:
+    # Μόνιμη cache embeddings στον δίσκο, κοινή για όλες τις συνεδρίες και τους workers.
+    # Τα διανύσματα γράφονται σε έναν append-only πίνακα float32 (vectors-<gen>.f32) και τα
+    # κλειδιά σε έναν append-only πίνακα εγγραφών σταθερού μήκους (keys-<gen>.bin), που
+    # διαβάζονται με memory-mapping. Κάθε εγγραφή κρατά και τον χρόνο τελευταίας χρήσης (για LRU
+    # eviction), που ενημερώνεται επιτόπου. Τα δύο αρχεία ξαναγράφονται μόνο στη συμπύκνωση,
+    # ενώ το state.json (διάσταση και γενιά) αλλάζει μόνο τότε.
+    def __init__(self, cache_dir: str, max_bytes: int = 256 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.state_path = os.path.join(cache_dir, "state.json")
+        self.lock_path = os.path.join(cache_dir, ".lock")
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._rows: Dict[bytes, int] = {}  # sha256 κλειδιού -> γραμμή
+        self.dim = 0
+        self.generation = 0
+        self.next_row = 0  # Εγγραφές του πίνακα κλειδιών που έχουν διαβαστεί.
+        self._state_stamp = None
+        self._matrix: Optional[np.memmap] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _vectors_path(self, generation: int) -> str:
+        return os.path.join(self.cache_dir, f"vectors-{generation}.f32")
+
+    def _keys_path(self, generation: int) -> str:
+        return os.path.join(self.cache_dir, f"keys-{generation}.bin")
+
+    @property
+    def max_rows(self) -> int:
+        return max(1, self.max_bytes // (max(self.dim, 1) * 4))
+
+    @contextmanager
+    def _file_lock(self):
+        # Αποκλειστικό κλείδωμα μεταξύ διεργασιών (gunicorn workers) για τις εγγραφές.
+        with open(self.lock_path, "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _reset(self, dim: int, generation: int) -> None:
+        self._rows = {}
+        self.dim = dim
+        self.generation = generation
+        self.next_row = 0
+        self._matrix = None
+
+    def _refresh(self) -> None:
+        # Συγχρονίζεται με τον δίσκο (π.χ. με εγγραφές άλλου worker). Νέα γενιά σημαίνει νέο
+        # πίνακα κλειδιών· αλλιώς διαβάζονται μόνο οι εγγραφές που προστέθηκαν από την
+        # προηγούμενη φορά, οπότε το κόστος είναι ανάλογο των νέων κλειδιών και όχι της cache.
+        try:
+            st = os.stat(self.state_path)
+        except FileNotFoundError:
+            return
+        stamp = (st.st_mtime_ns, st.st_size)
+        if stamp != self._state_stamp:
+            try:
+                with open(self.state_path, "r", encoding="utf-8") as f:
+                    state = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                return
+            if state.get("generation", 0) != self.generation or state.get("dim", 0) != self.dim:
+                self._reset(state.get("dim", 0), state.get("generation", 0))
+            self._state_stamp = stamp
+
+        try:
+            with open(self._keys_path(self.generation), "rb") as f:
+                total = os.fstat(f.fileno()).st_size // _KEY_RECORD.itemsize
+                if total <= self.next_row:
+                    return
+                f.seek(self.next_row * _KEY_RECORD.itemsize)
+                records = np.fromfile(f, dtype=_KEY_RECORD, count=total - self.next_row)
+        except FileNotFoundError:
+            return
+        for offset, key in enumerate(_record_keys(records)):
+            self._rows[key] = self.next_row + offset
+        self.next_row += len(records)
+
+    def _write_state(self) -> None:
+        tmp_path = f"{self.state_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"dim": self.dim, "generation": self.generation}, f)
+        os.replace(tmp_path, self.state_path)
+        st = os.stat(self.state_path)
+        self._state_stamp = (st.st_mtime_ns, st.st_size)
+
+    def _touch(self, rows: List[int]) -> None:
+        # Ενημερώνει επιτόπου τον χρόνο τελευταίας χρήσης στις εγγραφές των κλειδιών.
+        used = np.array([time.time()], dtype="<f8").tobytes()
+        try:
+            with open(self._keys_path(self.generation), "r+b") as f:
+                for row in rows:
+                    f.seek(row * _KEY_RECORD.itemsize + _USED_OFFSET)
+                    f.write(used)
+        except OSError:
+            pass
+
+    def _matrix_view(self, needed_rows: int) -> Optional[np.memmap]:
+        # Επαναχαρτογραφεί το αρχείο μόνο όταν έχουν προστεθεί γραμμές μετά το τελευταίο mmap.
+        if self._matrix is not None and self._matrix.shape[0] >= needed_rows:
+            return self._matrix
+        path = self._vectors_path(self.generation)
+        if not self.dim or not os.path.exists(path):
+            return None
+        rows = os.path.getsize(path) // (self.dim * 4)
+        if rows < needed_rows or rows == 0:
+            return None
+        self._matrix = np.memmap(path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+        return self._matrix
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        # Επιστρέφει για κάθε κείμενο το αποθηκευμένο διάνυσμα ή None αν λείπει.
+        keys = [bytes.fromhex(embedding_key(model, t)) for t in texts]
+        with self._lock:
+            self._refresh()
+            rows = [self._rows.get(k) for k in keys]
+            found = [r for r in rows if r is not None]
+            matrix = self._matrix_view(max(found) + 1) if found else None
+            results: List[Optional[np.ndarray]] = []
+            for row in rows:
+                if row is None or matrix is None:
+                    results.append(None)
+                    continue
+                results.append(np.array(matrix[row], dtype=np.float32))
+            if matrix is not None and found:
+                self._touch(found)
+            hits = sum(1 for r in results if r is not None)
+            self.hits += hits
+            self.misses += len(results) - hits
+            return results
+
+    def put_many(self, model: str, texts: Sequence[str], vectors: np.ndarray) -> None:
+        # Προσθέτει νέα διανύσματα και τις εγγραφές τους στο τέλος των δύο πινάκων. Μετά το
+        # _refresh υπό το κλείδωμα, το next_row είναι το πραγματικό τέλος του πίνακα κλειδιών.
+        if len(texts) == 0:
+            return
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with self._lock, self._file_lock():
+            self._refresh()
+            if not self.dim:
+                self.dim = int(vectors.shape[1])
+                self._write_state()
+            if vectors.shape[1] != self.dim:
+                return
+
+            pending: Dict[bytes, int] = {}
+            for i, text in enumerate(texts):
+                key = bytes.fromhex(embedding_key(model, text))
+                if key not in self._rows and key not in pending:
+                    pending[key] = i
+            if not pending:
+                return
+
+            # Πρώτα τα διανύσματα και μετά τα κλειδιά, ώστε κάθε ορατό κλειδί να έχει τη γραμμή του.
+            # Το truncate αφαιρεί ό,τι άφησε μια εγγραφή που διακόπηκε.
+            path = self._vectors_path(self.generation)
+            with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+                f.seek(self.next_row * self.dim * 4)
+                f.write(vectors[list(pending.values())].tobytes())
+                f.truncate()
+
+            records = np.empty(len(pending), dtype=_KEY_RECORD)
+            records["key"] = np.frombuffer(b"".join(pending), dtype=np.uint8).reshape(-1, 32)
+            records["used"] = time.time()
+            keys_path = self._keys_path(self.generation)
+            with open(keys_path, "r+b" if os.path.exists(keys_path) else "wb") as f:
+                f.seek(self.next_row * _KEY_RECORD.itemsize)
+                f.write(records.tobytes())
+                f.truncate()
+
+            for offset, key in enumerate(pending):
+                self._rows[key] = self.next_row + offset
+            self.next_row += len(pending)
+
+            if self.next_row > self.max_rows:
+                self._compact()
+
+    def _compact(self) -> None:
+        # LRU eviction: κρατά το 90% του ορίου με τους πιο πρόσφατους χρόνους χρήσης και γράφει
+        # τις ζωντανές γραμμές σε νέα γενιά αρχείων. Οι readers με την παλιά γενιά συνεχίζουν να
+        # διαβάζουν σωστά μέσω του δικού τους mmap μέχρι να δουν το νέο state.json.
+        old_generation = self.generation
+        keys_path = self._keys_path(old_generation)
+        records = np.fromfile(keys_path, dtype=_KEY_RECORD, count=self.next_row)
+        matrix = self._matrix_view(self.next_row)
+        if matrix is None:
+            keep = np.empty(0, dtype=np.int64)
+        else:
+            target = int(self.max_rows * 0.9)
+            keep = np.sort(np.argsort(records["used"], kind="stable")[len(records) - target:])
+        self.evictions += len(records) - len(keep)
+
+        new_generation = old_generation + 1
+        with open(self._vectors_path(new_generation), "wb") as f:
+            if len(keep):
+                f.write(np.ascontiguousarray(matrix[keep], dtype=np.float32).tobytes())
+        with open(self._keys_path(new_generation), "wb") as f:
+            f.write(records[keep].tobytes())
+
+        self._reset(self.dim, new_generation)
+        self._rows = {key: row for row, key in enumerate(_record_keys(records[keep]))}
+        self.next_row = len(keep)
+        self._write_state()
+        for path in (self._vectors_path(old_generation), keys_path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._rows),
+            "max_entries": self.max_rows if self.dim else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits / total) if total else 0.0,
+        }
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    # Επιστρέφει την κοινή cache της διεργασίας, ή None αν έχει απενεργοποιηθεί.
+    global _cache
+    if os.getenv("EMBEDDING_CACHE_ENABLED", "1") != "1":
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                cache_dir = os.getenv("EMBEDDING_CACHE_DIR") or os.path.join(
+                    os.getenv("DATA_DIR", "./data"), "embedding_cache"
+                )
+                max_mb = int(os.getenv("EMBEDDING_CACHE_MAX_MB", "256"))
+                _cache = EmbeddingCache(cache_dir, max_bytes=max_mb * 1024 * 1024)
+    return _cache
@@ -0,0 +1,129 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional, Set
+
+# Αντιστοίχιση σταδίων επεξεργασίας σε pool. Η ανάλυση PDF/PPTX (pypdf, python-pptx)
+# είναι καθαρή Python και κρατά το GIL, οπότε τρέχει σε ξεχωριστές διεργασίες.
+# Τα υπόλοιπα στάδια (I/O, FAISS, τεμαχισμός) τρέχουν σε threads.
+THREAD_STAGES = ("io", "faiss", "chunk")
+PROCESS_STAGES = ("parse",)
+
+
+class StageExecutors:
+    # Ενιαίο σημείο εκτέλεσης εργασιών εκτός event loop, με μετρητές ανά στάδιο.
+    def __init__(
+        self,
+        io_workers: int = 8,
+        parse_workers: int = 2,
+        parse_mode: str = "process",
+        start_method: str = "spawn",
+    ):
+        self.io_workers = max(1, io_workers)
+        self.parse_workers = max(1, parse_workers)
+        self.parse_mode = parse_mode
+        self.start_method = start_method
+
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        self._process_pool: Optional[Executor] = None
+        self._lock = threading.Lock()
+
+        stages = THREAD_STAGES + PROCESS_STAGES
+        self._live: Dict[str, Set[Future]] = {s: set() for s in stages}
+        self._completed: Dict[str, int] = {s: 0 for s in stages}
+        self._failed: Dict[str, int] = {s: 0 for s in stages}
+
+    @classmethod
+    def from_env(cls) -> "StageExecutors":
+        cpu = os.cpu_count() or 1
+        return cls(
+            io_workers=int(os.getenv("EXECUTOR_IO_WORKERS", "8")),
+            parse_workers=int(os.getenv("EXECUTOR_PARSE_WORKERS", str(min(4, cpu)))),
+            parse_mode=os.getenv("EXECUTOR_PARSE_MODE", "process"),
+            start_method=os.getenv("EXECUTOR_START_METHOD", "spawn"),
+        )
+
+    def _threads(self) -> ThreadPoolExecutor:
+        if self._thread_pool is None:
+            with self._lock:
+                if self._thread_pool is None:
+                    self._thread_pool = ThreadPoolExecutor(
+                        max_workers=self.io_workers, thread_name_prefix="stage-io"
+                    )
+        return self._thread_pool
+
+    def _processes(self) -> Executor:
+        # Το process pool δημιουργείται μόνο όταν χρειαστεί. Με EXECUTOR_PARSE_MODE=thread
+        # η ανάλυση γίνεται σε ξεχωριστό thread pool (π.χ. σε περιβάλλοντα χωρίς fork/spawn).
+        if self._process_pool is None:
+            with self._lock:
+                if self._process_pool is None:
+                    if self.parse_mode == "process":
+                        self._process_pool = ProcessPoolExecutor(
+                            max_workers=self.parse_workers,
+                            mp_context=multiprocessing.get_context(self.start_method),
+                        )
+                    else:
+                        self._process_pool = ThreadPoolExecutor(
+                            max_workers=self.parse_workers, thread_name_prefix="stage-parse"
+                        )
+        return self._process_pool
+
+    def _pool_for(self, stage: str) -> Executor:
+        if stage in PROCESS_STAGES:
+            return self._processes()
+        if stage in THREAD_STAGES:
+            return self._threads()
+        raise ValueError(f"Unknown executor stage: {stage}")
+
+    def _submit(self, stage: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        pool = self._pool_for(stage)
+        try:
+            return pool.submit(fn, *args, **kwargs)
+        except BrokenProcessPool:
+            # Αν κάποια διεργασία τερματίστηκε απότομα, το pool ξαναδημιουργείται.
+            with self._lock:
+                if self._process_pool is pool:
+                    self._process_pool = None
+            return self._pool_for(stage).submit(fn, *args, **kwargs)
+
+    async def run(self, stage: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        # Εκτελεί τη συνάρτηση στο pool του σταδίου και περιμένει το αποτέλεσμα χωρίς να μπλοκάρει.
+        future = self._submit(stage, fn, *args, **kwargs)
+        live = self._live[stage]
+        live.add(future)
+        try:
+            result = await asyncio.wrap_future(future)
+        except BaseException:
+            self._failed[stage] += 1
+            raise
+        finally:
+            live.discard(future)
+            self._completed[stage] += 1
+        return result
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        # Ανά στάδιο: εργασίες σε αναμονή (queue depth), σε εκτέλεση, ολοκληρωμένες, αποτυχημένες.
+        report: Dict[str, Dict[str, int]] = {}
+        for stage, live in self._live.items():
+            snapshot = list(live)
+            running = sum(1 for f in snapshot if f.running())
+            report[stage] = {
+                "queued": len(snapshot) - running,
+                "running": running,
+                "completed": self._completed[stage],
+                "failed": self._failed[stage],
+            }
+        return report
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._thread_pool is not None:
+                self._thread_pool.shutdown(wait=False, cancel_futures=True)
+                self._thread_pool = None
+            if self._process_pool is not None:
+                self._process_pool.shutdown(wait=False, cancel_futures=True)
+                self._process_pool = None
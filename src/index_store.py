@@ -1,79 +1,709 @@
+import glob
 import json
 import os
-from dataclasses import dataclass, asdict
-from typing import List, Tuple
+import struct
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 import faiss
 import numpy as np
 
+try:
+    import fcntl
+except ImportError:  # Windows: χωρίς κλείδωμα μεταξύ διεργασιών.
+    fcntl = None
+
+from .ann_index import AnnConfig, apply_search_params, build_index, index_kind, mmap_read_flags, needs_rebuild, train
+
+# Μορφή μεταδεδομένων στον δίσκο (metadata.bin): 8 bytes μήκος κεφαλίδας, κεφαλίδα JSON
+# (πίνακας ονομάτων αρχείων, γενιά κειμένων, επόμενο ID) και μετά ο πίνακας στηλών σταθερού
+# πλάτους, μία γραμμή ανά chunk. Τα κείμενα βρίσκονται σε ξεχωριστό αρχείο metadata.texts-<gen>.bin
+# και διαβάζονται μέσω memory-mapping μόνο για τα chunks που επιστρέφει η αναζήτηση.
+# Η κεφαλίδα περιέχει επίσης το manifest της συνεδρίας (tokens, chunks, σελίδες ανά έγγραφο),
+# ώστε τα σύνολα να διαβάζονται χωρίς να αγγιχτούν οι στήλες.
+# Με κβαντισμένο codec και επαναβαθμολόγηση, τα διανύσματα πλήρους ακρίβειας γράφονται σε
+# metadata.vectors-<gen>.f32 (float32, μία γραμμή ανά chunk με τη σειρά των στηλών) και
+# διαβάζονται μέσω memory-mapping μόνο για τους υποψηφίους κάθε αναζήτησης.
+META_FORMAT_VERSION = 1
+LEGACY_META_NAME = "metadata.json"
+_HEADER_LEN = struct.Struct("<Q")
+_ALIGN = 8
+
+CHUNK_COLUMNS = np.dtype([
+    ("id", "<i8"),
+    ("offset", "<i8"),
+    ("page", "<i4"),
+    ("tokens", "<i4"),
+    ("source", "<i4"),
+    ("length", "<i4"),
+])
+
 
-@dataclass
 class Chunk:
     # Δομή δεδομένων που αντιπροσωπεύει ένα τμήμα κειμένου με τα μεταδεδομένα του.
-    source: str
-    page: int
-    text: str
-    session_id: str = "default"
-    tokens: int = 0  # Αποθηκευμένο πλήθος tokens για βελτιστοποίηση απόδοσης.
+    # Με __slots__ για μικρό αποτύπωμα μνήμης· δημιουργείται μόνο για όσα chunks χρειάζονται.
+    __slots__ = ("source", "page", "text", "session_id", "tokens", "chunk_id")
+
+    def __init__(
+        self,
+        source: str,
+        page: int,
+        text: str,
+        session_id: str = "default",
+        tokens: int = 0,  # Αποθηκευμένο πλήθος tokens για βελτιστοποίηση απόδοσης.
+        chunk_id: int = -1,  # Σταθερό αναγνωριστικό του chunk μέσα στο ευρετήριο FAISS.
+    ):
+        self.source = source
+        self.page = page
+        self.text = text
+        self.session_id = session_id
+        self.tokens = tokens
+        self.chunk_id = chunk_id
+
+    def __repr__(self) -> str:
+        return (
+            f"Chunk(source={self.source!r}, page={self.page}, tokens={self.tokens}, "
+            f"chunk_id={self.chunk_id}, text={self.text[:40]!r})"
+        )
+
+
+def _new_index(dim: int) -> faiss.Index:
+    # Χρησιμοποιεί εσωτερικό γινόμενο (Inner Product) για υπολογισμό ομοιότητας.
+    # Σε κανονικοποιημένα διανύσματα, αυτό ισοδυναμεί με Cosine Similarity.
+    # Το IndexIDMap2 επιτρέπει σταθερά IDs ανά chunk και διαγραφή χωρίς επαναδημιουργία.
+    return faiss.IndexIDMap2(faiss.IndexFlatIP(dim))
+
+
+def _texts_path(meta_path: str, generation: int) -> str:
+    return f"{os.path.splitext(meta_path)[0]}.texts-{generation}.bin"
+
+
+def _vectors_path(meta_path: str, generation: int) -> str:
+    return f"{os.path.splitext(meta_path)[0]}.vectors-{generation}.f32"
+
+
+def _lock_path(meta_path: str) -> str:
+    return f"{meta_path}.lock"
+
+
+@contextmanager
+def _write_lock(meta_path: str):
+    # Αποκλειστικό κλείδωμα μεταξύ διεργασιών για την αποθήκευση των μεταδεδομένων μιας συνεδρίας.
+    with open(_lock_path(meta_path), "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def _generation_files(meta_path: str, kind: str) -> Dict[int, str]:
+    # Αρχεία κειμένων ("texts") ή διανυσμάτων ("vectors") στον δίσκο, ανά γενιά.
+    prefix = f"{os.path.splitext(meta_path)[0]}.{kind}-"
+    suffix = ".bin" if kind == "texts" else ".f32"
+    files = {}
+    for path in glob.glob(f"{glob.escape(prefix)}*{suffix}"):
+        value = path[len(prefix):len(path) - len(suffix)]
+        if value.isdigit():
+            files[int(value)] = path
+    return files
+
+
+def _next_generation(meta_path: str, kind: str, current: int) -> int:
+    # Επόμενη γενιά που δεν έχει χρησιμοποιήσει κανείς: δύο writers που φόρτωσαν την ίδια
+    # γενιά δεν γράφουν ποτέ στο ίδιο αρχείο νέας γενιάς.
+    return max([current, *_generation_files(meta_path, kind)]) + 1
+
+
+def _map_vectors(path: str, count: int, dim: int) -> np.ndarray:
+    if count == 0:
+        return np.empty((0, dim), dtype=np.float32)
+    return np.memmap(path, dtype=np.float32, mode="r", shape=(count, dim))
+
+
+def _map_bytes(path: str) -> np.ndarray:
+    if os.path.getsize(path) == 0:
+        return np.empty(0, dtype=np.uint8)
+    return np.memmap(path, dtype=np.uint8, mode="r")
+
+
+def _read_header(meta_path: str) -> Tuple[Dict[str, Any], int]:
+    # Επιστρέφει την κεφαλίδα JSON και το offset όπου αρχίζουν οι στήλες.
+    with open(meta_path, "rb") as f:
+        (header_len,) = _HEADER_LEN.unpack(f.read(_HEADER_LEN.size))
+        header = json.loads(f.read(header_len).decode("utf-8"))
+    return header, _HEADER_LEN.size + header_len
+
+
+def _manifest_view(docs: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    documents = [
+        {"name": name, "tokens": doc["tokens"], "chunks": doc["chunks"], "pages": len(doc["pages"])}
+        for name, doc in docs.items()
+    ]
+    return {
+        "total_tokens": sum(d["tokens"] for d in documents),
+        "total_chunks": sum(d["chunks"] for d in documents),
+        "total_pages": sum(d["pages"] for d in documents),
+        "documents": documents,
+    }
+
+
+def read_manifest(meta_path: str) -> Optional[Dict[str, Any]]:
+    # Διαβάζει μόνο την κεφαλίδα του metadata.bin: σύνολα της συνεδρίας και στατιστικά ανά έγγραφο.
+    # Επιστρέφει None αν δεν υπάρχει manifest (καμία αποθήκευση ή παλιά μορφή που θέλει φόρτωση).
+    if not os.path.exists(meta_path):
+        return None
+    header, _ = _read_header(meta_path)
+    if "documents" not in header:
+        return None
+    return _manifest_view(_docs_from_header(header["documents"]))
+
+
+def _docs_from_header(documents: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    return {
+        d["name"]: {
+            "tokens": int(d["tokens"]),
+            "chunks": int(d["chunks"]),
+            "pages": {int(page): int(n) for page, n in d["pages"].items()},
+        }
+        for d in documents
+    }
+
+
+def remove_store_files(index_path: str, meta_path: str) -> bool:
+    # Διαγράφει όλα τα αρχεία ενός ευρετηρίου (FAISS, μεταδεδομένα, κείμενα, παλιό JSON).
+    # Επιστρέφει True αν υπήρχε κάποιο από αυτά.
+    paths = [index_path, meta_path, _lock_path(meta_path), os.path.join(os.path.dirname(meta_path), LEGACY_META_NAME)]
+    base = glob.escape(os.path.splitext(meta_path)[0])
+    paths.extend(glob.glob(f"{base}.texts-*.bin"))
+    paths.extend(glob.glob(f"{base}.vectors-*.f32"))
+    removed = False
+    for path in paths:
+        try:
+            os.remove(path)
+            removed = True
+        except FileNotFoundError:
+            pass
+    return removed
 
 
 class FaissStore:
     # Διαχειρίζεται το ευρετήριο FAISS για αποθήκευση διανυσμάτων και μεταδεδομένων.
-    def __init__(self, dim: int, index_path: str, meta_path: str):
+    # Η οικογένεια ευρετηρίου (flat/HNSW/IVF) επιλέγεται αυτόματα από το πλήθος των διανυσμάτων
+    # και η κωδικοποίηση των διανυσμάτων (fp32/fp16/sq8) από το FAISS_VECTOR_CODEC.
+    def __init__(self, dim: int, index_path: str, meta_path: str, ann: Optional[AnnConfig] = None):
         self.dim = dim
         self.index_path = index_path
         self.meta_path = meta_path
-        # Χρησιμοποιεί εσωτερικό γινόμενο (Inner Product) για υπολογισμό ομοιότητας.
-        # Σε κανονικοποιημένα διανύσματα, αυτό ισοδυναμεί με Cosine Similarity.
-        self.index = faiss.IndexFlatIP(dim)
-        self.metadata: List[Chunk] = []
+        self.ann = ann or AnnConfig.from_env()
+        self.index = build_index("flat", dim, np.empty(0, dtype=np.int64), np.empty((0, dim), dtype=np.float32), self.ann)
+        self.next_id = 0
+        self.session_id = "default"
+        self.read_only = False  # True όταν το ευρετήριο είναι memory-mapped (μόνο για αναζήτηση).
+        self.legacy = False  # True όταν φορτώθηκε από παλιά μορφή και μετατράπηκε μόνο στη μνήμη.
+
+        # Στήλες ανά chunk, ταξινομημένες κατά ID (τα IDs αποδίδονται αύξοντα).
+        self._cols = np.empty(0, dtype=CHUNK_COLUMNS)
+        self._sources: List[str] = []
+        self._source_ids: Dict[str, int] = {}
+
+        # Manifest: ανά έγγραφο tokens, chunks και πλήθος chunks ανά σελίδα. Ενημερώνεται σε
+        # κάθε add/remove, ώστε τα σύνολα να μη χρειάζονται σάρωση των chunks.
+        self._docs: Dict[str, Dict[str, Any]] = {}
+
+        # Κείμενα: το αρχείο της τρέχουσας γενιάς (mmap) και όσα προστέθηκαν μετά το τελευταίο save().
+        self._generation = -1
+        self._blob = np.empty(0, dtype=np.uint8)
+        self._tail = bytearray()
+
+        # Διανύσματα πλήρους ακρίβειας (μόνο όταν ann.keeps_full_vectors): το αρχείο της τρέχουσας
+        # γενιάς (mmap), όσα προστέθηκαν μετά το save() και, ανά γραμμή των στηλών, η θέση του
+        # διανύσματός της στο αρχείο ακολουθούμενο από τα νέα. None όταν δεν κρατιούνται.
+        self._vec_generation = -1
+        self._vec_file = np.empty((0, dim), dtype=np.float32)
+        self._vec_tail: List[np.ndarray] = []
+        self._vec_rows: Optional[np.ndarray] = np.empty(0, dtype=np.int64) if self.ann.keeps_full_vectors else None
+
+    def __len__(self) -> int:
+        return int(self._cols.shape[0])
+
+    def _source_id(self, source: str) -> int:
+        sid = self._source_ids.get(source)
+        if sid is None:
+            sid = len(self._sources)
+            self._sources.append(source)
+            self._source_ids[source] = sid
+        return sid
+
+    def _track(self, source: str, page: int, tokens: int, sign: int) -> None:
+        doc = self._docs.get(source)
+        if doc is None:
+            doc = self._docs[source] = {"tokens": 0, "chunks": 0, "pages": {}}
+        doc["tokens"] += sign * tokens
+        doc["chunks"] += sign
+        pages = doc["pages"]
+        remaining = pages.get(page, 0) + sign
+        if remaining > 0:
+            pages[page] = remaining
+        else:
+            pages.pop(page, None)
+        if doc["chunks"] <= 0:
+            del self._docs[source]
+
+    def _rebuild_manifest(self) -> None:
+        self._docs = {}
+        for row in self._cols:
+            self._track(self._sources[int(row["source"])], int(row["page"]), int(row["tokens"]), 1)
 
-    def add(self, vectors: np.ndarray, chunks: List[Chunk]) -> None:
+    def _text_at(self, offset: int, length: int) -> str:
+        blob_len = self._blob.shape[0]
+        if offset >= blob_len:
+            start = offset - blob_len
+            return self._tail[start:start + length].decode("utf-8")
+        return bytes(self._blob[offset:offset + length]).decode("utf-8")
+
+    def _chunk_at(self, row: int) -> Chunk:
+        r = self._cols[row]
+        return Chunk(
+            source=self._sources[int(r["source"])],
+            page=int(r["page"]),
+            text=self._text_at(int(r["offset"]), int(r["length"])),
+            session_id=self.session_id,
+            tokens=int(r["tokens"]),
+            chunk_id=int(r["id"]),
+        )
+
+    def _vec_count(self) -> int:
+        return int(self._vec_file.shape[0]) + sum(v.shape[0] for v in self._vec_tail)
+
+    def _full_vectors(self, rows: np.ndarray) -> np.ndarray:
+        # Διανύσματα πλήρους ακρίβειας για τις δοσμένες γραμμές των στηλών.
+        positions = self._vec_rows[rows]
+        out = np.empty((len(positions), self.dim), dtype=np.float32)
+        in_file = positions < self._vec_file.shape[0]
+        out[in_file] = self._vec_file[positions[in_file]]
+        if not in_file.all():
+            tail = np.concatenate(self._vec_tail)
+            out[~in_file] = tail[positions[~in_file] - self._vec_file.shape[0]]
+        return out
+
+    def _keep_full_vectors(self, vectors: np.ndarray) -> None:
+        # Κρατά τα διανύσματα πλήρους ακρίβειας των νέων chunks. Ένα store που αποθηκεύτηκε χωρίς
+        # αυτά (πριν ενεργοποιηθεί η επαναβαθμολόγηση) αρχικοποιείται από το ευρετήριο, με την
+        # ακρίβεια του codec του, για τα chunks που υπήρχαν ήδη.
+        if self._vec_rows is None:
+            if not self.ann.keeps_full_vectors:
+                return
+            self._vec_file = np.empty((0, self.dim), dtype=np.float32)
+            self._vec_tail = []
+            self._vec_rows = np.arange(len(self), dtype=np.int64)
+            if len(self):
+                self._vec_tail.append(self.index.reconstruct_batch(np.ascontiguousarray(self._cols["id"])))
+        start = self._vec_count()
+        self._vec_tail.append(np.array(vectors, dtype=np.float32))
+        self._vec_rows = np.concatenate([self._vec_rows, np.arange(start, start + len(vectors), dtype=np.int64)])
+
+    def chunks(self) -> Iterable[Chunk]:
+        # Δημιουργεί όλα τα chunks ένα-ένα (για εξαγωγή/μετάπτωση, όχι για το hot path).
+        for row in range(len(self)):
+            yield self._chunk_at(row)
+
+    def _check_writable(self) -> None:
+        # Οποιαδήποτε αλλαγή σε memory-mapped ευρετήριο τερματίζει τη διεργασία μέσα στο FAISS.
+        if self.read_only:
+            raise RuntimeError("FaissStore was loaded read-only (mmap); load a private copy to modify it.")
+
+    def add(self, vectors: np.ndarray, chunks: List[Chunk]) -> List[int]:
         # Προσθέτει νέα διανύσματα και τα αντίστοιχα τμήματα κειμένου στο ευρετήριο.
+        # Επιστρέφει τα IDs που αποδόθηκαν στα νέα chunks.
+        self._check_writable()
         assert vectors.shape[1] == self.dim
-        self.index.add(vectors)
-        self.metadata.extend(chunks)
+        assert vectors.shape[0] == len(chunks)
+        ids = np.arange(self.next_id, self.next_id + len(chunks), dtype=np.int64)
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self._keep_full_vectors(vectors)
+        # Το sq8 εκπαιδεύεται στα πρώτα διανύσματα που προστίθενται σε άδειο ευρετήριο.
+        train(self.index, vectors)
+        self.index.add_with_ids(vectors, ids)
+
+        rows = np.empty(len(chunks), dtype=CHUNK_COLUMNS)
+        rows["id"] = ids
+        base = self._blob.shape[0]
+        if chunks and self.session_id == "default":
+            self.session_id = chunks[0].session_id
+        for i, (chunk_id, chunk) in enumerate(zip(ids.tolist(), chunks)):
+            chunk.chunk_id = chunk_id
+            encoded = chunk.text.encode("utf-8")
+            rows[i] = (chunk_id, base + len(self._tail), chunk.page, chunk.tokens, self._source_id(chunk.source), len(encoded))
+            self._tail += encoded
+            self._track(chunk.source, chunk.page, chunk.tokens, 1)
+        self._cols = np.concatenate([self._cols, rows])
+        self.next_id += len(chunks)
+        self._maintain_index()
+        return ids.tolist()
+
+    def remove_ids(self, ids: Iterable[int]) -> int:
+        # Αφαιρεί chunks βάσει ID απευθείας από το ευρετήριο, χωρίς νέα embeddings.
+        self._check_writable()
+        wanted = np.fromiter(ids, dtype=np.int64)
+        mask = np.isin(self._cols["id"], wanted)
+        count = int(mask.sum())
+        if not count:
+            return 0
+        removed_rows = self._cols[mask]
+        for row in removed_rows:
+            self._track(self._sources[int(row["source"])], int(row["page"]), int(row["tokens"]), -1)
+        if self._vec_rows is not None:
+            self._vec_rows = self._vec_rows[~mask]
+        if index_kind(self.index) == "hnsw":
+            # Το HNSW δεν υποστηρίζει διαγραφή: ξαναχτίζεται από τα διανύσματα που μένουν.
+            self._cols = self._cols[~mask]
+            self._rebuild_index(self.ann.kind_for(len(self), "hnsw"))
+        else:
+            self.index.remove_ids(np.ascontiguousarray(removed_rows["id"]))
+            self._cols = self._cols[~mask]
+        self._maintain_index()
+        return count
+
+    def _maintain_index(self) -> None:
+        # Αλλάζει οικογένεια ευρετηρίου ή ξαναεκπαιδεύει το IVF όταν το πλήθος περάσει τα όρια,
+        # και μετατρέπει το ευρετήριο όταν έχει αλλάξει ο codec.
+        target = needs_rebuild(self.index, len(self), self.ann)
+        if target is not None:
+            self._rebuild_index(target)
+
+    def _rebuild_index(self, kind: str) -> None:
+        # Ανακτά τα διανύσματα των chunks που υπάρχουν και φτιάχνει νέο ευρετήριο. Προτιμώνται
+        # τα διανύσματα πλήρους ακρίβειας· αλλιώς ανακατασκευάζονται από το τρέχον ευρετήριο.
+        ids = np.ascontiguousarray(self._cols["id"], dtype=np.int64)
+        if len(ids) and self._vec_rows is not None:
+            vectors = self._full_vectors(np.arange(len(ids)))
+        elif len(ids):
+            vectors = self.index.reconstruct_batch(ids)
+        else:
+            vectors = np.empty((0, self.dim), dtype=np.float32)
+        self.index = build_index(kind, self.dim, ids, vectors, self.ann)
+
+    def index_kind(self) -> str:
+        return index_kind(self.index)
+
+    def remove_source(self, source: str) -> int:
+        # Αφαιρεί όλα τα chunks ενός αρχείου και επιστρέφει πόσα διαγράφηκαν.
+        sid = self._source_ids.get(source)
+        if sid is None:
+            return 0
+        return self.remove_ids(self._cols["id"][self._cols["source"] == sid])
+
+    def upsert_source(self, source: str, vectors: np.ndarray, chunks: List[Chunk]) -> int:
+        # Αντικαθιστά τα chunks ενός αρχείου: διαγράφει τα παλιά και προσθέτει μόνο τα νέα.
+        removed = self.remove_source(source)
+        self.add(vectors, chunks)
+        return removed
+
+    def sources(self) -> List[str]:
+        # Επιστρέφει τα ονόματα των αρχείων που υπάρχουν στο ευρετήριο, με σειρά εισαγωγής.
+        return list(self._docs)
+
+    def manifest(self) -> Dict[str, Any]:
+        # Σύνολα της συνεδρίας (tokens, chunks, μοναδικές σελίδες) και στατιστικά ανά έγγραφο.
+        return _manifest_view(self._docs)
+
+    def total_tokens(self) -> int:
+        return sum(doc["tokens"] for doc in self._docs.values())
+
+    def metadata_nbytes(self) -> int:
+        # Μνήμη που κρατούν οι στήλες και τα κείμενα/διανύσματα που δεν έχουν αποθηκευτεί ακόμα.
+        vec_bytes = 0
+        if self._vec_rows is not None:
+            vec_bytes = int(self._vec_rows.nbytes) + sum(int(v.nbytes) for v in self._vec_tail)
+        return int(self._cols.nbytes) + len(self._tail) + sum(len(s) for s in self._sources) + vec_bytes
 
     def save(self) -> None:
-        # Αποθηκεύει το ευρετήριο FAISS και τα μεταδεδομένα στον δίσκο.
-        faiss.write_index(self.index, self.index_path)
-        with open(self.meta_path, "w", encoding="utf-8") as f:
-            json.dump([asdict(c) for c in self.metadata], f, ensure_ascii=False)
+        # Αποθηκεύει το ευρετήριο FAISS και τα μεταδεδομένα στον δίσκο. Κάθε αρχείο γράφεται
+        # σε προσωρινό αρχείο και αντικαθιστά το παλιό με μία μετονομασία, οπότε όσοι το έχουν
+        # χαρτογραφήσει συνεχίζουν να βλέπουν ολόκληρη την προηγούμενη έκδοση.
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        faiss.write_index(self.index, tmp_path)
+        os.replace(tmp_path, self.index_path)
+        self._save_metadata()
+        if self.legacy:
+            # Το metadata.bin αντικαθιστά πλέον το παλιό metadata.json.
+            try:
+                os.remove(os.path.join(os.path.dirname(self.meta_path), LEGACY_META_NAME))
+            except OSError:
+                pass
+            self.legacy = False
+
+    def migrate_legacy(self) -> bool:
+        # Αποθηκεύει μία φορά στη νέα μορφή ένα store που φορτώθηκε από παλιά αρχεία. Καλείται μόνο
+        # από όσους γράφουν· οι αναγνώστες κάνουν τη μετατροπή μόνο στη μνήμη, χωρίς αλλαγές στον δίσκο.
+        if not self.legacy:
+            return False
+        self.save()
+        return True
 
-    def load(self) -> None:
+    def _save_metadata(self) -> None:
+        # Η αποθήκευση γίνεται υπό αποκλειστικό κλείδωμα της συνεδρίας, ώστε writers σε
+        # διαφορετικούς workers να μη γράφουν ταυτόχρονα στα ίδια αρχεία κειμένων/διανυσμάτων.
+        with _write_lock(self.meta_path):
+            self._save_metadata_locked()
+
+    def _save_metadata_locked(self) -> None:
+        # Τα νέα κείμενα προστίθενται στο πραγματικό τέλος του αρχείου της τρέχουσας γενιάς, οπότε
+        # όσοι διαβάζουν ήδη τα παλιά offsets δεν επηρεάζονται. Αν άλλος writer έχει προσθέσει
+        # κείμενα μετά τη φόρτωση, τα offsets των νέων chunks μετατοπίζονται ανάλογα. Όταν τα
+        # κείμενα διαγραμμένων chunks ξεπεράσουν τα ζωντανά (ή το αρχείο έχει ήδη αντικατασταθεί
+        # από άλλον writer), γράφεται συμπυκνωμένο αρχείο νέας γενιάς.
+        blob_len = self._blob.shape[0]
+        live_bytes = int(self._cols["length"].sum(dtype=np.int64))
+        dead_bytes = blob_len + len(self._tail) - live_bytes
+        texts_path = _texts_path(self.meta_path, self._generation)
+
+        if self._generation < 0 or dead_bytes > live_bytes or not os.path.exists(texts_path):
+            self._generation = _next_generation(self.meta_path, "texts", self._generation)
+            cols = self._cols.copy()
+            with open(_texts_path(self.meta_path, self._generation), "wb") as f:
+                position = 0
+                for row in range(cols.shape[0]):
+                    offset, length = int(cols[row]["offset"]), int(cols[row]["length"])
+                    f.write(self._text_at(offset, length).encode("utf-8"))
+                    cols[row]["offset"] = position
+                    position += length
+            self._cols = cols
+        elif self._tail:
+            with open(texts_path, "r+b") as f:
+                end = os.fstat(f.fileno()).st_size
+                f.seek(end)
+                f.write(self._tail)
+            if end != blob_len:
+                cols = self._cols.copy()
+                offsets = cols["offset"]
+                cols["offset"] = np.where(offsets >= blob_len, offsets + (end - blob_len), offsets)
+                self._cols = cols
+
+        # Ορατοί source IDs: μόνο όσα χρησιμοποιούνται ακόμα, ώστε ο πίνακας να μη μεγαλώνει επ' άπειρον.
+        used = np.unique(self._cols["source"]).tolist()
+        remap = np.zeros(len(self._sources), dtype=np.int32)
+        for new_id, old_id in enumerate(used):
+            remap[old_id] = new_id
+        if len(used) != len(self._sources):
+            self._cols = self._cols.copy()
+            self._cols["source"] = remap[self._cols["source"]]
+            self._sources = [self._sources[i] for i in used]
+            self._source_ids = {s: i for i, s in enumerate(self._sources)}
+
+        self._save_vectors()
+
+        header = json.dumps({
+            "version": META_FORMAT_VERSION,
+            "count": len(self),
+            "next_id": self.next_id,
+            "session_id": self.session_id,
+            "text_generation": self._generation,
+            "vector_generation": self._vec_generation,
+            "sources": self._sources,
+            "documents": [
+                {"name": name, "tokens": doc["tokens"], "chunks": doc["chunks"], "pages": doc["pages"]}
+                for name, doc in self._docs.items()
+            ],
+        }, ensure_ascii=False).encode("utf-8")
+        padding = (-(_HEADER_LEN.size + len(header))) % _ALIGN
+        tmp_path = f"{self.meta_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_HEADER_LEN.pack(len(header) + padding))
+            f.write(header + b" " * padding)
+            f.write(np.ascontiguousarray(self._cols).tobytes())
+        os.replace(tmp_path, self.meta_path)
+
+        self._blob = _map_bytes(_texts_path(self.meta_path, self._generation))
+        self._tail = bytearray()
+        # Αφαιρεί τις γενιές που δεν δείχνει πλέον η κεφαλίδα, και όσες άφησαν άλλοι writers.
+        # Όσοι έχουν ήδη χαρτογραφήσει ένα παλιό αρχείο συνεχίζουν να το διαβάζουν κανονικά.
+        for kind, current in (("texts", self._generation), ("vectors", self._vec_generation)):
+            for generation, path in _generation_files(self.meta_path, kind).items():
+                if generation != current:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+
+    def _save_vectors(self) -> None:
+        # Τα νέα διανύσματα προστίθενται στο τέλος του αρχείου όσο οι γραμμές του αντιστοιχούν
+        # ακόμα μία-προς-μία στις στήλες. Μετά από διαγραφές γράφεται αρχείο νέας γενιάς μόνο με
+        # τα ζωντανά διανύσματα.
+        if self._vec_rows is None:
+            self._vec_generation = -1
+            return
+
+        aligned = self._vec_rows.shape[0] == self._vec_count() and bool(
+            (self._vec_rows == np.arange(self._vec_rows.shape[0])).all()
+        )
+        appended = False
+        if self._vec_generation >= 0 and aligned:
+            # Οι γραμμές του αρχείου αντιστοιχούν θέση-προς-θέση στις στήλες, οπότε προσθήκη
+            # γίνεται μόνο αν το αρχείο τελειώνει ακόμα εκεί που το φόρτωσε αυτός ο writer.
+            try:
+                with open(_vectors_path(self.meta_path, self._vec_generation), "r+b") as f:
+                    end = os.fstat(f.fileno()).st_size
+                    if not self._vec_tail:
+                        appended = True
+                    elif end == self._vec_file.shape[0] * self.dim * 4:
+                        f.seek(end)
+                        for block in self._vec_tail:
+                            f.write(block.tobytes())
+                        appended = True
+            except FileNotFoundError:
+                pass
+        if not appended:
+            self._vec_generation = _next_generation(self.meta_path, "vectors", self._vec_generation)
+            with open(_vectors_path(self.meta_path, self._vec_generation), "wb") as f:
+                for start in range(0, len(self), 4096):
+                    f.write(self._full_vectors(np.arange(start, min(start + 4096, len(self)))).tobytes())
+        self._vec_file = _map_vectors(_vectors_path(self.meta_path, self._vec_generation), len(self), self.dim)
+        self._vec_tail = []
+        self._vec_rows = np.arange(len(self), dtype=np.int64)
+
+    def load(self, mmap: bool = False) -> None:
         # Φορτώνει το ευρετήριο και τα μεταδεδομένα από τον δίσκο, εφόσον υπάρχουν.
+        # Με mmap=True το ευρετήριο χαρτογραφείται μόνο για ανάγνωση (δεν επιτρέπονται αλλαγές).
+        # Τα μεταδεδομένα διαβάζονται πρώτα και το save() γράφει πρώτα το ευρετήριο· αν ένας
+        # αναγνώστης πέσει ανάμεσα σε δύο εκδόσεις, όσα chunks δεν υπάρχουν και στις δύο
+        # απλώς παραλείπονται στην αναζήτηση. Παλιά μορφή (σκέτο IndexFlatIP ή metadata.json)
+        # μετατρέπεται μόνο στη μνήμη· την αποθηκεύει το migrate_legacy() όσων γράφουν.
+        legacy_chunks = self.load_metadata()
+
         if os.path.exists(self.index_path):
-            self.index = faiss.read_index(self.index_path)
+            self.index = faiss.read_index(self.index_path, mmap_read_flags(self.index_path) if mmap else 0)
+            self.read_only = mmap
+            apply_search_params(self.index, self.ann)
             try:
                 # Ενημερώνει τη διάσταση βάσει του φορτωμένου ευρετηρίου.
                 self.dim = self.index.d  # type: ignore[attr-defined]
             except Exception:
                 pass
+
+        if isinstance(self.index, faiss.IndexFlat):
+            self._migrate_legacy_index()
+            self.read_only = False
+            self.legacy = True
+        if legacy_chunks is not None:
+            self._migrate_legacy_metadata(legacy_chunks)
+            self.legacy = True
+
+    def load_metadata(self) -> Optional[List[Chunk]]:
+        # Φορτώνει μόνο τις στήλες μεταδεδομένων (χωρίς το FAISS). Τα κείμενα δεν διαβάζονται.
+        # Αν υπάρχει μόνο το παλιό metadata.json, επιστρέφει τα chunks του για μετάπτωση.
         if os.path.exists(self.meta_path):
-            with open(self.meta_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                self.metadata = [Chunk(**d) for d in data]
+            header, columns_offset = _read_header(self.meta_path)
+            count = int(header["count"])
+            self._cols = np.memmap(
+                self.meta_path, dtype=CHUNK_COLUMNS, mode="r", offset=columns_offset, shape=(count,),
+            ) if count else np.empty(0, dtype=CHUNK_COLUMNS)
+            self._sources = list(header["sources"])
+            self._source_ids = {s: i for i, s in enumerate(self._sources)}
+            self.next_id = int(header["next_id"])
+            self.session_id = header.get("session_id", "default")
+            self._generation = int(header["text_generation"])
+            self._blob = _map_bytes(_texts_path(self.meta_path, self._generation))
+            self._tail = bytearray()
+            self._vec_generation = int(header.get("vector_generation", -1))
+            self._vec_tail = []
+            if self._vec_generation >= 0 and self.ann.keeps_full_vectors:
+                self._vec_file = _map_vectors(_vectors_path(self.meta_path, self._vec_generation), count, self.dim)
+                self._vec_rows = np.arange(count, dtype=np.int64)
+            else:
+                self._vec_rows = None
+            if "documents" in header:
+                self._docs = _docs_from_header(header["documents"])
+            else:
+                self._rebuild_manifest()
+            return None
+
+        legacy_path = os.path.join(os.path.dirname(self.meta_path), LEGACY_META_NAME)
+        if not os.path.exists(legacy_path):
+            return None
+        with open(legacy_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        chunks = [Chunk(**d) for d in data]
+        for i, chunk in enumerate(chunks):
+            if chunk.chunk_id < 0:
+                chunk.chunk_id = i
+        return chunks
+
+    def _migrate_legacy_index(self) -> None:
+        # Παλαιότερες συνεδρίες αποθήκευαν σκέτο IndexFlatIP, όπου το ID ήταν η θέση του chunk.
+        # Τα διανύσματα ανακτώνται τοπικά και τυλίγονται σε IndexIDMap2 με IDs 0..n-1.
+        legacy = self.index
+        migrated = _new_index(self.dim)
+        if legacy.ntotal > 0:
+            vectors = legacy.reconstruct_n(0, legacy.ntotal)
+            migrated.add_with_ids(vectors, np.arange(legacy.ntotal, dtype=np.int64))
+        self.index = migrated
+
+    def _migrate_legacy_metadata(self, chunks: List[Chunk]) -> None:
+        # Μετατρέπει στη μνήμη τα chunks του metadata.json σε στήλες.
+        # Τα chunks χωρίς αποθηκευμένο πλήθος tokens μετρώνται εδώ, ώστε οι στήλες να είναι πλήρεις.
+        from .cf_ai import get_tokenizer
+
+        chunks.sort(key=lambda c: c.chunk_id)
+        uncounted = [c for c in chunks if c.tokens <= 0]
+        for chunk, tokens in zip(uncounted, get_tokenizer().count_batch([c.text for c in uncounted])):
+            chunk.tokens = tokens
+        rows = np.empty(len(chunks), dtype=CHUNK_COLUMNS)
+        for i, chunk in enumerate(chunks):
+            encoded = chunk.text.encode("utf-8")
+            rows[i] = (chunk.chunk_id, len(self._tail), chunk.page, chunk.tokens, self._source_id(chunk.source), len(encoded))
+            self._tail += encoded
+            self._track(chunk.source, chunk.page, chunk.tokens, 1)
+        if chunks:
+            self.session_id = chunks[0].session_id
+        self._cols = rows
+        self.next_id = max((c.chunk_id for c in chunks), default=-1) + 1
 
     def search(self, query_vec: np.ndarray, k: int = 5) -> List[Tuple[float, Chunk]]:
         # Εκτελεί αναζήτηση ομοιότητας για να βρει τα k πιο σχετικά τμήματα κειμένου.
-        
+
         # Διασφαλίζει ότι το διάνυσμα αναζήτησης έχει τη σωστή μορφή (2D array).
         if query_vec.ndim == 1:
             query_vec = query_vec[None, :]
+        return self.search_batch(query_vec[:1], k=k)[0]
 
-        # Αν το ευρετήριο είναι άδειο, επιστρέφει κενή λίστα.
+    def search_batch(self, query_vecs: np.ndarray, k: int = 5) -> List[List[Tuple[float, Chunk]]]:
+        # Αναζήτηση για πολλά ερωτήματα με μία κλήση του FAISS (πίνακας ερωτημάτων αντί για
+        # ένα-ένα). Επιστρέφει μία λίστα αποτελεσμάτων ανά γραμμή του query_vecs.
+        query_vecs = np.ascontiguousarray(np.atleast_2d(query_vecs), dtype=np.float32)
+
+        # Αν το ευρετήριο είναι άδειο, επιστρέφει κενές λίστες.
         if self.index.ntotal == 0:
-            return []
+            return [[] for _ in range(query_vecs.shape[0])]
+
+        # Ανακτά τα scores ομοιότητας και τα IDs των αποτελεσμάτων. Με επαναβαθμολόγηση ζητούνται
+        # k·factor υποψήφιοι από το κβαντισμένο ευρετήριο.
+        rescore = self.ann.rescore_factor > 0 and self._vec_rows is not None
+        scores, idxs = self.index.search(query_vecs, k * self.ann.rescore_factor if rescore else k)
 
-        # Ανακτά τα scores ομοιότητας και τους δείκτες των αποτελεσμάτων.
-        scores, idxs = self.index.search(query_vec, k)
-        results: List[Tuple[float, Chunk]] = []
+        # Αντιστοιχίζει τα IDs του FAISS με τις γραμμές των μεταδεδομένων (ταξινομημένες κατά ID).
+        ids = self._cols["id"]
+        results: List[List[Tuple[float, Chunk]]] = []
+        for q, (row_scores, row_idxs) in enumerate(zip(scores, idxs)):
+            hits: List[Tuple[float, int]] = []
+            for score, idx in zip(row_scores, row_idxs):
+                if idx < 0:
+                    continue
+                row = int(np.searchsorted(ids, idx))
+                if row >= ids.shape[0] or ids[row] != idx:
+                    continue
+                hits.append((float(score), row))
 
-        # Αντιστοιχίζει τους δείκτες του FAISS με τα πραγματικά αντικείμενα Chunk.
-        for score, idx in zip(scores[0], idxs[0]):
-            if idx < 0 or idx >= len(self.metadata):
-                continue
-            chunk = self.metadata[idx]
-            results.append((float(score), chunk))
+            if rescore and hits:
+                # Ακριβή scores από τα διανύσματα πλήρους ακρίβειας και νέα κατάταξη των υποψηφίων.
+                rows = np.array([row for _, row in hits], dtype=np.int64)
+                exact = self._full_vectors(rows) @ query_vecs[q]
+                order = np.argsort(-exact, kind="stable")[:k]
+                hits = [(float(exact[i]), int(rows[i])) for i in order]
 
-        return results
\ No newline at end of file
+            # Δημιουργεί Chunk μόνο για τα αποτελέσματα.
+            results.append([(score, self._chunk_at(row)) for score, row in hits])
+        return results
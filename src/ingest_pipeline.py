@@ -0,0 +1,196 @@
+import asyncio
+from collections import deque
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Awaitable, Callable, Deque, List, Optional, Tuple
+
+import numpy as np
+
+from .cf_ai import EmbeddingBatcher, estimate_tokens
+from .index_store import Chunk
+
+# Σηματοδοτεί το τέλος της ροής σε κάθε ουρά.
+_END = object()
+
+
+class TokenBudget:
+    # Κοινός προϋπολογισμός tokens της συνεδρίας για τα αρχεία ενός batch. Τα αρχεία δεσμεύουν
+    # tokens με τη σειρά αποστολής: μόνο το αρχείο που έχει σειρά δεσμεύει, και η σειρά περνά
+    # στο επόμενο μόλις το πλήθος tokens του αρχείου γίνει τελικό (ή το αρχείο αποτύχει).
+    # Έτσι κανένα αρχείο δεν στέλνεται για embedding αν δεν χωρά, όπως στη σειριακή εκτέλεση.
+    def __init__(self, available: int, max_per_file: int, files: int):
+        self.available = available
+        self.max_per_file = max_per_file
+        self.reserved = 0
+        self._turn = 0
+        self._settled = set()
+        self._turns = [asyncio.Event() for _ in range(files)]
+        if files:
+            self._turns[0].set()
+
+    def slot(self, position: int) -> "BudgetSlot":
+        return BudgetSlot(self, position)
+
+    def _settle(self, position: int) -> None:
+        self._settled.add(position)
+        while self._turn in self._settled:
+            self._turn += 1
+            if self._turn < len(self._turns):
+                self._turns[self._turn].set()
+
+
+class BudgetSlot:
+    # Η θέση ενός αρχείου στον TokenBudget και τα tokens που έχει δεσμεύσει.
+    def __init__(self, budget: TokenBudget, position: int):
+        self.budget = budget
+        self.position = position
+        self.claimed = 0
+
+    def has_turn(self) -> bool:
+        return self.budget._turn == self.position
+
+    async def wait_turn(self) -> None:
+        await self.budget._turns[self.position].wait()
+
+    def claim(self, total_tokens: int) -> bool:
+        # Επεκτείνει τη δέσμευση ώστε να καλύπτει total_tokens. Καλείται μόνο όταν το αρχείο έχει σειρά.
+        extra = total_tokens - self.claimed
+        if total_tokens > self.budget.max_per_file or extra > self.budget.available - self.budget.reserved:
+            return False
+        self.budget.reserved += extra
+        self.claimed = total_tokens
+        return True
+
+    def release(self) -> None:
+        self.budget.reserved -= self.claimed
+        self.claimed = 0
+
+    def finish(self) -> None:
+        self.budget._settle(self.position)
+
+
+@dataclass
+class IngestResult:
+    # Αποτέλεσμα της ροής εισαγωγής για ένα αρχείο.
+    chunks: List[Chunk] = field(default_factory=list)
+    vectors: Optional[np.ndarray] = None  # None αν η ενσωμάτωση σταμάτησε λόγω ορίου tokens.
+    tokens: int = 0
+    pages: int = 0  # Σελίδες/διαφάνειες με κείμενο.
+    characters: int = 0
+    words: int = 0
+
+
+async def run_ingest_pipeline(
+    pages: AsyncIterator[Tuple[int, str]],
+    process_page: Callable[[int, str], Awaitable[Tuple[List[Chunk], int]]],
+    embed: Callable[[List[str]], Awaitable[np.ndarray]],
+    budget: BudgetSlot,
+    queue_size: int = 8,
+    batch_size: int = 32,
+    max_tokens_per_batch: int = 35000,
+    max_inflight_batches: int = 4,
+) -> IngestResult:
+    # Ροή εξαγωγή → τεμαχισμός → embeddings με φραγμένες ουρές (backpressure):
+    # οι σελίδες περνούν στον τεμαχισμό μόλις εξαχθούν, και κάθε batch chunks στέλνεται
+    # για embedding μόλις γεμίσει, ώστε δίκτυο και CPU να δουλεύουν ταυτόχρονα.
+    # Κάθε chunk στέλνεται για embedding μόνο αφού δεσμευτούν τα tokens του στο budget, που
+    # γίνεται με τη σειρά αποστολής των αρχείων· ως τότε τα chunks κρατούνται στη μνήμη.
+    # Αν το αρχείο δεν χωρά, η ενσωμάτωση σταματά (το αρχείο θα απορριφθεί ούτως ή άλλως),
+    # αλλά η καταμέτρηση συνεχίζεται για την αναφορά.
+    page_queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    chunk_queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size * batch_size)
+    result = IngestResult()
+    over_limit = asyncio.Event()
+    vector_parts: List[np.ndarray] = []
+
+    async def produce() -> None:
+        async for page in pages:
+            await page_queue.put(page)
+        await page_queue.put(_END)
+
+    forwarded = 0
+
+    async def forward_claimed() -> None:
+        # Δεσμεύει τα tokens που μετρήθηκαν ως τώρα και στέλνει τα αντίστοιχα chunks για embedding.
+        nonlocal forwarded
+        if over_limit.is_set():
+            return
+        if not budget.claim(result.tokens):
+            over_limit.set()
+            budget.release()
+            return
+        for c in result.chunks[forwarded:]:
+            await chunk_queue.put(c)
+        forwarded = len(result.chunks)
+
+    async def chunk() -> None:
+        while True:
+            item = await page_queue.get()
+            if item is _END:
+                break
+            page_num, text = item
+            if not text.strip():
+                continue
+            result.characters += len(text) + (2 if result.pages else 0)
+            result.words += len(text.split())
+            result.pages += 1
+
+            chunks, page_tokens = await process_page(page_num, text)
+            result.tokens += page_tokens
+            result.chunks.extend(chunks)
+            if budget.has_turn():
+                await forward_claimed()
+        # Το πλήθος tokens είναι πλέον τελικό: δέσμευση με τη σειρά και παράδοση της σειράς.
+        await budget.wait_turn()
+        await forward_claimed()
+        budget.finish()
+        await chunk_queue.put(_END)
+
+    async def embed_batches() -> None:
+        pending: Deque[Tuple[int, asyncio.Task]] = deque()
+        batcher = EmbeddingBatcher(batch_size, max_tokens_per_batch)
+
+        async def collect_oldest() -> None:
+            expected, task = pending.popleft()
+            vectors = await task
+            if vectors.shape[0] != expected:
+                raise RuntimeError(f"Embedding returned {vectors.shape[0]} vectors for {expected} chunks.")
+            vector_parts.append(vectors)
+
+        def dispatch(batch: List[Chunk]) -> None:
+            pending.append((len(batch), asyncio.create_task(embed([c.text for c in batch]))))
+
+        try:
+            while True:
+                item = await chunk_queue.get()
+                if item is _END:
+                    break
+                if over_limit.is_set():
+                    continue
+                completed = batcher.add(item, estimate_tokens(item.text))
+                if completed:
+                    dispatch(completed)
+                    # Όριο batches σε εξέλιξη: περιμένει το παλαιότερο πριν δεχτεί νέα chunks.
+                    if len(pending) >= max_inflight_batches:
+                        await collect_oldest()
+
+            last = batcher.flush()
+            if last and not over_limit.is_set():
+                dispatch(last)
+            while pending and not over_limit.is_set():
+                await collect_oldest()
+        finally:
+            for _, task in pending:
+                task.cancel()
+
+    try:
+        async with asyncio.TaskGroup() as group:
+            group.create_task(produce())
+            group.create_task(chunk())
+            group.create_task(embed_batches())
+    except BaseExceptionGroup as group_error:
+        # Προωθεί το αρχικό σφάλμα (π.χ. FileIngestError) αντί για το ExceptionGroup.
+        raise group_error.exceptions[0]
+
+    if not over_limit.is_set() and vector_parts:
+        result.vectors = np.concatenate(vector_parts)
+    return result
@@ -1,41 +1,189 @@
+import os
 import re
-from typing import List, Tuple
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
 from pypdf import PdfReader
 
+# Κάτω από αυτό το πλήθος σελίδων, το κόστος εκκίνησης διεργασιών υπερβαίνει το κέρδος.
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "24"))
 
-def extract_pdf_text_with_pages(path: str) -> List[Tuple[int, str]]:
-    # Εξάγει το κείμενο από αρχεία PDF.
-    # Επιστρέφει μια λίστα με ζεύγη (αριθμός σελίδας, κείμενο).
-    reader = PdfReader(path)
-    results: List[Tuple[int, str]] = []
-    
+
+def _clean_page_text(text: str) -> str:
+    # Αφαιρώ ειδικούς χαρακτήρες (όπως ενωτικά συλλαβισμού και αλλαγές γραμμής)
+    # για να δημιουργήσω καθαρότερο κείμενο προς επεξεργασία.
+    return text.replace("\u00ad", "").replace("\r", " ")
+
+
+def pdf_page_count(path: str) -> int:
+    # Επιστρέφει το πλήθος σελίδων χωρίς να εξάγει κείμενο.
+    return len(PdfReader(path).pages)
+
+
+def extract_pdf_page_range(path: str, start: int, stop: int) -> List[Tuple[int, str]]:
+    # Εξάγει το κείμενο των σελίδων [start, stop) (με αρίθμηση από το 0).
+    # Κάθε κλήση ανοίγει το αρχείο ανεξάρτητα, ώστε να μπορεί να τρέξει σε ξεχωριστή διεργασία.
+    return _extract_pages(PdfReader(path), start, stop)
+
+
+def _extract_pages(reader: PdfReader, start: int, stop: int) -> List[Tuple[int, str]]:
+    return list(_iter_pages(reader, start, stop))
+
+
+def _iter_pages(reader: PdfReader, start: int, stop: int) -> Iterator[Tuple[int, str]]:
     # Διαβάζω το PDF σελίδα προς σελίδα.
-    for i, page in enumerate(reader.pages, start=1):
+    for i in range(start, min(stop, len(reader.pages))):
         try:
-            text = page.extract_text() or ""
+            text = reader.pages[i].extract_text() or ""
         except Exception:
             text = ""
-        
-        # Αφαιρώ ειδικούς χαρακτήρες (όπως ενωτικά συλλαβισμού και αλλαγές γραμμής)
-        # για να δημιουργήσω καθαρότερο κείμενο προς επεξεργασία.
-        text = text.replace("\u00ad", "").replace("\r", " ")
-        results.append((i, text))
-        
+        yield i + 1, _clean_page_text(text)
+
+
+def iter_pdf_text_with_pages(path: str) -> Iterator[Tuple[int, str]]:
+    # Παράγει τις σελίδες μία-μία, ώστε ο τεμαχισμός να ξεκινά πριν τελειώσει η εξαγωγή.
+    reader = PdfReader(path)
+    yield from _iter_pages(reader, 0, len(reader.pages))
+
+
+def split_page_ranges(
+    page_count: int,
+    workers: int,
+    min_pages_for_parallel: int = PDF_PARALLEL_MIN_PAGES,
+    max_range_pages: Optional[int] = None,
+) -> List[Tuple[int, int]]:
+    # Χωρίζει τις σελίδες σε συνεχόμενα διαστήματα για παράλληλη εξαγωγή.
+    # Δημιουργεί δύο διαστήματα ανά worker ώστε να εξισορροπείται το φορτίο
+    # όταν κάποιες σελίδες (π.χ. πίνακες) είναι πιο αργές από άλλες.
+    # Το max_range_pages περιορίζει το μέγεθος κάθε διαστήματος, ώστε οι σελίδες
+    # να φτάνουν σταδιακά στα επόμενα στάδια (streaming) ακόμη και σε μικρά αρχεία.
+    if page_count <= 0:
+        return []
+    if workers <= 1 or page_count < min_pages_for_parallel:
+        parts = 1
+    else:
+        parts = min(page_count, workers * 2)
+    if max_range_pages:
+        parts = max(parts, -(-page_count // max_range_pages))
+    step, extra = divmod(page_count, parts)
+    ranges: List[Tuple[int, int]] = []
+    start = 0
+    for i in range(parts):
+        stop = start + step + (1 if i < extra else 0)
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+def extract_pdf_text_with_pages(
+    path: str,
+    workers: Optional[int] = None,
+    min_pages_for_parallel: int = PDF_PARALLEL_MIN_PAGES,
+) -> List[Tuple[int, str]]:
+    # Εξάγει το κείμενο από αρχεία PDF.
+    # Επιστρέφει μια λίστα με ζεύγη (αριθμός σελίδας, κείμενο).
+    # Με workers > 1 οι σελίδες μοιράζονται σε διεργασίες (PDF_EXTRACT_WORKERS),
+    # ενώ τα μικρά αρχεία διαβάζονται σειριακά.
+    if workers is None:
+        workers = int(os.getenv("PDF_EXTRACT_WORKERS", "1"))
+
+    reader = PdfReader(path)
+    page_count = len(reader.pages)
+    ranges = split_page_ranges(page_count, workers, min_pages_for_parallel)
+    if len(ranges) <= 1:
+        return _extract_pages(reader, 0, page_count)
+
+    results: List[Tuple[int, str]] = []
+    with ProcessPoolExecutor(max_workers=min(workers, len(ranges))) as pool:
+        futures = [pool.submit(extract_pdf_page_range, path, start, stop) for start, stop in ranges]
+        for future in futures:
+            results.extend(future.result())
     return results
 
 
+# Τέλος πρότασης: τελεία, θαυμαστικό ή ερωτηματικό, κενό και κεφαλαίο (ελληνικό ή λατινικό) γράμμα.
+_SENTENCE_BREAK = re.compile(r'[.!;] (?=[Α-ΩA-Z])')
+
+
+def _sentence_spans(text: str) -> Tuple[str, List[int]]:
+    # Αντικαθιστώ τα πολλαπλά κενά με ένα, αφαιρώ τα κενά στην αρχή/τέλος και επιστρέφω το
+    # κείμενο μαζί με τη θέση όπου ξεκινά κάθε πρόταση· κάθε πρόταση τελειώνει ένα κενό πριν
+    # από την επόμενη. Υποστηρίζει το ελληνικό αλφάβητο.
+    normalized = " ".join(text.split())
+    if not normalized:
+        return normalized, []
+    starts = [0]
+    starts.extend(match.end() for match in _SENTENCE_BREAK.finditer(normalized))
+    return normalized, starts
+
+
 def _split_into_sentences(text: str) -> List[str]:
     # Διαχωρίζει το κείμενο σε επιμέρους προτάσεις.
-    # Υποστηρίζει το ελληνικό αλφάβητο και χρησιμοποιεί Regular Expressions.
-    
-    # Αντικαθιστώ τα πολλαπλά κενά με ένα και αφαιρώ τα κενά στην αρχή/τέλος.
-    text = re.sub(r'\s+', ' ', text).strip()
-    
-    # Εφαρμόζω διαχωρισμό σε τελείες, θαυμαστικά και ερωτηματικά, αποφεύγοντας λανθασμένες διακοπές.
-    sentences = re.split(r'(?<=[.!;]) +(?=[Α-ΩA-Z])|(?<=\.) (?=[Α-ΩA-Z])', text)
-    
-    # Φιλτράρω και αφαιρώ τυχόν κενές συμβολοσειρές από τα αποτελέσματα.
-    return [s.strip() for s in sentences if s.strip()]
+    normalized, starts = _sentence_spans(text)
+    ends = [start - 1 for start in starts[1:]] + [len(normalized)]
+    return [normalized[start:end] for start, end in zip(starts, ends)]
+
+
+def chunk_prefix(prefix: str, prefix_max_tokens: int = 8) -> str:
+    # Το πρόθεμα όπως γράφεται στην αρχή κάθε chunk από το chunk_text.
+    return " ".join((prefix or "").split()[: max(0, prefix_max_tokens)])
+
+
+def _pack_sentences(
+    starts: List[int],
+    ends: List[int],
+    sizes: Sequence[int],
+    limit: int,
+    overlap: int,
+    split_long: Callable[[int], Iterable[Tuple[int, int]]],
+    fit_overlap: bool = False,
+) -> Iterator[Tuple[int, int]]:
+    # Ομαδοποιεί διαδοχικές προτάσεις σε τμήματα έως limit και επιστρέφει τα όριά τους (αρχή,
+    # τέλος) στο κανονικοποιημένο κείμενο. Το sizes είναι αθροιστικό (sizes[i] = μέγεθος πριν
+    # από την πρόταση i), οπότε το τρέχον τμήμα είναι το διάστημα προτάσεων [first, i) και η
+    # επικάλυψη μία δυαδική αναζήτηση. Με fit_overlap η επικάλυψη μικραίνει ώστε μαζί με την
+    # επόμενη πρόταση να μην ξεπερνά το limit (ο τεμαχισμός σε λέξεις το επιτρέπει, όπως πάντα).
+    first = 0
+    for i in range(len(starts)):
+        # Ελέγχω αν η πρόταση χωράει στο τρέχον τμήμα και την προσθέτω.
+        if sizes[i + 1] - sizes[first] <= limit:
+            continue
+
+        # Ολοκληρώνω το τρέχον τμήμα.
+        if first < i:
+            yield starts[first], ends[i - 1]
+
+        if sizes[i + 1] - sizes[i] > limit:
+            # Διαχειρίζομαι προτάσεις που υπερβαίνουν από μόνες τους το μέγιστο μέγεθος,
+            # χωρίζοντάς τες αναγκαστικά σε μικρότερα κομμάτια λέξεων.
+            yield from split_long(i)
+            first = i + 1
+        elif overlap > 0 and first < i:
+            # Επικάλυψη (overlap): οι τελευταίες ολόκληρες προτάσεις του προηγούμενου τμήματος
+            # με έως overlap συνολικά, για τη διασφάλιση της συνέχειας (context).
+            floor = sizes[i] - overlap
+            if fit_overlap:
+                floor = max(floor, sizes[i + 1] - limit)
+            first = bisect_left(sizes, floor, first, i)
+        else:
+            first = i
+
+    # Το τελευταίο τμήμα κειμένου που απέμεινε.
+    if first < len(starts):
+        yield starts[first], ends[-1]
+
+
+def _word_starts(text: str, start: int, end: int) -> List[int]:
+    # Θέσεις όπου ξεκινά κάθε λέξη του text[start:end], με end + 1 στο τέλος ως φρουρό.
+    positions = [start]
+    space = text.find(" ", start, end)
+    while space >= 0:
+        positions.append(space + 1)
+        space = text.find(" ", space + 1, end)
+    positions.append(end + 1)
+    return positions
 
 
 def chunk_text(
@@ -47,97 +195,107 @@ def chunk_text(
     preserve_sentences: bool = True,
 ) -> List[str]:
     # Τεμαχίζει το κείμενο σε μικρότερα τμήματα (chunks) για σημασιολογική αναζήτηση.
+    # Τα chunk_size και chunk_overlap μετρώνται σε λέξεις.
     if not text:
         return []
 
     # Υπολογίζω το μέγεθος του προθέματος (prefix) για να βρω τον πραγματικό διαθέσιμο χώρο.
-    prefix_tokens = (prefix or "").split()[: max(0, prefix_max_tokens)]
-    effective_size = max(1, chunk_size - len(prefix_tokens))
+    # Το πρόθεμα ενώνεται μία φορά και μπαίνει μπροστά σε κάθε chunk.
+    head = chunk_prefix(prefix, prefix_max_tokens)
+    effective_size = max(1, chunk_size - len(head.split()))
+
+    def with_head(body: str) -> str:
+        return f"{head} {body}" if head else body
 
     # Εάν έχει επιλεγεί η διατήρηση προτάσεων, διαχωρίζω το κείμενο βάσει συντακτικής δομής.
     if preserve_sentences:
-        sentences = _split_into_sentences(text)
-        if not sentences:
-            # Αν δεν βρεθούν προτάσεις, εφαρμόζω εναλλακτική μέθοδο διαχωρισμού βάσει λέξεων.
-            return chunk_text(text, chunk_size, chunk_overlap, prefix, prefix_max_tokens, preserve_sentences=False)
-        
-        chunks: List[str] = []
-        current_chunk: List[str] = []
-        current_length = 0
-        
-        for sentence in sentences:
-            sentence_tokens = sentence.split()
-            sentence_length = len(sentence_tokens)
-            
-            # Ελέγχω αν η πρόταση χωράει στο τρέχον τμήμα και την προσθέτω.
-            if current_length + sentence_length <= effective_size:
-                current_chunk.append(sentence)
-                current_length += sentence_length
-            else:
-                # Ολοκληρώνω το τρέχον τμήμα και το αποθηκεύω στη λίστα.
-                if current_chunk:
-                    chunk_text_str = " ".join(current_chunk).strip()
-                    if chunk_text_str:
-                        final_chunk = (" ".join(prefix_tokens + [chunk_text_str])).strip()
-                        chunks.append(final_chunk)
-                
-                # Διαχειρίζομαι προτάσεις που υπερβαίνουν από μόνες τους το μέγιστο μέγεθος,
-                # χωρίζοντάς τες αναγκαστικά σε μικρότερα κομμάτια λέξεων.
-                if sentence_length > effective_size:
-                    words = sentence_tokens
-                    for i in range(0, len(words), effective_size):
-                        chunk_words = words[i:i + effective_size]
-                        chunk_text_str = " ".join(chunk_words).strip()
-                        if chunk_text_str:
-                            final_chunk = (" ".join(prefix_tokens + [chunk_text_str])).strip()
-                            chunks.append(final_chunk)
-                    current_chunk = []
-                    current_length = 0
-                else:
-                    # Υπολογίζω την επικάλυψη (overlap) διατηρώντας τις τελευταίες προτάσεις
-                    # του προηγούμενου τμήματος για τη διασφάλιση της συνέχειας (context).
-                    if chunk_overlap > 0 and len(current_chunk) > 0:
-                        overlap_sentences = []
-                        overlap_length = 0
-                        for sent in reversed(current_chunk):
-                            sent_len = len(sent.split())
-                            if overlap_length + sent_len <= chunk_overlap:
-                                overlap_sentences.insert(0, sent)
-                                overlap_length += sent_len
-                            else:
-                                break
-                        current_chunk = overlap_sentences
-                        current_length = overlap_length
-                    else:
-                        current_chunk = []
-                        current_length = 0
-                    
-                    # Ξεκινώ το νέο τμήμα με την τρέχουσα πρόταση.
-                    current_chunk.append(sentence)
-                    current_length += sentence_length
-        
-        # Αποθηκεύω το τελευταίο τμήμα κειμένου που απέμεινε.
-        if current_chunk:
-            chunk_text_str = " ".join(current_chunk).strip()
-            if chunk_text_str:
-                final_chunk = (" ".join(prefix_tokens + [chunk_text_str])).strip()
-                chunks.append(final_chunk)
-        
-        return chunks
-    
+        normalized, starts = _sentence_spans(text)
+        if not starts:
+            # Χωρίς προτάσεις το κείμενο είναι μόνο κενά, άρα δεν υπάρχουν ούτε λέξεις.
+            return []
+
+        # Οι προτάσεις είναι συνεχόμενα τμήματα του κανονικοποιημένου κειμένου, χωρισμένα με ένα
+        # κενό· υπολογίζω μία φορά τα αθροίσματα λέξεων και κάθε chunk είναι ένα slice.
+        count = len(starts)
+        ends = [start - 1 for start in starts[1:]] + [len(normalized)]
+        words = [0] * (count + 1)
+        for i in range(count):
+            words[i + 1] = words[i] + normalized.count(" ", starts[i], ends[i]) + 1
+
+        def split_long(i: int) -> Iterator[Tuple[int, int]]:
+            positions = _word_starts(normalized, starts[i], ends[i])
+            last = len(positions) - 1
+            for start in range(0, last, effective_size):
+                yield positions[start], positions[min(start + effective_size, last)] - 1
+
+        return [
+            with_head(normalized[start:end])
+            for start, end in _pack_sentences(starts, ends, words, effective_size, chunk_overlap, split_long)
+        ]
+
     # Εναλλακτική μέθοδος: Διαχωρισμός βάσει πλήθους λέξεων (sliding window).
     tokens = text.split()
     chunks: List[str] = []
     start = 0
     while start < len(tokens):
         end = min(len(tokens), start + effective_size)
-        main = " ".join(tokens[start:end]).strip()
-        if main:
-            chunk = (" ".join(prefix_tokens + [main])).strip()
-            chunks.append(chunk)
+        chunks.append(with_head(" ".join(tokens[start:end])))
         if end == len(tokens):
             break
         # Μετακινώ το παράθυρο ανάγνωσης λαμβάνοντας υπόψη την επικάλυψη.
         start = max(0, end - chunk_overlap)
 
-    return chunks
\ No newline at end of file
+    return chunks
+
+
+def chunk_text_tokens(
+    text: str,
+    tokenizer,
+    chunk_size: int = 800,
+    chunk_overlap: int = 128,
+    prefix: str = "",
+    prefix_max_tokens: int = 8,
+) -> Tuple[List[str], List[int], int]:
+    # Τεμαχισμός όπου τα chunk_size και chunk_overlap μετρώνται σε tokens του μοντέλου (ο
+    # tokenizer είναι ο cf_ai.Tokenizer). Η σελίδα κωδικοποιείται μία φορά· από τις θέσεις των
+    # tokens προκύπτει το μέγεθος κάθε πρότασης και λέξης, και κάθε chunk παίρνει τον ακριβή
+    # αριθμό tokens του χωρίς νέα κωδικοποίηση (βλ. Tokenizer.count_chunks). Οι προτάσεις
+    # κρατιούνται ακέραιες όπου χωράνε· μεγαλύτερες χωρίζονται σε όρια λέξεων. Επιστρέφει
+    # (chunks, tokens ανά chunk, tokens της σελίδας με ενιαία κενά).
+    normalized, starts = _sentence_spans(text)
+    if not starts:
+        return [], [], 0
+
+    head = chunk_prefix(prefix, prefix_max_tokens)
+    head_tokens = tokenizer.count(head) if head else 0
+    effective_size = max(1, chunk_size - head_tokens)
+
+    # Θέσεις των tokens του " " + κειμένου: τα tokens του " " + text[a:b] είναι όσα ξεκινούν στο
+    # [a, b + 1), για κάθε τμήμα που αρχίζει και τελειώνει σε όριο λέξης.
+    token_starts = tokenizer.token_starts(" " + normalized)
+    ends = [start - 1 for start in starts[1:]] + [len(normalized)]
+    sizes = np.searchsorted(token_starts, starts + [len(normalized) + 1]).tolist()
+
+    def split_long(i: int) -> Iterator[Tuple[int, int]]:
+        positions = _word_starts(normalized, starts[i], ends[i])
+        totals = np.searchsorted(token_starts, positions).tolist()
+        last = len(positions) - 1
+        start = 0
+        while start < last:
+            # Όσες περισσότερες λέξεις χωράνε· τουλάχιστον μία, ακόμη κι αν την ξεπερνά.
+            end = min(last, max(start + 1, bisect_right(totals, totals[start] + effective_size) - 1))
+            yield positions[start], positions[end] - 1
+            start = end
+
+    chunks: List[str] = []
+    counts: List[int] = []
+    for start, end in _pack_sentences(starts, ends, sizes, effective_size, chunk_overlap, split_long, fit_overlap=True):
+        body = normalized[start:end]
+        tokens = int(np.searchsorted(token_starts, end + 1) - np.searchsorted(token_starts, start))
+        if head:
+            chunks.append(f"{head} {body}")
+            counts.append(head_tokens + tokens)
+        else:
+            chunks.append(body)
+            counts.append(tokens - tokenizer.leading_space_tokens(body))
+    return chunks, counts, len(token_starts) - tokenizer.leading_space_tokens(normalized)
@@ -1,26 +1,72 @@
-from typing import List, Tuple
+import os
+import posixpath
+import sys
+import zipfile
+from typing import Dict, Iterator, List, Tuple
+
+from lxml import etree
 from pptx import Presentation
 
+# Γρήγορη εξαγωγή απευθείας από το XML των διαφανειών (το lxml έρχεται ήδη με το python-pptx)·
+# με 0 χρησιμοποιείται πάντα το python-pptx.
+PPTX_FAST_PATH = os.getenv("PPTX_FAST_PATH", "1") == "1"
+
+_NS_P = "http://schemas.openxmlformats.org/presentationml/2006/main"
+_NS_A = "http://schemas.openxmlformats.org/drawingml/2006/main"
+_NS_R = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_NS_REL = "http://schemas.openxmlformats.org/package/2006/relationships"
+_OFFICE_DOCUMENT = _NS_R + "/officeDocument"
+
+_SLD = f"{{{_NS_P}}}sld"
+_C_SLD = f"{{{_NS_P}}}cSld"
+_SP_TREE = f"{{{_NS_P}}}spTree"
+_SP = f"{{{_NS_P}}}sp"
+_TX_BODY = f"{{{_NS_P}}}txBody"
+_A_P = f"{{{_NS_A}}}p"
+_RUN_TEXT = f"{{{_NS_A}}}r/{{{_NS_A}}}t"
+# Τα σχήματα που απαριθμεί το python-pptx στο p:spTree.
+_SHAPE_TAGS = tuple(f"{{{_NS_P}}}{tag}" for tag in ("sp", "grpSp", "graphicFrame", "cxnSp", "pic", "contentPart"))
+
 
 def extract_pptx_text_with_slides(path: str) -> List[Tuple[int, str]]:
     # Εξάγει το κείμενο από αρχεία PowerPoint.
     # Επιστρέφει μια λίστα με ζεύγη (αριθμός διαφάνειας, κείμενο),
     # επιτρέποντας την ακριβή αναφορά στην πηγή κατά την αναζήτηση.
-    
+    return list(iter_pptx_text_with_slides(path))
+
+
+def iter_pptx_text_with_slides(path: str) -> Iterator[Tuple[int, str]]:
+    # Παράγει τις διαφάνειες μία-μία, ώστε ο τεμαχισμός να ξεκινά πριν τελειώσει η εξαγωγή.
+    # Δοκιμάζει πρώτα την ανάγνωση του XML· αν αποτύχει σε κάποια διαφάνεια, οι υπόλοιπες
+    # διαβάζονται με το python-pptx.
+    done = 0
+    if PPTX_FAST_PATH:
+        try:
+            for i, slide_text in _iter_slides_xml(path):
+                yield i, slide_text
+                done = i
+            return
+        except Exception as e:
+            print(f"Warning: fast PPTX extraction failed ({e}); using python-pptx", file=sys.stderr)
+    yield from _iter_slides_pptx(path, start=done + 1)
+
+
+def _iter_slides_pptx(path: str, start: int = 1) -> Iterator[Tuple[int, str]]:
     # Φορτώνω το αρχείο παρουσίασης χρησιμοποιώντας τη βιβλιοθήκη python-pptx.
     prs = Presentation(path)
-    results: List[Tuple[int, str]] = []
 
     # Διασχίζω όλες τις διαφάνειες της παρουσίασης, ξεκινώντας την αρίθμηση από το 1.
     for i, slide in enumerate(prs.slides, start=1):
+        if i < start:
+            continue
         parts: List[str] = []
-        
+
         # Ελέγχω κάθε αντικείμενο (shape) μέσα στη διαφάνεια για να βρω κείμενο.
         for shape in slide.shapes:
             # Αν το αντικείμενο δεν έχει πλαίσιο κειμένου (π.χ. είναι απλή εικόνα), το αγνοώ.
             if not hasattr(shape, "has_text_frame"):
                 continue
-            
+
             if shape.has_text_frame:
                 text_runs: List[str] = []
                 # Διαβάζω το κείμενο παράγραφο προς παράγραφο για να διατηρήσω τη δομή.
@@ -28,14 +74,84 @@ def extract_pptx_text_with_slides(path: str) -> List[Tuple[int, str]]:
                     # Ενώνω τα επιμέρους τμήματα (runs) της παραγράφου.
                     run_text = "".join(run.text or "" for run in paragraph.runs)
                     text_runs.append(run_text)
-                
+
                 # Κρατάω μόνο τις γραμμές που έχουν πραγματικό περιεχόμενο (όχι κενά).
                 parts.append("\n".join([t for t in text_runs if t.strip()]))
-        
+
         # Ενώνω όλα τα τμήματα κειμένου που βρέθηκαν στη διαφάνεια σε ένα ενιαίο string.
         slide_text = "\n".join([p for p in parts if p.strip()])
-        
-        # Αποθηκεύω το αποτέλεσμα (Αριθμός Διαφάνειας, Κείμενο) στη λίστα.
-        results.append((i, slide_text))
-        
-    return results
\ No newline at end of file
+
+        # Επιστρέφω το αποτέλεσμα (Αριθμός Διαφάνειας, Κείμενο).
+        yield i, slide_text
+
+
+def _iter_slides_xml(path: str) -> Iterator[Tuple[int, str]]:
+    # Διαβάζει τις διαφάνειες κατευθείαν από το zip: μόνο τα .rels, το presentation.xml και
+    # τα slideN.xml, με σταδιακή ανάλυση. Τα μέρη πολυμέσων (εικόνες, βίντεο) δεν ανοίγονται ποτέ.
+    with zipfile.ZipFile(path) as zf:
+        for i, name in enumerate(_slide_part_names(zf), start=1):
+            with zf.open(name) as stream:
+                yield i, _slide_text(stream)
+
+
+def _parse_part(zf: zipfile.ZipFile, name: str):
+    with zf.open(name) as stream:
+        return etree.parse(stream, etree.XMLParser(resolve_entities=False, no_network=True)).getroot()
+
+
+def _relationships(zf: zipfile.ZipFile, part_name: str) -> Dict[str, Tuple[str, str]]:
+    # rId -> (τύπος σχέσης, όνομα μέρους μέσα στο zip) για τις εσωτερικές σχέσεις ενός μέρους.
+    base, filename = posixpath.split(part_name)
+    root = _parse_part(zf, posixpath.join(base, "_rels", filename + ".rels"))
+    rels = {}
+    for rel in root.iterfind(f"{{{_NS_REL}}}Relationship"):
+        if rel.get("TargetMode") == "External":
+            continue
+        target = rel.get("Target", "")
+        if target.startswith("/"):
+            name = target.lstrip("/")
+        else:
+            name = posixpath.normpath(posixpath.join(base, target))
+        rels[rel.get("Id")] = (rel.get("Type"), name)
+    return rels
+
+
+def _slide_part_names(zf: zipfile.ZipFile) -> List[str]:
+    # Η σειρά των διαφανειών είναι αυτή του p:sldIdLst στο presentation.xml (όπως στο python-pptx),
+    # όχι η αρίθμηση των ονομάτων slideN.xml.
+    main = [name for rel_type, name in _relationships(zf, "").values() if rel_type == _OFFICE_DOCUMENT]
+    if len(main) != 1:
+        raise ValueError("presentation part not found")
+    presentation = _parse_part(zf, main[0])
+    if presentation.tag != f"{{{_NS_P}}}presentation":
+        raise ValueError(f"unexpected presentation root {presentation.tag}")
+    rels = _relationships(zf, main[0])
+    return [rels[sld_id.get(f"{{{_NS_R}}}id")][1] for sld_id in presentation.iterfind(f"{{{_NS_P}}}sldIdLst/{{{_NS_P}}}sldId")]
+
+
+def _slide_text(stream) -> str:
+    # Ίδια επιλογή με το python-pptx: μόνο τα p:sp που είναι άμεσα παιδιά του p:spTree και έχουν
+    # p:txBody (όχι ομάδες, πίνακες ή εικόνες), και σε κάθε a:p μόνο το a:t των a:r της
+    # (όχι a:br ή a:fld). Ο parser αναφέρει μόνο το τέλος των σχημάτων και κάθε σχήμα του
+    # p:spTree αδειάζει μόλις διαβαστεί, ώστε η μνήμη να μη μεγαλώνει με το μέγεθος της διαφάνειας.
+    parts: List[str] = []
+    events = etree.iterparse(stream, events=("end",), tag=_SHAPE_TAGS, resolve_entities=False, no_network=True)
+    for _, elem in events:
+        parent = elem.getparent()
+        if parent is None or parent.tag != _SP_TREE or not _is_slide_tree(parent):
+            continue
+        tx_body = elem.find(_TX_BODY) if elem.tag == _SP else None
+        if tx_body is not None:
+            paragraphs = ["".join(t.text or "" for t in p.iterfind(_RUN_TEXT)) for p in tx_body.iterfind(_A_P)]
+            parts.append("\n".join([t for t in paragraphs if t.strip()]))
+        elem.clear()
+        while elem.getprevious() is not None:
+            del parent[0]
+    if events.root is None or events.root.tag != _SLD:
+        raise ValueError("unexpected slide root")
+    return "\n".join([p for p in parts if p.strip()])
+
+
+def _is_slide_tree(sp_tree) -> bool:
+    c_sld = sp_tree.getparent()
+    return c_sld is not None and c_sld.tag == _C_SLD and c_sld.getparent() is not None and c_sld.getparent().tag == _SLD
@@ -0,0 +1,233 @@
+import itertools
+import os
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+from .index_store import Chunk
+
+
+def normalize_question(text: str) -> str:
+    # Κανονικοποίηση για το κλειδί: ίδια μορφή Unicode, πεζά και ενιαία κενά, ώστε μια
+    # επανάληψη της ίδιας ερώτησης να βρίσκει την ίδια εγγραφή.
+    return " ".join(unicodedata.normalize("NFC", text).casefold().split())
+
+
+class LRUCache:
+    # Απλή LRU cache στη μνήμη με όριο εγγραφών και μετρητές επιτυχιών.
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def discard_where(self, predicate) -> int:
+        with self._lock:
+            stale = [key for key in self._entries if predicate(key)]
+            for key in stale:
+                del self._entries[key]
+            return len(stale)
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits / total) if total else 0.0,
+        }
+
+
+class QueryCache:
+    # Δύο επίπεδα cache για το /query, μέσα σε κάθε worker:
+    #   embeddings - κανονικοποιημένη ερώτηση -> διάνυσμα (ανεξάρτητο από τη συνεδρία).
+    #   results    - (συνεδρία, έκδοση ευρετηρίου, ερώτηση, k) -> (διάνυσμα, αποτελέσματα αναζήτησης).
+    # Η έκδοση είναι η σφραγίδα (mtime, μέγεθος) των αρχείων του ευρετηρίου, οπότε κάθε αλλαγή
+    # στη συνεδρία (από οποιονδήποτε worker) οδηγεί σε νέα κλειδιά· όταν ο ίδιος worker
+    # δημοσιεύει νέα έκδοση, οι παλιές εγγραφές της συνεδρίας αφαιρούνται αμέσως.
+    def __init__(self, max_embeddings: int = 1024, max_results: int = 256):
+        self.embeddings = LRUCache(max_embeddings)
+        self.results = LRUCache(max_results)
+
+    def get_embedding(self, question: str) -> Optional[np.ndarray]:
+        return self.embeddings.get(normalize_question(question))
+
+    def put_embedding(self, question: str, vector: np.ndarray) -> None:
+        self.embeddings.put(normalize_question(question), np.asarray(vector, dtype=np.float32))
+
+    def get_results(
+        self, session_id: str, version: Tuple, question: str, k: int
+    ) -> Optional[Tuple[np.ndarray, List[Tuple[float, Chunk]]]]:
+        return self.results.get((session_id, version, normalize_question(question), k))
+
+    def put_results(
+        self, session_id: str, version: Tuple, question: str, k: int,
+        vector: np.ndarray, results: List[Tuple[float, Chunk]],
+    ) -> None:
+        self.results.put((session_id, version, normalize_question(question), k), (vector, list(results)))
+
+    def invalidate_session(self, session_id: str) -> int:
+        return self.results.discard_where(lambda key: key[0] == session_id)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return {"embeddings": self.embeddings.stats(), "results": self.results.stats()}
+
+
+class AnswerCache:
+    # Σημασιολογική cache απαντήσεων του LLM ανά συνεδρία και έκδοση ευρετηρίου. Μια απάντηση
+    # ξαναχρησιμοποιείται όταν η νέα ερώτηση έχει cosine ομοιότητα τουλάχιστον threshold με μια
+    # αποθηκευμένη και η αναζήτηση επέστρεψε ακριβώς το ίδιο σύνολο chunks (και ίδιο mode), οπότε
+    # το μοντέλο θα έβλεπε το ίδιο context. Οι εγγραφές λήγουν μετά από ttl δευτερόλεπτα και οι
+    # λιγότερο πρόσφατα χρησιμοποιημένες αφαιρούνται όταν ξεπεραστεί το max_entries.
+    def __init__(self, threshold: float = 0.95, ttl: float = 3600.0, max_entries: int = 512):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # id εγγραφής -> (scope, διάνυσμα, chunks, mode, απάντηση, tokens, χρόνος δημιουργίας)
+        self._entries: "OrderedDict[int, Tuple]" = OrderedDict()
+        self._by_scope: Dict[Tuple[str, Tuple], List[int]] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+        self.saved_tokens = 0
+
+    def _drop(self, entry_id: int) -> None:
+        scope = self._entries.pop(entry_id)[0]
+        ids = self._by_scope.get(scope)
+        if ids is not None:
+            ids.remove(entry_id)
+            if not ids:
+                del self._by_scope[scope]
+
+    def get(
+        self, session_id: str, version: Tuple, vector: np.ndarray, chunk_ids: frozenset, mode: str
+    ) -> Optional[str]:
+        vector = _unit(vector)
+        now = time.monotonic()
+        with self._lock:
+            best_id, best_score = None, self.threshold
+            for entry_id in list(self._by_scope.get((session_id, version), ())):
+                _, cached_vec, cached_chunks, cached_mode, _, _, created = self._entries[entry_id]
+                if now - created > self.ttl:
+                    self._drop(entry_id)
+                    self.expired += 1
+                    continue
+                if cached_chunks != chunk_ids or cached_mode != mode:
+                    continue
+                score = float(cached_vec @ vector)
+                if score >= best_score:
+                    best_id, best_score = entry_id, score
+            if best_id is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_id)
+            entry = self._entries[best_id]
+            self.hits += 1
+            self.saved_tokens += entry[5]
+            return entry[4]
+
+    def put(
+        self, session_id: str, version: Tuple, vector: np.ndarray, chunk_ids: frozenset, mode: str,
+        answer: str, tokens: int,
+    ) -> None:
+        scope = (session_id, version)
+        with self._lock:
+            entry_id = next(self._ids)
+            self._entries[entry_id] = (scope, _unit(vector), chunk_ids, mode, answer, tokens, time.monotonic())
+            self._by_scope.setdefault(scope, []).append(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_session(self, session_id: str) -> int:
+        with self._lock:
+            stale = [entry_id for entry_id, entry in self._entries.items() if entry[0][0] == session_id]
+            for entry_id in stale:
+                self._drop(entry_id)
+            return len(stale)
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "ttl_s": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expired": self.expired,
+            "hit_rate": (self.hits / total) if total else 0.0,
+            "saved_tokens": self.saved_tokens,
+        }
+
+
+def _unit(vector: np.ndarray) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32).ravel()
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm > 0 else vector
+
+
+_cache: Optional[QueryCache] = None
+_answer_cache: Optional[AnswerCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_query_cache() -> Optional[QueryCache]:
+    # Επιστρέφει την cache της διεργασίας, ή None αν έχει απενεργοποιηθεί.
+    global _cache
+    if os.getenv("QUERY_CACHE_ENABLED", "1") != "1":
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = QueryCache(
+                    max_embeddings=int(os.getenv("QUERY_EMBED_CACHE_SIZE", "1024")),
+                    max_results=int(os.getenv("QUERY_RESULT_CACHE_SIZE", "256")),
+                )
+    return _cache
+
+
+def get_answer_cache() -> Optional[AnswerCache]:
+    # Επιστρέφει την cache απαντήσεων της διεργασίας, ή None αν έχει απενεργοποιηθεί.
+    global _answer_cache
+    if os.getenv("ANSWER_CACHE_ENABLED", "1") != "1":
+        return None
+    if _answer_cache is None:
+        with _cache_lock:
+            if _answer_cache is None:
+                _answer_cache = AnswerCache(
+                    threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95")),
+                    ttl=float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600")),
+                    max_entries=int(os.getenv("ANSWER_CACHE_SIZE", "512")),
+                )
+    return _answer_cache
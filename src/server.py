@@ -1,13 +1,19 @@
+import asyncio
 import os
 import sys
 import locale
 import uuid
 import shutil
 import secrets
+import hashlib
+from dataclasses import dataclass
 from datetime import datetime
-from typing import List, Optional, Tuple
+from collections import deque
+from typing import AsyncIterator, Deque, List, Optional, Tuple
 import json
 
+import numpy as np
+
 if sys.platform.startswith('win'):
     import codecs
     sys.stdout = codecs.getwriter('utf-8')(sys.stdout.detach())
@@ -25,17 +31,41 @@ from fastapi import FastAPI, UploadFile, File, Form, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import JSONResponse, FileResponse
+from starlette.responses import JSONResponse, FileResponse, StreamingResponse
 
-from .cf_ai import embed_texts, chat, build_rag_prompt, count_tokens_llama, validate_token_budget, calculate_optimal_k
+from .cf_ai import (
+    aembed_texts, achat, achat_stream, build_rag_prompt, count_tokens_llama, validate_token_budget, calculate_optimal_k,
+    get_tokenizer, cf_client_stats, close_cf_client, close_async_cf_client, EMBEDDING_MODEL,
+)
+from .embedding_cache import get_embedding_cache
+from .content_store import StoredContent, content_key, get_content_store
+from .store_cache import disk_stamp, get_store_cache
+from .query_cache import get_answer_cache, get_query_cache
+from .token_estimator import get_token_estimator
 import requests
-from .index_store import Chunk, FaissStore
-from .pdf_utils import extract_pdf_text_with_pages, chunk_text
+from .index_store import Chunk, FaissStore, read_manifest, remove_store_files
+from .pdf_utils import extract_pdf_page_range, pdf_page_count, split_page_ranges, chunk_prefix, chunk_text, chunk_text_tokens
 from .pptx_utils import extract_pptx_text_with_slides
 from .file_utils import safe_filename
 from .chat_history import ChatHistoryStore
+from .ingest_pipeline import BudgetSlot, TokenBudget, run_ingest_pipeline
+from .executors import StageExecutors
 
 MAX_BYTES = 50 * 1024 * 1024
+MAX_TOKENS_PER_FILE = 50000
+MAX_SESSION_TOKENS = 200000
+INGEST_FILE_CONCURRENCY = max(1, int(os.getenv("INGEST_FILE_CONCURRENCY", "4")))
+PIPELINE_QUEUE_SIZE = max(1, int(os.getenv("PIPELINE_QUEUE_SIZE", "8")))
+PIPELINE_EMBED_BATCH = max(1, int(os.getenv("PIPELINE_EMBED_BATCH", "32")))
+PIPELINE_PAGES_PER_TASK = max(1, int(os.getenv("PIPELINE_PAGES_PER_TASK", "8")))
+FAISS_MMAP_READS = os.getenv("FAISS_MMAP_READS", "1") == "1"
+QUERY_BATCH_MAX_QUESTIONS = max(1, int(os.getenv("QUERY_BATCH_MAX_QUESTIONS", "32")))
+QUERY_BATCH_CONCURRENCY = max(1, int(os.getenv("QUERY_BATCH_CONCURRENCY", "4")))
+# Μονάδα μεγέθους των chunks: "words" (1200 λέξεις, επικάλυψη 200) ή "tokens" (tokens του
+# tokenizer, με ακριβή αριθμό tokens σε κάθε chunk).
+CHUNK_UNIT = os.getenv("CHUNK_UNIT", "words")
+CHUNK_TOKENS = max(16, int(os.getenv("CHUNK_TOKENS", "800")))
+CHUNK_OVERLAP_TOKENS = max(0, int(os.getenv("CHUNK_OVERLAP_TOKENS", "128")))
 
 class FileIngestError(Exception):
     def __init__(self, reason: str, stage: str): 
@@ -56,7 +86,7 @@ def get_session_index_paths(session_id: str, create_if_missing: bool = False) ->
     if create_if_missing:
         os.makedirs(session_dir, exist_ok=True)
     index_path = os.path.join(session_dir, "index.faiss")
-    meta_path = os.path.join(session_dir, "metadata.json")
+    meta_path = os.path.join(session_dir, "metadata.bin")
     return index_path, meta_path
 
 def get_session_upload_dir(session_id: str, create_if_missing: bool = False) -> str:
@@ -177,7 +207,154 @@ def _log_add(line: str) -> None:
     except Exception:
         pass
 
-async def _process_one_file(up: UploadFile, session_id: str) -> Tuple[List[Chunk], List[str], str, dict]:
+def _chunker_params(original_name: str) -> dict:
+    # Ό,τι επηρεάζει τα chunks ή τα διανύσματα ενός αρχείου· μέρος του κλειδιού στο content store.
+    # Το πρόθεμα (όνομα αρχείου) περιλαμβάνεται επειδή γράφεται μέσα στο κείμενο κάθε chunk.
+    params = {
+        "prefix": os.path.splitext(original_name)[0],
+        "chunk_size": 1200,
+        "chunk_overlap": 200,
+        "embedding_model": EMBEDDING_MODEL,
+    }
+    # Η μονάδα (και ο tokenizer που μετρά) μπαίνει στο κλειδί μόνο στον τεμαχισμό σε tokens,
+    # ώστε τα υπάρχοντα κλειδιά του τεμαχισμού σε λέξεις να μην αλλάζουν.
+    if CHUNK_UNIT == "tokens":
+        params.update(
+            chunk_unit="tokens", tokenizer=get_tokenizer().name,
+            chunk_size=CHUNK_TOKENS, chunk_overlap=min(CHUNK_OVERLAP_TOKENS, CHUNK_TOKENS // 2),
+        )
+    return params
+
+def _chunk_page(page_num: int, text: str, original_name: str, session_id: str) -> Tuple[List[Chunk], int]:
+    # Η σελίδα κωδικοποιείται μία φορά· τα tokens κάθε chunk προκύπτουν από τις θέσεις των tokens.
+    params = _chunker_params(original_name)
+    tokenizer = get_tokenizer()
+    if params.get("chunk_unit") == "tokens":
+        texts, counts, page_tokens = chunk_text_tokens(
+            text, tokenizer, chunk_size=params["chunk_size"], chunk_overlap=params["chunk_overlap"], prefix=params["prefix"]
+        )
+    else:
+        texts = chunk_text(text, chunk_size=params["chunk_size"], chunk_overlap=params["chunk_overlap"], prefix=params["prefix"])
+        counts, page_tokens = tokenizer.count_chunks(text, texts, chunk_prefix(params["prefix"]))
+    estimator = get_token_estimator()
+    if estimator is not None and tokenizer.exact:
+        estimator.observe("tiktoken", text, page_tokens)
+    chunks = [
+        Chunk(source=original_name, page=page_num, text=ch, session_id=session_id, tokens=n)
+        for ch, n in zip(texts, counts)
+    ]
+    return chunks, page_tokens
+
+def _remember_content(session_id: str, name: str, chunks: List[Chunk], vectors: np.ndarray, doc_metadata: dict) -> None:
+    # Αποθηκεύει το αποτέλεσμα εισαγωγής στο content store και καταγράφει την αναφορά της συνεδρίας.
+    content_store = get_content_store()
+    if content_store is None or not doc_metadata.get("sha256"):
+        return
+    key = content_key(doc_metadata["sha256"], _chunker_params(name))
+    stats = {f: doc_metadata.get(f, 0) for f in ("tokens", "pages", "characters", "words")}
+    content_store.put(key, StoredContent(
+        chunks=[(c.page, c.text, c.tokens) for c in chunks],
+        vectors=vectors,
+        metadata=stats,
+    ))
+    content_store.acquire(f"{session_id}/{name}", key)
+
+def _release_session_content(session_id: str) -> None:
+    content_store = get_content_store()
+    if content_store is not None:
+        content_store.release_session(session_id)
+
+def _finalize_upload(tmp_path: str, saved_file_path: str) -> None:
+    if not os.path.exists(saved_file_path):
+        shutil.move(tmp_path, saved_file_path)
+    else:
+        try:
+            os.remove(tmp_path)
+        except Exception:
+            pass
+
+def _write_json(path: str, data) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def _load_store(index_path: str, meta_path: str, mmap: bool = False) -> FaissStore:
+    store = FaissStore(dim=1024, index_path=index_path, meta_path=meta_path)
+    store.load(mmap=mmap)
+    return store
+
+def _load_store_for_write(index_path: str, meta_path: str) -> FaissStore:
+    # Για όσους γράφουν: μια συνεδρία σε παλιά μορφή αποθηκεύεται εδώ μία φορά στη νέα μορφή
+    # (ευρετήριο και μεταδεδομένα), ώστε οι επόμενες φορτώσεις να μη χρειάζονται μετατροπή.
+    store = _load_store(index_path, meta_path)
+    if store.migrate_legacy():
+        _log_add(f"Migrated legacy index format: {os.path.dirname(index_path)}")
+    return store
+
+def _load_store_readonly(index_path: str, meta_path: str) -> FaissStore:
+    return _load_store(index_path, meta_path, mmap=FAISS_MMAP_READS)
+
+def _load_store_cached(session_id: str, index_path: str, meta_path: str) -> FaissStore:
+    # Για αναγνώσεις μόνο: το store μπορεί να είναι κοινό με άλλα αιτήματα και δεν τροποποιείται.
+    # Όσοι γράφουν χρησιμοποιούν _load_store_for_write και δημοσιεύουν το αποτέλεσμα με _publish_store.
+    store_cache = get_store_cache()
+    if store_cache is None:
+        return _load_store_readonly(index_path, meta_path)
+    return store_cache.get(session_id, _load_store_readonly, index_path, meta_path)
+
+def _read_session_manifest(session_id: str, index_path: str, meta_path: str) -> dict:
+    # Σύνολα της συνεδρίας από την κεφαλίδα των μεταδεδομένων, χωρίς φόρτωση chunks ή FAISS.
+    # Συνεδρίες σε παλαιότερη μορφή φορτώνονται και μετατρέπονται μόνο στη μνήμη.
+    manifest = read_manifest(meta_path)
+    if manifest is None and os.path.exists(index_path):
+        manifest = _load_store_cached(session_id, index_path, meta_path).manifest()
+    return manifest or {"total_tokens": 0, "total_chunks": 0, "total_pages": 0, "documents": []}
+
+def _publish_store(session_id: str, store: Optional[FaissStore]) -> None:
+    # Τα αποτελέσματα αναζήτησης και οι απαντήσεις της προηγούμενης έκδοσης δεν θα ξαναχρησιμοποιηθούν.
+    query_cache = get_query_cache()
+    if query_cache is not None:
+        query_cache.invalidate_session(session_id)
+    answer_cache = get_answer_cache()
+    if answer_cache is not None:
+        answer_cache.invalidate_session(session_id)
+    store_cache = get_store_cache()
+    if store_cache is None:
+        return
+    if store is None:
+        store_cache.invalidate(session_id)
+    else:
+        store_cache.put(session_id, store)
+
+async def _iter_pdf_pages(path: str) -> AsyncIterator[Tuple[int, str]]:
+    # Μοιράζει τις σελίδες του PDF σε μικρά διαστήματα που εξάγονται παράλληλα στο parse pool
+    # και τις παραδίδει με τη σειρά μόλις είναι έτοιμες. Το πολύ parse_workers + 1 διαστήματα
+    # βρίσκονται σε εξέλιξη, ώστε η εξαγωγή να μην προηγείται πολύ των επόμενων σταδίων.
+    page_count = await executors.run("parse", pdf_page_count, path)
+    ranges = split_page_ranges(page_count, executors.parse_workers, max_range_pages=PIPELINE_PAGES_PER_TASK)
+    pending: Deque[asyncio.Future] = deque()
+    try:
+        for start, stop in ranges:
+            pending.append(asyncio.ensure_future(
+                executors.run("parse", extract_pdf_page_range, path, start, stop)
+            ))
+            if len(pending) > executors.parse_workers:
+                for pair in await pending.popleft():
+                    yield pair
+        while pending:
+            for pair in await pending.popleft():
+                yield pair
+    finally:
+        for future in pending:
+            future.cancel()
+
+async def _iter_pptx_slides(path: str) -> AsyncIterator[Tuple[int, str]]:
+    for pair in await executors.run("parse", extract_pptx_text_with_slides, path):
+        yield pair
+
+async def _process_one_file(
+    up: UploadFile, session_id: str, budget: BudgetSlot
+) -> Tuple[List[Chunk], Optional[np.ndarray], str, dict]:
     original_filename = up.filename or f'file_{uuid.uuid4().hex}'
     original_ext = os.path.splitext(original_filename)[1].lower()
     base_name = safe_filename(original_filename)
@@ -192,6 +369,7 @@ async def _process_one_file(up: UploadFile, session_id: str) -> Tuple[List[Chunk
     tmp_path = os.path.join(session_upload_dir, f"upload_{uuid.uuid4().hex}_{original_name}")
 
     bytes_written = 0
+    hasher = hashlib.sha256()
     try:
         with open(tmp_path, "wb") as fout:
             while True:
@@ -199,20 +377,17 @@ async def _process_one_file(up: UploadFile, session_id: str) -> Tuple[List[Chunk
                 if not chunk:
                     break
                 bytes_written += len(chunk)
+                hasher.update(chunk)
                 if bytes_written > MAX_BYTES:
                     raise FileIngestError("File is too large", "upload")
-                fout.write(chunk)
+                await executors.run("io", fout.write, chunk)
         await up.close()
         
         if bytes_written == 0:
             raise FileIngestError("Empty file", "upload")
 
         ext = original_ext if original_ext else os.path.splitext(original_name)[1].lower()
-        if ext == ".pdf":
-            pairs = extract_pdf_text_with_pages(tmp_path)
-        elif ext == ".pptx":
-            pairs = extract_pptx_text_with_slides(tmp_path)
-        else:
+        if ext not in (".pdf", ".pptx"):
             ext_display = ext if ext else "(no extension)"
             _log_add(f"Error: Unsupported file type '{ext_display}' for '{original_filename}'")
             raise FileIngestError(
@@ -221,9 +396,59 @@ async def _process_one_file(up: UploadFile, session_id: str) -> Tuple[List[Chunk
                 "validate"
             )
 
-        full_text = "\n\n".join([text for _, text in pairs if text.strip()])
-        total_tokens = count_tokens_llama(full_text)
-        MAX_TOKENS_PER_FILE = 50000
+        # Ίδιο αρχείο με ίδιες παραμέτρους: τα chunks και τα διανύσματα έρχονται από το content store,
+        # χωρίς εξαγωγή κειμένου και χωρίς κλήσεις embeddings.
+        sha256 = hasher.hexdigest()
+        content_store = get_content_store()
+        stored = None
+        if content_store is not None:
+            key = content_key(sha256, _chunker_params(original_name))
+            stored = await executors.run("io", content_store.get, key)
+        if stored is not None:
+            # Δέσμευση στη σειρά του αρχείου, ώστε τα επόμενα αρχεία να βλέπουν το ίδιο διαθέσιμο όριο.
+            await budget.wait_turn()
+            budget.claim(int(stored.metadata.get("tokens", 0)))
+            budget.finish()
+            chunks = [
+                Chunk(source=original_name, page=page, text=text, session_id=session_id, tokens=tokens)
+                for page, text, tokens in stored.chunks
+            ]
+            await executors.run("io", _finalize_upload, tmp_path, saved_file_path)
+            metadata = dict(stored.metadata)
+            metadata.update({
+                "filename": original_name,
+                "chunks": len(chunks),
+                "sha256": sha256,
+                "session_id": session_id,
+                "uploaded_at": datetime.now().isoformat(),
+            })
+            json_path = os.path.join(session_upload_dir, f"{os.path.splitext(original_name)[0]}.json")
+            try:
+                await executors.run("io", _write_json, json_path, metadata)
+            except Exception as e:
+                _log_add(f"Προειδοποίηση: Αποτυχία αποθήκευσης JSON για {original_name}: {e}")
+            _log_add(f"Content store hit for '{original_name}' ({sha256[:12]})")
+            return chunks, stored.vectors, original_name, metadata
+
+        # Δημιουργία τμημάτων κειμένου και embeddings σε ροή, σελίδα προς σελίδα
+        pages = _iter_pdf_pages(tmp_path) if ext == ".pdf" else _iter_pptx_slides(tmp_path)
+        async def process_page(page_num: int, text: str) -> Tuple[List[Chunk], int]:
+            return await executors.run("chunk", _chunk_page, page_num, text, original_name, session_id)
+
+        async def embed(texts: List[str]) -> np.ndarray:
+            try:
+                return await aembed_texts(texts)
+            except Exception as e:
+                raise FileIngestError(str(e), "embed")
+
+        result = await run_ingest_pipeline(
+            pages, process_page, embed,
+            budget=budget,
+            queue_size=PIPELINE_QUEUE_SIZE,
+            batch_size=PIPELINE_EMBED_BATCH,
+        )
+        total_tokens = result.tokens
+        chunks = result.chunks
         
         if total_tokens > MAX_TOKENS_PER_FILE:
             raise FileIngestError(
@@ -233,34 +458,21 @@ async def _process_one_file(up: UploadFile, session_id: str) -> Tuple[List[Chunk
                 "token_limit"
             )
 
-        # Δημιουργία τμημάτων κειμένου για τη διαδικασία αναζήτησης
-        chunks, texts = [], []
-        for page_num, text in pairs:
-            for ch in chunk_text(text, prefix=f"{os.path.splitext(original_name)[0]}"):
-                chunk_tokens = count_tokens_llama(ch)
-                chunks.append(Chunk(source=original_name, page=page_num, text=ch, session_id=session_id, tokens=chunk_tokens))
-                texts.append(ch)
-                
-        if not texts:
+        if not chunks:
             raise FileIngestError("Δεν εξήχθη κείμενο", "parse")
         
         # Μετακίνηση του αρχείου στην τελική διαδρομή αποθήκευσης
-        if not os.path.exists(saved_file_path):
-            shutil.move(tmp_path, saved_file_path)
-        else:
-            try:
-                os.remove(tmp_path)
-            except Exception:
-                pass
+        await executors.run("io", _finalize_upload, tmp_path, saved_file_path)
         
         # Συλλογή πληροφοριών και στατιστικών του εγγράφου
         metadata = {
             "filename": original_name,
             "tokens": total_tokens,
-            "pages": len([p for p, t in pairs if t.strip()]),
-            "chunks": len(texts),
-            "characters": len(full_text),
-            "words": len(full_text.split()),
+            "pages": result.pages,
+            "chunks": len(chunks),
+            "characters": result.characters,
+            "words": result.words,
+            "sha256": sha256,
             "session_id": session_id,
             "uploaded_at": datetime.now().isoformat()
         }
@@ -268,23 +480,27 @@ async def _process_one_file(up: UploadFile, session_id: str) -> Tuple[List[Chunk
         # Αποθήκευση των πληροφοριών σε αρχείο JSON
         json_path = os.path.join(session_upload_dir, f"{os.path.splitext(original_name)[0]}.json")
         try:
-            with open(json_path, "w", encoding="utf-8") as f:
-                json.dump(metadata, f, ensure_ascii=False, indent=2)
+            await executors.run("io", _write_json, json_path, metadata)
         except Exception as e:
             _log_add(f"Προειδοποίηση: Αποτυχία αποθήκευσης JSON για {original_name}: {e}")
         
-        return chunks, texts, original_name, metadata
+        return chunks, result.vectors, original_name, metadata
         
     except Exception:
+        # Το αρχείο δεν θα γίνει δεκτό: αποδεσμεύει ό,τι κράτησε και δίνει τη σειρά στο επόμενο.
+        budget.release()
         try:
             if os.path.exists(tmp_path):
                 os.remove(tmp_path)
         except Exception:
             pass
         raise
+    finally:
+        budget.finish()
 
 _ensure_dirs()
 chat_history_store = ChatHistoryStore(CHAT_HISTORY_DIR)
+executors = StageExecutors.from_env()
 
 # Μαζική εισαγωγή αρχείων και ενημέρωση του ευρετηρίου
 @app.post("/index/batch")
@@ -320,29 +536,38 @@ async def index_files(
 
     # Υπολογισμός υπαρχόντων δεδομένων στη συνεδρία
     index_path, meta_path = get_session_index_paths(session_id, create_if_missing=False)
-    existing_session_tokens = 0
-    if os.path.exists(meta_path):
-        try:
-            with open(meta_path, "r", encoding="utf-8") as f:
-                existing_metadata = json.load(f)
-                for chunk_data in existing_metadata:
-                    cached_tokens = chunk_data.get("tokens", 0)
-                    if cached_tokens > 0:
-                        existing_session_tokens += cached_tokens
-                    else:
-                        chunk_text = chunk_data.get("text", "")
-                        existing_session_tokens += count_tokens_llama(chunk_text)
-        except Exception:
-            pass
+    try:
+        manifest = await executors.run("io", _read_session_manifest, session_id, index_path, meta_path)
+        existing_session_tokens = manifest["total_tokens"]
+    except Exception:
+        existing_session_tokens = 0
 
     processed, failures = [], []
-    all_chunks, all_texts = [], []
+    accepted: List[Tuple[str, List[Chunk], Optional[np.ndarray], dict]] = []
+    all_texts = []
     new_documents_tokens = 0
 
-    # Επεξεργασία κάθε αρχείου ξεχωριστά
-    for up in inputs:
+    # Παράλληλη επεξεργασία των αρχείων (εξαγωγή, τεμαχισμός, tokens) με όριο INGEST_FILE_CONCURRENCY.
+    # Το όριο tokens της συνεδρίας δεσμεύεται με τη σειρά αποστολής πριν από τα embeddings.
+    fan_out = asyncio.Semaphore(INGEST_FILE_CONCURRENCY)
+    budget = TokenBudget(MAX_SESSION_TOKENS - existing_session_tokens, MAX_TOKENS_PER_FILE, len(inputs))
+
+    async def _process_guarded(position: int, up: UploadFile):
+        slot = budget.slot(position)
         try:
-            chunks, texts, name, doc_metadata = await _process_one_file(up, session_id)
+            async with fan_out:
+                return await _process_one_file(up, session_id, slot)
+        finally:
+            slot.finish()
+
+    outcomes = await asyncio.gather(*(_process_guarded(i, up) for i, up in enumerate(inputs)), return_exceptions=True)
+
+    # Ο έλεγχος ορίων γίνεται με τη σειρά αποστολής, ώστε το αποτέλεσμα να είναι ίδιο με τη σειριακή εκτέλεση
+    for up, outcome in zip(inputs, outcomes):
+        try:
+            if isinstance(outcome, BaseException):
+                raise outcome
+            chunks, vectors, name, doc_metadata = outcome
             doc_tokens = doc_metadata.get("tokens", 0)
             
             # Επικύρωση ορίων χρήσης για τη συνεδρία
@@ -360,12 +585,12 @@ async def index_files(
                 })
                 continue
             
-            all_chunks.extend(chunks)
-            all_texts.extend(texts)
+            accepted.append((name, chunks, vectors, doc_metadata))
+            all_texts.extend(c.text for c in chunks)
             new_documents_tokens += doc_tokens
             processed.append({
                 "name": name, 
-                "chunks": len(texts),
+                "chunks": len(chunks),
                 "tokens": doc_tokens,
                 "pages": doc_metadata.get("pages", 0)
             })
@@ -403,41 +628,48 @@ async def index_files(
 
     try:
         index_path, meta_path = get_session_index_paths(session_id, create_if_missing=True)
-        store = FaissStore(dim=1024, index_path=index_path, meta_path=meta_path)
-        store.load()
+        store = await executors.run("faiss", _load_store_for_write, index_path, meta_path)
         
         incoming_names = {p["name"] for p in processed}
-        has_prev_any = any(c.source in incoming_names for c in getattr(store, "metadata", []))
-
-        # Δημιουργία ή ενημέρωση της διανυσματικής αποθήκης
-        if not has_prev_any and len(getattr(store, "metadata", [])) == 0:
-            vectors = embed_texts(all_texts)
-            dim = vectors.shape[1]
-            if getattr(store, "dim", dim) != dim:
-                store = FaissStore(dim=dim, index_path=index_path, meta_path=meta_path)
-            store.add(vectors, all_chunks)
-            store.save()
-            status = 207 if failures else 200
-            return JSONResponse({
-                "ok": True, "processed": processed, "failed": failures,
-                "chunks_added": len(all_texts), "replaced": False, "session_id": session_id
-            }, status_code=status)
-
-        remaining = [c for c in getattr(store, "metadata", [])
-                     if c.source not in incoming_names]
-        merged_chunks = remaining + all_chunks
-        merged_texts = [c.text for c in merged_chunks]
-        vectors_all = embed_texts(merged_texts)
-        new_store = FaissStore(dim=vectors_all.shape[1], index_path=index_path, meta_path=meta_path)
-        new_store.add(vectors_all, merged_chunks)
-        new_store.save()
+        has_prev_any = any(name in incoming_names for name in store.sources())
+
+        # Τα embeddings υπολογίστηκαν ήδη κατά τη ροή εισαγωγής κάθε αρχείου. Αν η ροή σταμάτησε
+        # την ενσωμάτωση επειδή προηγούμενο αρχείο κράτησε tokens και απέτυχε αργότερα, ενώ το
+        # αρχείο τελικά έγινε δεκτό, υπολογίζονται εδώ.
+        for i, (name, chunks, vectors, doc_metadata) in enumerate(accepted):
+            if vectors is None:
+                accepted[i] = (name, chunks, await aembed_texts([c.text for c in chunks]), doc_metadata)
+
+        dim = accepted[0][2].shape[1]
+        if store.dim != dim:
+            if len(store):
+                raise RuntimeError(f"Embedding dimension mismatch: index={store.dim}, new={dim}")
+            store = FaissStore(dim=dim, index_path=index_path, meta_path=meta_path)
+
+        # Τα αρχεία που ξαναφορτώθηκαν αντικαθίστανται επιτόπου στο ευρετήριο
+        all_chunks: List[Chunk] = []
+        for name in incoming_names:
+            store.remove_source(name)
+        for _, chunks, vectors, _ in accepted:
+            store.add(vectors, chunks)
+            all_chunks.extend(chunks)
+        await executors.run("faiss", store.save)
+        _publish_store(session_id, store)
+
+        for name, chunks, vectors, doc_metadata in accepted:
+            try:
+                await executors.run("io", _remember_content, session_id, name, chunks, vectors, doc_metadata)
+            except Exception as e:
+                _log_add(f"Warning: Failed to store content for '{name}': {e}")
 
         status = 207 if failures else 200
-        return JSONResponse({
+        response = {
             "ok": True, "processed": processed, "failed": failures,
-            "chunks_added": len(all_texts), "total_chunks": len(merged_texts),
-            "replaced": has_prev_any, "session_id": session_id
-        }, status_code=status)
+            "chunks_added": len(all_texts), "replaced": has_prev_any, "session_id": session_id
+        }
+        if has_prev_any or len(store) > len(all_chunks):
+            response["total_chunks"] = len(store)
+        return JSONResponse(response, status_code=status)
 
     except requests.exceptions.HTTPError as e:
         status = getattr(getattr(e, "response", None), "status_code", 502) or 502
@@ -469,6 +701,177 @@ async def index_files(
         
         return JSONResponse({"ok": False, "error": f"Server error: {error_msg}", "processed": processed, "failed": failures, "session_id": session_id}, status_code=500)
 
+
+def _select_k(k: int, manifest: dict) -> int:
+    # Για μικρά k επιλέγεται δυναμικά το πλήθος των chunks βάσει του μεγέθους της συνεδρίας.
+    if k > 10:
+        return k
+    suggested_k = calculate_optimal_k(
+        total_chunks=manifest["total_chunks"],
+        total_tokens=manifest["total_tokens"],
+        chunk_tokens=CHUNK_TOKENS if CHUNK_UNIT == "tokens" else 0,
+    )
+    k = max(suggested_k, 8)
+    _log_add(f"Dynamic k selection: using k={k} (total_chunks={manifest['total_chunks']}, pages={manifest['total_pages']})")
+    return k
+
+
+async def _retrieve(
+    session_id: str, store: FaissStore, version: Tuple, questions: List[str], k: int
+) -> List[Tuple[np.ndarray, List[Tuple[float, Chunk]]]]:
+    # Αναζήτηση για μία ή περισσότερες ερωτήσεις· επιστρέφει (embedding, αποτελέσματα) ανά ερώτηση.
+    # Όσες έχουν ήδη αποτελέσματα για την ίδια έκδοση του ευρετηρίου και το ίδιο k δεν
+    # ξαναψάχνονται· για τις υπόλοιπες, όσες δεν έχουν αποθηκευμένο embedding στέλνονται μαζί σε
+    # ένα embedding call και όλες ψάχνονται με μία κλήση του FAISS.
+    query_cache = get_query_cache()
+    results: List[Optional[Tuple[np.ndarray, List[Tuple[float, Chunk]]]]] = [None] * len(questions)
+    if query_cache is not None:
+        results = [query_cache.get_results(session_id, version, q, k) for q in questions]
+    pending = [i for i, r in enumerate(results) if r is None]
+    if not pending:
+        return results
+
+    vectors: List[Optional[np.ndarray]] = [None] * len(questions)
+    if query_cache is not None:
+        for i in pending:
+            vectors[i] = query_cache.get_embedding(questions[i])
+    to_embed = [i for i in pending if vectors[i] is None]
+    if to_embed:
+        fresh = await aembed_texts([questions[i] for i in to_embed])
+        for i, vector in zip(to_embed, fresh):
+            vectors[i] = vector
+            if query_cache is not None:
+                query_cache.put_embedding(questions[i], vector)
+
+    q_vecs = np.stack([vectors[i] for i in pending])
+    found = await executors.run("faiss", store.search_batch, q_vecs, k=k)
+    for i, hits in zip(pending, found):
+        results[i] = (vectors[i], hits)
+        if query_cache is not None:
+            query_cache.put_results(session_id, version, questions[i], k, vectors[i], hits)
+    return results
+
+
+def _top_sources(results: List[Tuple[float, Chunk]]) -> List[dict]:
+    # Δημιουργία λίστας πηγών για εμφάνιση με scores
+    sources = []
+    seen = {}  # Αλλάζουμε σε dict για να κρατάμε το max score ανά πηγή
+
+    for (score, chunk) in results:
+        key = (chunk.source, chunk.page)
+        # Κρατάμε το υψηλότερο score αν υπάρχουν πολλαπλά chunks από την ίδια πηγή/σελίδα
+        if key not in seen or score > seen[key]:
+            seen[key] = score
+
+    # Δημιουργία της τελικής λίστας πηγών με scores
+    for (source, page), score in seen.items():
+        sources.append({
+            "filename": source,
+            "page": page,
+            "score": float(score)
+        })
+
+    # Ταξινόμηση πηγών με βάση το score (από υψηλότερο σε χαμηλότερο)
+    sources.sort(key=lambda x: x["score"], reverse=True)
+
+    # Κρατάμε μόνο τις top 2 πιο σχετικές πηγές για διασταύρωση
+    return sources[:2]
+
+
+@dataclass
+class PreparedAnswer:
+    # Αποτέλεσμα του κοινού βήματος πριν από το μοντέλο. Αν το answer υπάρχει, δεν χρειάζεται
+    # κλήση στο μοντέλο· αλλιώς το messages είναι το prompt και το finish() καταγράφει την απάντηση.
+    answer: Optional[str]
+    cached: bool
+    messages: Optional[List[dict]] = None
+    session_id: str = ""
+    version: Tuple = ()
+    q_vec: Optional[np.ndarray] = None
+    scope: Optional[Tuple[frozenset, str]] = None
+
+    def finish(self, answer: str, token_usage: dict) -> None:
+        answer_cache = get_answer_cache()
+        if answer_cache is not None:
+            chunk_ids, mode = self.scope
+            answer_cache.put(
+                self.session_id, self.version, self.q_vec, chunk_ids, mode,
+                answer, int(token_usage.get("total_tokens", 0)),
+            )
+        _log_token_comparison(self.messages, token_usage)
+
+
+def _prepare_answer(
+    question: str, results: List[Tuple[float, Chunk]], use_llm: bool, extractive: bool,
+    session_id: str, version: Tuple, q_vec: np.ndarray,
+) -> PreparedAnswer:
+    # Κοινό για /query, /query/batch και /query/stream: μόνο αποσπάσματα, απάντηση από την cache
+    # ή το prompt για το μοντέλο. Τα endpoints διαφέρουν μόνο στην κλήση του μοντέλου.
+    contexts = [(c.source, c.page, c.text) for _, c in results]
+
+    # Επιστροφή μόνο των αποσπασμάτων εάν δεν ζητηθεί χρήση AI
+    if not use_llm:
+        return PreparedAnswer("\n\n".join([text for _, _, text in contexts]), False)
+
+    # Μια παρόμοια ερώτηση με ακριβώς τα ίδια chunks στην ίδια έκδοση έχει ήδη απάντηση.
+    answer_cache = get_answer_cache()
+    scope = _answer_scope(results, extractive)
+    if answer_cache is not None:
+        cached = answer_cache.get(session_id, version, q_vec, *scope)
+        if cached is not None:
+            _log_add(f"Answer cache hit for '{question}' (session_id={session_id})")
+            return PreparedAnswer(cached, True)
+
+    messages = build_rag_prompt(question, contexts, extractive=extractive)
+    return PreparedAnswer(None, False, messages, session_id, version, q_vec, scope)
+
+
+async def _compose_answer(
+    question: str, results: List[Tuple[float, Chunk]], use_llm: bool, extractive: bool,
+    session_id: str, version: Tuple, q_vec: np.ndarray,
+) -> Tuple[str, bool]:
+    # Επιστρέφει (απάντηση, αν ήρθε από την cache απαντήσεων).
+    prepared = _prepare_answer(question, results, use_llm, extractive, session_id, version, q_vec)
+    if prepared.answer is not None:
+        return prepared.answer, prepared.cached
+
+    # Σύνθεση απάντησης με τη χρήση του μοντέλου γλώσσας
+    answer, token_usage = await achat(prepared.messages)
+    prepared.finish(answer, token_usage)
+    return answer, False
+
+
+def _answer_scope(results: List[Tuple[float, Chunk]], extractive: bool) -> Tuple[frozenset, str]:
+    # Ό,τι πρέπει να ταιριάζει για να ξαναχρησιμοποιηθεί μια απάντηση: τα chunks και το mode.
+    return frozenset(c.chunk_id for _, c in results), ("extractive" if extractive else "generative")
+
+
+def _log_token_comparison(messages: List[dict], token_usage: dict) -> None:
+    prompt_text = "\n".join([msg["content"] for msg in messages])
+    python_tokens = count_tokens_llama(prompt_text)
+    api_prompt_tokens = token_usage["prompt_tokens"]
+    difference = abs(python_tokens - api_prompt_tokens)
+    percentage_diff = (difference / api_prompt_tokens * 100) if api_prompt_tokens > 0 else 0
+
+    _log_add(f"Token comparison: Python={python_tokens}, API={api_prompt_tokens}, diff={difference} ({percentage_diff:.2f}%)")
+
+    # Κάθε τριάδα (χαρακτήρες, tiktoken, API) βαθμονομεί τον εκτιμητή tokens. Αν το API δεν
+    # ανέφερε usage, τα prompt tokens μετρήθηκαν τοπικά και δεν είναι παρατήρηση του API.
+    estimator = get_token_estimator()
+    if estimator is None:
+        return
+    estimated = estimator.estimate(prompt_text, "api", segments=len(messages))
+    _log_add(f"Token estimate: API~{estimated} (+{estimator.bound('api'):.1%} bound)")
+    if get_tokenizer().exact:
+        estimator.observe("tiktoken", prompt_text, python_tokens)
+    if not token_usage.get("counted_locally"):
+        estimator.observe("api", prompt_text, api_prompt_tokens, segments=len(messages))
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
 # Υποβολή ερωτήματος και λήψη απάντησης από το μοντέλο AI
 @app.post("/query")
 async def query_pdf(
@@ -494,34 +897,22 @@ async def query_pdf(
         return JSONResponse({"ok": False, "error": "The question cannot be empty."}, status_code=400)
 
     index_path, meta_path = get_session_index_paths(session_id, create_if_missing=False)
-    store = FaissStore(dim=1024, index_path=index_path, meta_path=meta_path)
     try:
-        store.load()
+        version = disk_stamp(index_path, meta_path)
+        store = await executors.run("faiss", _load_store_cached, session_id, index_path, meta_path)
 
-        if not store.metadata:
+        if not len(store):
             return JSONResponse({
                 "ok": False,
                 "error": "No documents uploaded yet. Upload a PDF or PowerPoint file first."
             }, status_code=400)
 
-        total_chunks = len(store.metadata)
-        total_tokens = sum(chunk.tokens if chunk.tokens > 0 else count_tokens_llama(chunk.text) for chunk in store.metadata)
-        unique_pages = set((chunk.source, chunk.page) for chunk in store.metadata)
-        total_pages = len(unique_pages)
-        
-        if k <= 10:
-            suggested_k = calculate_optimal_k(
-                total_chunks=total_chunks,
-                total_tokens=total_tokens
-            )
-            k = max(suggested_k, 8)
-            _log_add(f"Dynamic k selection: using k={k} (total_chunks={total_chunks}, pages={total_pages})")
+        manifest = store.manifest()
+        k = _select_k(k, manifest)
 
         # Μετατροπή ερώτησης σε διάνυσμα και αναζήτηση σχετικών τμημάτων
-        q_vec = embed_texts([question])[0]
         _log_add(f"Question: '{question}' | k={k} | use_llm={use_llm} | extractive={llm_extractive} | session_id={session_id}")
-
-        results = store.search(q_vec, k=k)
+        q_vec, results = (await _retrieve(session_id, store, version, [question], k))[0]
         try:
             for rank, (score, c) in enumerate(results, start=1):
                 _log_add(f"Top{rank}: source='{c.source}', page={c.page}, score={score:.4f}")
@@ -535,50 +926,11 @@ async def query_pdf(
                 "session_id": session_id
             }, status_code=400)
 
-        contexts = [(c.source, c.page, c.text) for _, c in results]
-        
-        # Δημιουργία λίστας πηγών για εμφάνιση με scores
-        sources = []
-        seen = {}  # Αλλάζουμε σε dict για να κρατάμε το max score ανά πηγή
-        
-        for (score, chunk) in results:
-            key = (chunk.source, chunk.page)
-            # Κρατάμε το υψηλότερο score αν υπάρχουν πολλαπλά chunks από την ίδια πηγή/σελίδα
-            if key not in seen or score > seen[key]:
-                seen[key] = score
-        
-        # Δημιουργία της τελικής λίστας πηγών με scores
-        for (source, page), score in seen.items():
-            sources.append({
-                "filename": source, 
-                "page": page,
-                "score": float(score)
-            })
-        
-        # Ταξινόμηση πηγών με βάση το score (από υψηλότερο σε χαμηλότερο)
-        sources.sort(key=lambda x: x["score"], reverse=True)
-        
-        # Κρατάμε μόνο τις top 2 πιο σχετικές πηγές για διασταύρωση
-        sources = sources[:2]
-        
-        # Επιστροφή μόνο των αποσπασμάτων εάν δεν ζητηθεί χρήση AI
-        if use_llm != "1":
-            snippet = "\n\n".join([text for _, _, text in contexts])
-            return {"ok": True, "answer": snippet, "sources": sources, "session_id": session_id}
-
-        # Σύνθεση απάντησης με τη χρήση του μοντέλου γλώσσας
-        messages = build_rag_prompt(question, contexts, extractive=(llm_extractive == "1"))
-        answer, token_usage = chat(messages)
-        
-        prompt_text = "\n".join([msg["content"] for msg in messages])
-        python_tokens = count_tokens_llama(prompt_text)
-        api_prompt_tokens = token_usage["prompt_tokens"]
-        difference = abs(python_tokens - api_prompt_tokens)
-        percentage_diff = (difference / api_prompt_tokens * 100) if api_prompt_tokens > 0 else 0
-        
-        _log_add(f"Token comparison: Python={python_tokens}, API={api_prompt_tokens}, diff={difference} ({percentage_diff:.2f}%)")
-        
-        return {"ok": True, "answer": answer, "sources": sources, "session_id": session_id}
+        sources = _top_sources(results)
+        answer, cached = await _compose_answer(
+            question, results, use_llm == "1", llm_extractive == "1", session_id, version, q_vec,
+        )
+        return {"ok": True, "answer": answer, "sources": sources, "cached": cached, "session_id": session_id}
 
     except requests.exceptions.HTTPError as e:
         status = getattr(getattr(e, "response", None), "status_code", 502) or 502
@@ -600,6 +952,181 @@ async def query_pdf(
         return JSONResponse({"ok": False, "error": "Server error while searching.", "session_id": session_id}, status_code=500)
 
 
+# Streaming εκδοχή του /query (Server-Sent Events): πρώτα οι πηγές, μετά τα κομμάτια της
+# απάντησης όπως τα παράγει το μοντέλο και στο τέλος η χρήση tokens. Τα σφάλματα πριν αρχίσει
+# η ροή επιστρέφονται ως JSON όπως στο /query· όσα συμβούν κατά τη ροή ως γεγονός error.
+@app.post("/query/stream")
+async def query_stream(
+    question: str = Form(..., description="User question about the uploaded documents"),
+    k: int = Form(5, description="Number of chunks to retrieve"),
+    use_llm: str = Form("1", description="Use the LLM for answering (1=yes, 0=no)"),
+    llm_extractive: str = Form("0", description="Extractive answer mode"),
+    session_id: str = Form(default=None, description="Current session ID"),
+    x_session_key: Optional[str] = Header(default=None)
+):
+    _ensure_dirs()
+
+    if not session_id:
+        return JSONResponse({
+            "ok": False,
+            "error": "No active session found. Start a new chat to continue."
+        }, status_code=400)
+
+    session_id = _normalize_session_id(session_id)
+    _claim_or_verify_session(session_id, x_session_key)
+
+    if not (question or "").strip():
+        return JSONResponse({"ok": False, "error": "The question cannot be empty."}, status_code=400)
+
+    index_path, meta_path = get_session_index_paths(session_id, create_if_missing=False)
+    try:
+        version = disk_stamp(index_path, meta_path)
+        store = await executors.run("faiss", _load_store_cached, session_id, index_path, meta_path)
+
+        if not len(store):
+            return JSONResponse({
+                "ok": False,
+                "error": "No documents uploaded yet. Upload a PDF or PowerPoint file first."
+            }, status_code=400)
+
+        k = _select_k(k, store.manifest())
+        _log_add(f"Question (stream): '{question}' | k={k} | use_llm={use_llm} | extractive={llm_extractive} | session_id={session_id}")
+        q_vec, results = (await _retrieve(session_id, store, version, [question], k))[0]
+    except Exception as e:
+        _log_add(f"Query error: {e}")
+        print(f"ERROR in query_stream: {e}", file=sys.stderr)
+        return JSONResponse({"ok": False, "error": "Server error while searching.", "session_id": session_id}, status_code=500)
+
+    if not results:
+        return JSONResponse({
+            "ok": False,
+            "error": "No relevant excerpts were found for this question.",
+            "session_id": session_id
+        }, status_code=400)
+
+    async def events() -> AsyncIterator[str]:
+        yield _sse("sources", {"sources": _top_sources(results), "session_id": session_id})
+        try:
+            prepared = _prepare_answer(
+                question, results, use_llm == "1", llm_extractive == "1", session_id, version, q_vec,
+            )
+            if prepared.answer is not None:
+                yield _sse("token", {"text": prepared.answer})
+                yield _sse("done", {"usage": None, "cached": prepared.cached})
+                return
+
+            pieces: List[str] = []
+            token_usage: dict = {}
+            async for kind, value in achat_stream(prepared.messages):
+                if kind == "token":
+                    pieces.append(value)
+                    yield _sse("token", {"text": value})
+                else:
+                    token_usage = value
+            answer = "".join(pieces).strip()
+            prepared.finish(answer, token_usage)
+            yield _sse("done", {"usage": token_usage, "cached": False})
+        except Exception as e:
+            _log_add(f"Query stream error: {e}")
+            print(f"ERROR in query_stream: {e}", file=sys.stderr)
+            yield _sse("error", {"error": "The answer could not be completed. Please try again."})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# Πολλές ερωτήσεις με ένα αίτημα: ένα embedding call, μία αναζήτηση FAISS για όλες και
+# ταυτόχρονες κλήσεις στο μοντέλο. Κάθε ερώτηση έχει δικό της ok/error, ώστε η αποτυχία
+# μίας να μην ακυρώνει τις υπόλοιπες.
+@app.post("/query/batch")
+async def query_batch(
+    questions: str = Form(..., description="Questions as a JSON array of strings"),
+    k: int = Form(5, description="Number of chunks to retrieve per question"),
+    use_llm: str = Form("1", description="Use the LLM for answering (1=yes, 0=no)"),
+    llm_extractive: str = Form("0", description="Extractive answer mode"),
+    session_id: str = Form(default=None, description="Current session ID"),
+    x_session_key: Optional[str] = Header(default=None)
+):
+    _ensure_dirs()
+
+    if not session_id:
+        return JSONResponse({
+            "ok": False,
+            "error": "No active session found. Start a new chat to continue."
+        }, status_code=400)
+
+    session_id = _normalize_session_id(session_id)
+    _claim_or_verify_session(session_id, x_session_key)
+
+    try:
+        question_list = json.loads(questions)
+    except json.JSONDecodeError:
+        return JSONResponse({"ok": False, "error": "Invalid JSON payload."}, status_code=400)
+    if not isinstance(question_list, list) or not question_list:
+        return JSONResponse({"ok": False, "error": "Provide a non-empty list of questions."}, status_code=400)
+    if len(question_list) > QUERY_BATCH_MAX_QUESTIONS:
+        return JSONResponse({
+            "ok": False,
+            "error": f"Too many questions in one batch (max {QUERY_BATCH_MAX_QUESTIONS})."
+        }, status_code=400)
+
+    answers: List[dict] = [
+        {"question": q, "ok": False, "error": "The question cannot be empty."}
+        for q in question_list
+    ]
+    valid = [i for i, q in enumerate(question_list) if isinstance(q, str) and q.strip()]
+
+    index_path, meta_path = get_session_index_paths(session_id, create_if_missing=False)
+    try:
+        version = disk_stamp(index_path, meta_path)
+        store = await executors.run("faiss", _load_store_cached, session_id, index_path, meta_path)
+
+        if not len(store):
+            return JSONResponse({
+                "ok": False,
+                "error": "No documents uploaded yet. Upload a PDF or PowerPoint file first."
+            }, status_code=400)
+
+        k = _select_k(k, store.manifest())
+        batch_results = await _retrieve(session_id, store, version, [question_list[i] for i in valid], k) if valid else []
+        _log_add(f"Batch query: {len(question_list)} questions ({len(valid)} valid) | k={k} | use_llm={use_llm} | session_id={session_id}")
+
+        limiter = asyncio.Semaphore(QUERY_BATCH_CONCURRENCY)
+
+        async def answer_one(i: int, q_vec: np.ndarray, results: List[Tuple[float, Chunk]]) -> None:
+            question = question_list[i]
+            if not results:
+                answers[i] = {"question": question, "ok": False, "error": "No relevant excerpts were found for this question."}
+                return
+            try:
+                async with limiter:
+                    answer, cached = await _compose_answer(
+                        question, results, use_llm == "1", llm_extractive == "1", session_id, version, q_vec,
+                    )
+                answers[i] = {
+                    "question": question, "ok": True, "answer": answer,
+                    "sources": _top_sources(results), "cached": cached,
+                }
+            except Exception as e:
+                _log_add(f"Batch query error for question {i}: {e}")
+                answers[i] = {"question": question, "ok": False, "error": "Failed to answer this question."}
+
+        await asyncio.gather(*(answer_one(i, q_vec, results) for i, (q_vec, results) in zip(valid, batch_results)))
+        return {"ok": True, "results": answers, "session_id": session_id}
+
+    except Exception as e:
+        import traceback
+        tb = traceback.format_exc()
+        _log_add(f"Batch query error: {e}")
+        _log_add(f"Traceback: {tb}")
+        print(f"ERROR in query_batch: {e}", file=sys.stderr)
+        print(tb, file=sys.stderr)
+        return JSONResponse({"ok": False, "error": "Server error while searching.", "session_id": session_id}, status_code=500)
+
+
 # Ανάκτηση στατιστικών στοιχείων χρήσης της συνεδρίας
 @app.get("/sessions/{session_id}/stats")
 async def get_session_stats(session_id: str, x_session_key: Optional[str] = Header(default=None)):
@@ -610,7 +1137,7 @@ async def get_session_stats(session_id: str, x_session_key: Optional[str] = Head
     try:
         index_path, meta_path = get_session_index_paths(session_id, create_if_missing=False)
         
-        if not os.path.exists(meta_path):
+        if not os.path.exists(index_path):
             return JSONResponse({
                 "ok": True,
                 "session_id": session_id,
@@ -621,10 +1148,9 @@ async def get_session_stats(session_id: str, x_session_key: Optional[str] = Head
                 "documents": []
             })
         
-        store = FaissStore(dim=1024, index_path=index_path, meta_path=meta_path)
-        store.load()
+        manifest = await executors.run("io", _read_session_manifest, session_id, index_path, meta_path)
         
-        if not store.metadata:
+        if not manifest["total_chunks"]:
             return JSONResponse({
                 "ok": True,
                 "session_id": session_id,
@@ -635,41 +1161,16 @@ async def get_session_stats(session_id: str, x_session_key: Optional[str] = Head
                 "documents": []
             })
         
-        docs_stats = {}
-        for chunk in store.metadata:
-            source = chunk.source
-            if source not in docs_stats:
-                docs_stats[source] = {
-                    "name": source,
-                    "tokens": 0,
-                    "chunks": 0,
-                    "pages": set()
-                }
-            chunk_tokens = chunk.tokens if chunk.tokens > 0 else count_tokens_llama(chunk.text)
-            docs_stats[source]["tokens"] += chunk_tokens
-            docs_stats[source]["chunks"] += 1
-            docs_stats[source]["pages"].add(chunk.page)
+        documents = manifest["documents"]
+        total_tokens = manifest["total_tokens"]
         
-        documents = []
-        total_tokens = 0
-        for doc in docs_stats.values():
-            doc_data = {
-                "name": doc["name"],
-                "tokens": doc["tokens"],
-                "chunks": doc["chunks"],
-                "pages": len(doc["pages"])
-            }
-            documents.append(doc_data)
-            total_tokens += doc["tokens"]
-        
-        MAX_SESSION_TOKENS = 200000
         remaining_budget = max(0, MAX_SESSION_TOKENS - total_tokens)
         
         return JSONResponse({
             "ok": True,
             "session_id": session_id,
             "total_tokens": total_tokens,
-            "total_chunks": len(store.metadata),
+            "total_chunks": manifest["total_chunks"],
             "total_documents": len(documents),
             "remaining_budget": remaining_budget,
             "max_session_tokens": MAX_SESSION_TOKENS,
@@ -693,6 +1194,36 @@ async def ready():
     _ensure_dirs()
     return {"ok": True, "status": "ready"}
 
+# Μετρητές απόδοσης για τον κοινό Cloudflare client και τις caches
+@app.get("/metrics")
+async def get_metrics():
+    cache = get_embedding_cache()
+    content_store = get_content_store()
+    store_cache = get_store_cache()
+    query_cache = get_query_cache()
+    answer_cache = get_answer_cache()
+    token_estimator = get_token_estimator()
+    return {
+        "ok": True,
+        "cloudflare": cf_client_stats(),
+        "embedding_cache": cache.stats() if cache else None,
+        "content_store": content_store.stats() if content_store else None,
+        "store_cache": store_cache.stats() if store_cache else None,
+        "query_cache": query_cache.stats() if query_cache else None,
+        "answer_cache": answer_cache.stats() if answer_cache else None,
+        "token_estimator": token_estimator.stats() if token_estimator else None,
+        "executors": executors.stats(),
+    }
+
+@app.on_event("shutdown")
+async def _close_cf_clients() -> None:
+    await close_async_cf_client()
+    close_cf_client()
+    executors.shutdown()
+    token_estimator = get_token_estimator()
+    if token_estimator is not None:
+        token_estimator.save()
+
 # Προβολή του αρχείου καταγραφής
 @app.get("/log")
 async def get_log() -> FileResponse:
@@ -711,28 +1242,23 @@ async def remove_session(
     try:
         session_id = _normalize_session_id(session_id)
         _claim_or_verify_session(session_id, x_session_key)
-        session_dir = os.path.join(INDEX_DIR, f"session_{session_id}")
-        index_path = os.path.join(session_dir, "index.faiss")
-        meta_path = os.path.join(session_dir, "metadata.json")
+        index_path, meta_path = get_session_index_paths(session_id, create_if_missing=False)
+        session_dir = os.path.dirname(index_path)
         upload_dir = get_session_upload_dir(session_id, create_if_missing=False)
         
         removed_count = 0
         
-        if os.path.exists(index_path) or os.path.exists(meta_path):
-            if os.path.exists(meta_path):
-                try:
-                    with open(meta_path, "r", encoding="utf-8") as f:
-                        data = json.load(f)
-                        removed_count = len(data)
-                except Exception:
-                    pass
+        if os.path.exists(session_dir):
+            try:
+                manifest = await executors.run("io", _read_session_manifest, session_id, index_path, meta_path)
+                removed_count = manifest["total_chunks"]
+            except Exception:
+                pass
             
-            for p in (index_path, meta_path):
-                try:
-                    if os.path.exists(p):
-                        os.remove(p)
-                except Exception:
-                    pass
+            try:
+                remove_store_files(index_path, meta_path)
+            except Exception:
+                pass
             
             try:
                 if os.path.exists(session_dir) and not os.listdir(session_dir):
@@ -746,7 +1272,13 @@ async def remove_session(
         except Exception:
             pass
         
+        try:
+            await executors.run("io", _release_session_content, session_id)
+        except Exception as e:
+            _log_add(f"Warning: Failed to release stored content for session '{session_id}': {e}")
+
         chat_history_deleted = chat_history_store.delete_session(session_id)
+        _publish_store(session_id, None)
         _delete_session_owner(session_id)
         
         return {
@@ -784,27 +1316,31 @@ async def remove_indexed_file(
             os.remove(json_path)
         if os.path.exists(session_upload_dir) and not os.listdir(session_upload_dir):
             os.rmdir(session_upload_dir)
+
+        content_store = get_content_store()
+        if content_store is not None:
+            await executors.run("io", content_store.release, f"{session_id}/{filename}")
     except Exception:
         pass
 
     index_path, meta_path = get_session_index_paths(session_id, create_if_missing=False)
-    store = FaissStore(dim=1024, index_path=index_path, meta_path=meta_path)
     try:
-        store.load()
-        if not getattr(store, "metadata", []):
+        store = await executors.run("faiss", _load_store_for_write, index_path, meta_path)
+        if not len(store):
             return {"ok": True, "removed": False, "remaining_chunks": 0}
 
-        remaining_chunks: List[Chunk] = [c for c in store.metadata if c.source != filename]
-        if len(remaining_chunks) == len(store.metadata):
-            return {"ok": True, "removed": False, "remaining_chunks": len(remaining_chunks)}
+        # Διαγραφή των chunks του αρχείου απευθείας από το ευρετήριο, χωρίς νέα embeddings
+        removed_count = await executors.run("faiss", store.remove_source, filename)
+        remaining_chunks = len(store)
+        if removed_count == 0:
+            return {"ok": True, "removed": False, "remaining_chunks": remaining_chunks}
 
         if not remaining_chunks:
-            for p in (index_path, meta_path):
-                try:
-                    if os.path.exists(p):
-                        os.remove(p)
-                except Exception:
-                    pass
+            _publish_store(session_id, None)
+            try:
+                remove_store_files(index_path, meta_path)
+            except Exception:
+                pass
             session_dir = os.path.dirname(index_path)
             try:
                 if os.path.exists(session_dir) and not os.listdir(session_dir):
@@ -818,16 +1354,13 @@ async def remove_indexed_file(
                 "remaining_chunks": 0
             }
 
-        texts = [c.text for c in remaining_chunks]
-        vectors = embed_texts(texts)
-        new_store = FaissStore(dim=vectors.shape[1], index_path=index_path, meta_path=meta_path)
-        new_store.add(vectors, remaining_chunks)
-        new_store.save()
+        await executors.run("faiss", store.save)
+        _publish_store(session_id, store)
         
         return {
             "ok": True, 
             "removed": True, 
-            "remaining_chunks": len(remaining_chunks)
+            "remaining_chunks": remaining_chunks
         }
     except requests.exceptions.HTTPError as e:
         status = getattr(getattr(e, "response", None), "status_code", 502) or 502
@@ -899,15 +1432,9 @@ async def delete_chat_history(
         
         index_deleted = False
         try:
-            session_dir = os.path.join(INDEX_DIR, f"session_{session_id}")
-            index_path = os.path.join(session_dir, "index.faiss")
-            meta_path = os.path.join(session_dir, "metadata.json")
+            index_path, meta_path = get_session_index_paths(session_id, create_if_missing=False)
             upload_dir = get_session_upload_dir(session_id, create_if_missing=False)
-            if os.path.exists(index_path) or os.path.exists(meta_path):
-                for p in (index_path, meta_path):
-                    if os.path.exists(p):
-                        os.remove(p)
-                
+            if remove_store_files(index_path, meta_path):
                 session_dir = os.path.dirname(index_path)
                 if os.path.exists(session_dir) and not os.listdir(session_dir):
                     os.rmdir(session_dir)
@@ -915,8 +1442,10 @@ async def delete_chat_history(
                 index_deleted = True
             if os.path.exists(upload_dir):
                 shutil.rmtree(upload_dir)
+            await executors.run("io", _release_session_content, session_id)
         except Exception as e:
             _log_add(f"Warning: Failed to delete index for session '{session_id}': {e}")
+        _publish_store(session_id, None)
         _delete_session_owner(session_id)
         
         if success:
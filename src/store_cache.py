@@ -0,0 +1,112 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from .ann_index import code_size
+from .index_store import FaissStore
+
+
+def disk_stamp(*paths: str) -> Tuple:
+    # Έκδοση των αρχείων στον δίσκο: (mtime, μέγεθος) για καθένα, ή None αν λείπει.
+    stamp = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            stamp.append((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            stamp.append(None)
+    return tuple(stamp)
+
+
+def store_footprint(store: FaissStore) -> int:
+    # Προσεγγιστικό μέγεθος στη μνήμη: οι κωδικοί των διανυσμάτων στο ευρετήριο (ανάλογα με τον
+    # codec) και οι στήλες μεταδεδομένων. Τα κείμενα, τα διανύσματα πλήρους ακρίβειας και τα
+    # memory-mapped ευρετήρια βρίσκονται στο κοινό page cache και δεν μετρώνται.
+    vectors = 0 if store.read_only else int(store.index.ntotal) * code_size(store.index)
+    return vectors + store.metadata_nbytes()
+
+
+class StoreCache:
+    # LRU cache φορτωμένων FaissStore ανά συνεδρία, μέσα σε κάθε worker.
+    # Κάθε εγγραφή κρατά την έκδοση των αρχείων στον δίσκο τη στιγμή της φόρτωσης· αν
+    # κάποιος άλλος worker γράψει το ευρετήριο, η έκδοση αλλάζει και η εγγραφή ξαναφορτώνεται.
+    # Οι αναγνώστες (query, stats) μοιράζονται το ίδιο αντικείμενο και δεν πρέπει να το
+    # τροποποιούν· όσοι γράφουν φορτώνουν δικό τους αντίγραφο και το δημοσιεύουν με put().
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[Tuple, FaissStore, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str, loader: Callable[[str, str], FaissStore], index_path: str, meta_path: str) -> FaissStore:
+        stamp = disk_stamp(index_path, meta_path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == stamp:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        store = loader(index_path, meta_path)
+        self._insert(key, stamp, store)
+        return store
+
+    def put(self, key: str, store: FaissStore) -> None:
+        # Δημοσιεύει ένα store που μόλις αποθηκεύτηκε, ώστε η επόμενη ανάγνωση να μη χρειαστεί δίσκο.
+        self._insert(key, disk_stamp(store.index_path, store.meta_path), store)
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.bytes -= entry[2]
+
+    def _insert(self, key: str, stamp: Tuple, store: FaissStore) -> None:
+        size = store_footprint(store)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[2]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (stamp, store, size)
+            self.bytes += size
+            # Αφαίρεση των λιγότερο πρόσφατα χρησιμοποιημένων συνεδριών μέχρι να χωρέσει η νέα.
+            while self.bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "sessions": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits / total) if total else 0.0,
+        }
+
+
+_cache: Optional[StoreCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_store_cache() -> Optional[StoreCache]:
+    # Επιστρέφει την cache της διεργασίας, ή None αν έχει απενεργοποιηθεί.
+    global _cache
+    if os.getenv("STORE_CACHE_ENABLED", "1") != "1":
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                max_mb = int(os.getenv("STORE_CACHE_MAX_MB", "256"))
+                _cache = StoreCache(max_bytes=max_mb * 1024 * 1024)
+    return _cache
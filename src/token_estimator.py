@@ -0,0 +1,231 @@
+import json
+import math
+import os
+import threading
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+import numpy as np
+
+# Χαρακτηριστικά ενός κειμένου: πλήθος χαρακτήρων ανά κλάση και πλήθος τμημάτων (π.χ. μηνυμάτων
+# chat, που το καθένα φέρνει δικά του tokens προτύπου).
+FEATURES = ("ascii_alnum", "ascii_space", "ascii_other", "greek", "other", "segments")
+
+# Στόχοι εκτίμησης: ο τοπικός tokenizer (tiktoken) και τα prompt tokens που αναφέρει το API του LLM.
+TARGETS = ("tiktoken", "api")
+
+# Tokens ανά χαρακτήρα κάθε κλάσης (και ανά τμήμα) πριν από οποιαδήποτε παρατήρηση.
+PRIOR_WEIGHTS = {
+    "tiktoken": (0.25, 0.05, 0.6, 0.5, 0.8, 0.0),
+    "api": (0.25, 0.05, 0.6, 0.4, 0.8, 4.0),
+}
+
+# Κλάση κάθε byte UTF-8· τα bytes συνέχειας (0x80-0xBF) δεν μετρούν, οπότε κάθε χαρακτήρας
+# μετριέται μία φορά από το πρώτο του byte. Τα 0xCE/0xCF ξεκινούν το βασικό ελληνικό μπλοκ.
+_BYTE_CLASSES = np.zeros((256, len(FEATURES) - 1), dtype=np.float64)
+for _b in range(256):
+    if _b < 0x80:
+        _BYTE_CLASSES[_b, 0 if chr(_b).isalnum() else 1 if chr(_b).isspace() else 2] = 1
+    elif _b >= 0xC0:
+        _BYTE_CLASSES[_b, 3 if _b in (0xCE, 0xCF) else 4] = 1
+
+
+def text_features(text: str, segments: int = 1) -> np.ndarray:
+    # Πλήθος χαρακτήρων ανά κλάση με ένα πέρασμα στα bytes (χωρίς βρόχο Python ανά χαρακτήρα).
+    data = np.frombuffer(text.encode("utf-8", "replace"), dtype=np.uint8)
+    counts = np.bincount(data, minlength=256).astype(np.float64)
+    return np.append(counts @ _BYTE_CLASSES, float(segments))
+
+
+class _Calibration:
+    # Γραμμικό μοντέλο tokens = βάρη · χαρακτηριστικά για έναν στόχο, με σταθμισμένα ελάχιστα
+    # τετράγωνα (βάρος 1/tokens, ώστε να μετράει το σχετικό σφάλμα) που ξεχνούν σταδιακά τις
+    # παλιές παρατηρήσεις. Τα αθροίσματα ξεκινούν από ψευδο-παρατηρήσεις του PRIOR_WEIGHTS, ώστε
+    # κλάσεις που δεν έχουν εμφανιστεί ακόμη να εκτιμώνται λογικά.
+    def __init__(self, prior: np.ndarray, window: int):
+        self.prior = prior
+        size = len(prior)
+        self.xtx = np.zeros((size, size))
+        self.xty = np.zeros(size)
+        for j in range(size - 1):
+            x = np.zeros(size)
+            x[j], x[-1] = 400.0, 1.0
+            self._accumulate(x, float(prior @ x))
+        self.samples = 0
+        # Σχετικό σφάλμα (πραγματικά / εκτίμηση - 1) κάθε παρατήρησης, με τα βάρη πριν από αυτήν.
+        self.errors: Deque[float] = deque(maxlen=window)
+        self._weights: Optional[np.ndarray] = None
+        self.cached_bound: Optional[float] = None
+
+    def _accumulate(self, x: np.ndarray, actual: float) -> None:
+        weight = 1.0 / max(actual, 1.0)
+        self.xtx += weight * np.outer(x, x)
+        self.xty += weight * x * actual
+        self._weights = None
+        self.cached_bound = None
+
+    @property
+    def weights(self) -> np.ndarray:
+        if self._weights is None:
+            # Μικρό ridge προς το prior για τις κατευθύνσεις χωρίς δεδομένα.
+            ridge = 1e-6 * max(float(np.trace(self.xtx)), 1.0)
+            system = self.xtx + ridge * np.eye(len(self.prior))
+            self._weights = np.linalg.solve(system, self.xty + ridge * self.prior)
+        return self._weights
+
+    def predict(self, x: np.ndarray) -> float:
+        return max(0.0, float(self.weights @ x))
+
+    def observe(self, x: np.ndarray, actual: float, decay: float) -> None:
+        estimate = self.predict(x)
+        if estimate > 0:
+            self.errors.append(actual / estimate - 1.0)
+        self.xtx *= decay
+        self.xty *= decay
+        self._accumulate(x, actual)
+        self.samples += 1
+
+    def to_json(self) -> dict:
+        return {"xtx": self.xtx.tolist(), "xty": self.xty.tolist(), "samples": self.samples, "errors": list(self.errors)}
+
+    def load(self, data: dict) -> None:
+        xtx = np.asarray(data["xtx"], dtype=np.float64)
+        xty = np.asarray(data["xty"], dtype=np.float64)
+        if xtx.shape != self.xtx.shape or xty.shape != self.xty.shape:
+            raise ValueError("incompatible calibration")
+        self.xtx, self.xty = xtx, xty
+        self.samples = int(data.get("samples", 0))
+        self.errors.extend(float(e) for e in data.get("errors", []))
+        self._weights = None
+        self.cached_bound = None
+
+
+class TokenEstimator:
+    # Φτηνή εκτίμηση tokens από τους χαρακτήρες ενός κειμένου, βαθμονομημένη συνεχώς από
+    # ακριβείς μετρήσεις: τα tokens του tiktoken κατά την εισαγωγή σελίδων και τα prompt tokens
+    # που αναφέρει το API σε κάθε απάντηση. Το upper() προσθέτει το εμπειρικό περιθώριο σφάλματος:
+    # το quantile των σχετικών σφαλμάτων των πρόσφατων παρατηρήσεων (μετρημένων πριν ενσωματωθούν),
+    # ή default_bound όσο οι παρατηρήσεις είναι λιγότερες από min_samples. Η κατάσταση αποθηκεύεται
+    # στον δίσκο ανά save_every παρατηρήσεις και στον τερματισμό· με πολλούς workers κρατιέται
+    # η τελευταία αποθήκευση.
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        quantile: float = 0.99,
+        decay: float = 0.998,
+        window: int = 1000,
+        min_samples: int = 20,
+        default_bound: float = 0.5,
+        save_every: int = 100,
+    ):
+        self.path = path
+        self.quantile = quantile
+        self.decay = decay
+        self.min_samples = min_samples
+        self.default_bound = default_bound
+        self.save_every = save_every
+        self._models = {t: _Calibration(np.asarray(PRIOR_WEIGHTS[t], dtype=np.float64), window) for t in TARGETS}
+        self._lock = threading.Lock()
+        self._unsaved = 0
+        if path:
+            self._load()
+
+    @classmethod
+    def from_env(cls) -> "TokenEstimator":
+        path = os.getenv("TOKEN_ESTIMATOR_PATH") or os.path.join(os.getenv("DATA_DIR", "./data"), "token_estimator.json")
+        return cls(path=path, quantile=float(os.getenv("TOKEN_ESTIMATOR_QUANTILE", "0.99")))
+
+    def estimate(self, text: str, target: str = "tiktoken", segments: int = 1) -> int:
+        if not text:
+            return 0
+        x = text_features(text, segments)
+        with self._lock:
+            return int(round(self._models[target].predict(x)))
+
+    def upper(self, text: str, target: str = "tiktoken", segments: int = 1) -> int:
+        # Εκτίμηση που ξεπερνά τα πραγματικά tokens με πιθανότητα περίπου 1 - quantile.
+        if not text:
+            return 0
+        x = text_features(text, segments)
+        with self._lock:
+            model = self._models[target]
+            return int(math.ceil(model.predict(x) * (1.0 + self._bound(model))))
+
+    def bound(self, target: str = "tiktoken") -> float:
+        with self._lock:
+            return self._bound(self._models[target])
+
+    def _bound(self, model: _Calibration) -> float:
+        if len(model.errors) < self.min_samples:
+            return self.default_bound
+        if model.cached_bound is None:
+            model.cached_bound = max(0.0, float(np.quantile(np.fromiter(model.errors, dtype=np.float64), self.quantile)))
+        return model.cached_bound
+
+    def observe(self, target: str, text: str, actual: int, segments: int = 1) -> None:
+        if not text or actual <= 0:
+            return
+        x = text_features(text, segments)
+        with self._lock:
+            self._models[target].observe(x, float(actual), self.decay)
+            self._unsaved += 1
+            due = self.path and self._unsaved >= self.save_every
+        if due:
+            self.save()
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        with self._lock:
+            if not self._unsaved:
+                return
+            data = {"version": 1, "targets": {t: m.to_json() for t, m in self._models.items()}}
+            self._unsaved = 0
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            for target, model in self._models.items():
+                if target in data.get("targets", {}):
+                    model.load(data["targets"][target])
+        except (OSError, ValueError, KeyError, TypeError):
+            # Χωρίς (έγκυρο) αρχείο ξεκινά από τα αρχικά βάρη.
+            self._models = {t: _Calibration(m.prior, m.errors.maxlen) for t, m in self._models.items()}
+
+    def stats(self) -> Dict[str, Dict]:
+        with self._lock:
+            result = {}
+            for target, model in self._models.items():
+                errors: List[float] = list(model.errors)
+                result[target] = {
+                    "samples": model.samples,
+                    "weights": dict(zip(FEATURES, (round(float(w), 4) for w in model.weights))),
+                    "bound": self._bound(model),
+                    "median_abs_error": float(np.median(np.abs(errors))) if errors else None,
+                }
+            return result
+
+
+_estimator: Optional[TokenEstimator] = None
+_estimator_lock = threading.Lock()
+
+
+def get_token_estimator() -> Optional[TokenEstimator]:
+    # Επιστρέφει τον εκτιμητή της διεργασίας, ή None αν έχει απενεργοποιηθεί.
+    global _estimator
+    if os.getenv("TOKEN_ESTIMATOR_ENABLED", "1") != "1":
+        return None
+    if _estimator is None:
+        with _estimator_lock:
+            if _estimator is None:
+                _estimator = TokenEstimator.from_env()
+    return _estimator
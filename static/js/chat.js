@@ -222,6 +222,55 @@ function addThem(text, meta, isError, sources) {
   row.appendChild(wrap);
   stream.appendChild(row);
   stream.parentElement.scrollTop = stream.parentElement.scrollHeight;
+  return row;
+}
+// Προσωρινό μήνυμα που γεμίζει όσο φτάνουν τα tokens της απάντησης (/query/stream)
+function addStreamingAnswer() {
+  const row = document.createElement('div');
+  row.className = 'msg-row them streaming';
+  const bubble = document.createElement('div');
+  bubble.className = 'bubble';
+  row.appendChild(bubble);
+  stream.appendChild(row);
+  return {
+    row,
+    append(text) {
+      bubble.textContent += text;
+      if (bubble.textContent.length > 300) bubble.classList.add('wide');
+      stream.parentElement.scrollTop = stream.parentElement.scrollHeight;
+    },
+  };
+}
+// Διαβάζει Server-Sent Events από το σώμα της απόκρισης και καλεί onEvent(event, data) για το καθένα
+async function readServerEvents(res, onEvent) {
+  const handleBlock = (block) => {
+    let event = 'message';
+    const data = [];
+    block.split('\n').forEach(line => {
+      if (line.startsWith('event:')) event = line.slice(6).trim();
+      else if (line.startsWith('data:')) data.push(line.slice(5).trimStart());
+    });
+    if (data.length) onEvent(event, JSON.parse(data.join('\n')));
+  };
+  if (!res.body || !res.body.getReader) {
+    (await res.text()).split('\n\n').forEach(block => { if (block.trim()) handleBlock(block); });
+    return;
+  }
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let sep;
+    while ((sep = buffer.indexOf('\n\n')) >= 0) {
+      const block = buffer.slice(0, sep);
+      buffer = buffer.slice(sep + 2);
+      if (block.trim()) handleBlock(block);
+    }
+  }
+  if (buffer.trim()) handleBlock(buffer);
 }
 function splitLongText(text, maxLen) {
   const parts = [];
@@ -337,7 +386,8 @@ async function send() {
     setBusy(false);
     return;
   }
-  // Αποστολή ερώτησης στο backend
+  // Αποστολή ερώτησης στο backend· η απάντηση έρχεται σε ροή και εμφανίζεται όσο παράγεται
+  let streaming = null;
   try {
     const fd = new FormData();
     fd.append('question', text || 'Question about the uploaded documents');
@@ -348,8 +398,33 @@ async function send() {
     fd.append('session_id', getCurrentSessionId());
     const ctrlQ = new AbortController();
     addController(ctrlQ);
-    const res = await fetch(apiUrl('/query'), { method: 'POST', body: fd, headers: authHeaders(), signal: ctrlQ.signal });
-    const data = await res.json();
+    const res = await fetch(apiUrl('/query/stream'), { method: 'POST', body: fd, headers: authHeaders(), signal: ctrlQ.signal });
+    const isStream = (res.headers.get('content-type') || '').includes('text/event-stream');
+    const data = isStream ? { ok: true } : await res.json();
+    if (isStream) {
+      let sources = null;
+      let answer = '';
+      let streamError = null;
+      await readServerEvents(res, (event, payload) => {
+        if (event === 'sources') {
+          sources = payload.sources;
+        } else if (event === 'token') {
+          if (!streaming) {
+            const trS = getTypingRow();
+            if (trS) { trS.classList.add('hidden'); }
+            streaming = addStreamingAnswer();
+          }
+          answer += payload.text;
+          streaming.append(payload.text);
+        } else if (event === 'error') {
+          streamError = payload.error;
+        }
+      });
+      if (streaming) { streaming.row.remove(); streaming = null; }
+      if (streamError) { throw new Error(streamError); }
+      data.answer = answer.trim();
+      data.sources = sources;
+    }
     const tr2 = getTypingRow();
     if (tr2) { tr2.classList.add('hidden'); }
     if (!data.ok) {
@@ -370,6 +445,7 @@ async function send() {
       setSessionMessagesSync(sid, msgs);
     } catch { }
   } catch (err) {
+    if (streaming) { streaming.row.remove(); streaming = null; }
     const tr3 = getTypingRow();
     if (tr3) { tr3.classList.add('hidden'); }
     if (!(err && err.name === 'AbortError')) {